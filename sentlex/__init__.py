@@ -5,3 +5,4 @@
 from sentlex import *
 from sentanalysis import *
 from stopwords import *
+from disklex import *
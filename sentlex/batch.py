@@ -0,0 +1,432 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   batch.py - scoring of document collections
+
+   Documents are read lazily from files, directories, glob patterns or line-oriented streams,
+   and results are produced as a stream of dicts, in input order, with a bounded number of
+   documents in memory at any time:
+
+      docs = iter_documents(['reviews/', 'extra/*.txt'])
+      for result in score_documents(classifier, docs, workers=4):
+          print json.dumps(result)
+
+   Each result holds the document id and the fields of docscoreutil.result_summary(), or an
+   'error' field if the document could not be scored.
+
+   When only scores and counts are needed, score_columns() writes them into NumPy arrays (or
+   memory-mapped .npy files) indexed by document position instead (see ResultColumns):
+
+      columns = ResultColumns(len(docs), 'results/')
+      score_columns(classifier, docs, columns, workers=4)
+'''
+
+import os
+import sys
+import glob
+import json
+import itertools
+import multiprocessing
+
+from docscoreutil import result_summary
+
+
+#
+# Input
+#
+class InputError(Exception):
+    '''
+     Stands in for the text of a document that could not be read (e.g. a malformed JSON line), so that it is
+     reported as an error result with the document's id instead of stopping the run.
+    '''
+    pass
+
+
+def iter_paths(inputs):
+    '''
+     Expands list of files, directories (walked recursively, in sorted order) and glob patterns into file paths.
+    '''
+    for item in inputs:
+        if os.path.isdir(item):
+            for (dirpath, dirnames, filenames) in os.walk(item):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    yield os.path.join(dirpath, filename)
+        elif os.path.exists(item):
+            yield item
+        else:
+            matches = sorted(glob.glob(item))
+            if not matches:
+                raise IOError('No such file or pattern: %s' % item)
+            for path in matches:
+                if os.path.isdir(path):
+                    for subpath in iter_paths([path]):
+                        yield subpath
+                else:
+                    yield path
+
+
+def iter_file_documents(inputs):
+    '''
+     Yields (path, text) for every file found in inputs (see iter_paths). Each file is one document.
+    '''
+    for path in iter_paths(inputs):
+        f = open(path)
+        try:
+            yield (path, f.read())
+        finally:
+            f.close()
+
+
+def iter_stream_documents(stream, input_format='lines'):
+    '''
+     Yields (id, text) for each document in a line-oriented stream.
+       lines - each non-empty line is a document, id is the line number
+       jsonl - each line is a JSON object with the document in "doc" (or "text"), and optional "id"
+     Lines that are not JSON objects are yielded as (line number, InputError).
+    '''
+    for (lineno, line) in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        if input_format == 'jsonl':
+            try:
+                record = json.loads(line)
+            except ValueError, e:
+                yield (lineno, InputError('line %d: %s' % (lineno, str(e))))
+                continue
+            if not isinstance(record, dict):
+                yield (lineno, InputError('line %d: expected a JSON object' % lineno))
+                continue
+            text = record.get('doc', record.get('text'))
+            yield (record.get('id', lineno), text)
+        else:
+            yield (lineno, line.rstrip('\r\n'))
+
+
+def iter_documents(inputs=None, stream=None, input_format='lines'):
+    '''
+     Yields (id, text) for documents in file inputs (see iter_paths), followed by documents in stream, if given.
+    '''
+    if inputs:
+        for doc in iter_file_documents(inputs):
+            yield doc
+    if stream is not None:
+        for doc in iter_stream_documents(stream, input_format):
+            yield doc
+
+
+#
+# Scoring
+#
+def score_document(classifier, doc_id, text, tagged=True, annotate=False):
+    '''
+     Scores a single document, returning result dict for document doc_id.
+    '''
+    try:
+        if isinstance(text, InputError):
+            raise text
+        classifier.classify_document(text, tagged=tagged, verbose=False)
+        result = result_summary(classifier.result or {}, annotate)
+    except Exception, e:
+        result = {'error': '%s: %s' % (e.__class__.__name__, str(e))}
+    result['id'] = doc_id
+    return result
+
+
+# classifier and settings used by worker processes, inherited from parent on fork
+_worker_state = {}
+
+def _init_worker(classifier, tagged, annotate):
+    _worker_state['classifier'] = classifier
+    _worker_state['tagged'] = tagged
+    _worker_state['annotate'] = annotate
+
+def _score_chunk(chunk):
+    classifier = _worker_state['classifier']
+    return [score_document(classifier, doc_id, text, _worker_state['tagged'], _worker_state['annotate']) for (doc_id, text) in chunk]
+
+
+def _chunks(docs, chunksize):
+    docs = iter(docs)
+    while True:
+        chunk = list(itertools.islice(docs, chunksize))
+        if not chunk:
+            break
+        yield chunk
+
+
+def score_documents(classifier, docs, workers=1, tagged=True, annotate=False, chunksize=16, max_pending=None, cache=None):
+    '''
+     Scores documents given as iterable of (id, text), yielding one result dict per document, in input order.
+
+     With workers > 1, documents are scored by a pool of worker processes, each with its own copy of classifier
+     (inherited from this process where fork is available). At most max_pending chunks of chunksize documents
+     are in flight at any time (default 2 per worker), which bounds memory use regardless of input size.
+
+     If cache (a resultcache.ResultCache) is given, documents already scored with the same classifier configuration
+     are taken from the cache, and new results are added to it. Cache lookups are done by this process.
+    '''
+    fingerprint = cache and classifier.get_fingerprint()
+    if workers <= 1:
+        for (doc_id, text) in docs:
+            if cache:
+                key = cache.make_key(fingerprint, text, tagged, annotate)
+                result = cache.get(key)
+                if result is None:
+                    result = score_document(classifier, doc_id, text, tagged, annotate)
+                    _cache_result(cache, key, result)
+                result['id'] = doc_id
+                yield result
+            else:
+                yield score_document(classifier, doc_id, text, tagged, annotate)
+        return
+
+    if not max_pending:
+        max_pending = 2*workers
+    pool = multiprocessing.Pool(workers, _init_worker, (classifier, tagged, annotate))
+    try:
+        pending = []
+        # documents sent to workers and not returned yet, by cache key: [result, number of duplicates waiting for it]
+        inflight = {}
+        for chunk in _chunks(docs, chunksize):
+            # (chunk, cache keys, cached results, job scoring the other documents)
+            keys = cached = None
+            if cache:
+                keys = [cache.make_key(fingerprint, text, tagged, annotate) for (doc_id, text) in chunk]
+                cached = []
+                misses = []
+                for (doc, key) in zip(chunk, keys):
+                    if key in inflight:
+                        # duplicate of a document in flight, scored once
+                        inflight[key][1] += 1
+                        cached.append(_INFLIGHT)
+                        continue
+                    result = cache.get(key)
+                    if result is None:
+                        inflight[key] = [None, 0]
+                        misses.append(doc)
+                    cached.append(result)
+            else:
+                misses = chunk
+            job = misses and pool.apply_async(_score_chunk, (misses,))
+            pending.append((chunk, keys, cached, job))
+            if len(pending) >= max_pending:
+                for result in _chunk_results(cache, inflight, *pending.pop(0)):
+                    yield result
+        for job in pending:
+            for result in _chunk_results(cache, inflight, *job):
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _cache_result(cache, key, result):
+    # documents that could not be scored are retried
+    if 'error' not in result:
+        result = dict(result)
+        del result['id']
+        cache.put(key, result)
+
+
+# marks cached result of a document waiting for a duplicate in flight
+_INFLIGHT = object()
+
+def _chunk_results(cache, inflight, chunk, keys, cached, job):
+    '''
+     Returns results of chunk in input order, from cached results and results of job. Results of documents in
+     flight are handed to their duplicates, which always come later in input order.
+    '''
+    scored = job and job.get() or []
+    if not cache:
+        return scored
+    results = []
+    scored = iter(scored)
+    for ((doc_id, text), key, result) in zip(chunk, keys, cached):
+        if result is None:
+            result = scored.next()
+            _cache_result(cache, key, result)
+            entry = inflight[key]
+            if entry[1]:
+                entry[0] = result
+            else:
+                del inflight[key]
+        elif result is _INFLIGHT:
+            # looked up again to count the hit, the result scored may not be cached (errors, eviction)
+            entry = inflight[key]
+            result = cache.get(key)
+            if result is None:
+                result = dict(entry[0])
+            entry[1] -= 1
+            if not entry[1]:
+                del inflight[key]
+        result['id'] = doc_id
+        results.append(result)
+    return results
+
+
+#
+# Columnar output
+#
+class ResultColumns(object):
+    '''
+     Scores and counts of a collection of documents, one row per document position, held in NumPy arrays:
+       resultpos, resultneg - scores (float64)
+       tokens_found, tokens_negated - counts (int32)
+       status - 1 if document was scored, -1 if it could not be scored, 0 if not written yet (int8)
+
+     Arrays are preallocated for size documents. If path is given, each column is a memory-mapped .npy file in
+     directory path (path/resultpos.npy, ...), which can be opened zero-copy with numpy.load(..., mmap_mode='r')
+     or ResultColumns.open(path). Requires NumPy.
+    '''
+    COLUMNS = [('resultpos', 'float64'), ('resultneg', 'float64'), ('tokens_found', 'int32'),
+               ('tokens_negated', 'int32'), ('status', 'int8')]
+
+    def __init__(self, size, path=None):
+        import numpy
+        self.size = size
+        self.path = path
+        self.columns = {}
+        if path and not os.path.isdir(path):
+            os.makedirs(path)
+        for (name, dtype) in self.COLUMNS:
+            if path:
+                self.columns[name] = numpy.lib.format.open_memmap(self._column_path(path, name), mode='w+', dtype=dtype, shape=(size,))
+            else:
+                self.columns[name] = numpy.zeros(size, dtype=dtype)
+
+    @staticmethod
+    def _column_path(path, name):
+        return os.path.join(path, name + '.npy')
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        '''
+         Opens columns written to directory path, memory-mapped with mode 'r' (read-only) or 'r+' (read-write).
+        '''
+        import numpy
+        columns = cls.__new__(cls)
+        columns.path = path
+        columns.columns = dict([(name, numpy.load(cls._column_path(path, name), mmap_mode=mode)) for (name, dtype) in cls.COLUMNS])
+        columns.size = len(columns.columns['status'])
+        return columns
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def write_rows(self, start, rows):
+        '''
+         Writes rows of (resultpos, resultneg, tokens_found, tokens_negated, status) at positions start onwards.
+        '''
+        end = start + len(rows)
+        if end > self.size:
+            raise IndexError('Result columns hold %d documents, got document %d' % (self.size, end - 1))
+        for (k, (name, dtype)) in enumerate(self.COLUMNS):
+            self.columns[name][start:end] = [row[k] for row in rows]
+
+    def flush(self):
+        '''
+         Writes memory-mapped columns to disk.
+        '''
+        for column in self.columns.values():
+            if hasattr(column, 'flush'):
+                column.flush()
+
+
+def score_row(classifier, text, tagged=True):
+    '''
+     Scores a single document, returning row (resultpos, resultneg, tokens_found, tokens_negated, status) of ResultColumns.
+    '''
+    try:
+        if isinstance(text, InputError):
+            raise text
+        (pos, neg) = classifier.classify_document(text, tagged=tagged, verbose=False)
+        result = classifier.result
+        return (pos, neg, result.tokens_found, result.tokens_negated, 1)
+    except Exception:
+        return (0.0, 0.0, 0, 0, -1)
+
+
+def _init_column_worker(classifier, tagged, path):
+    _worker_state['classifier'] = classifier
+    _worker_state['tagged'] = tagged
+    # columns on disk are written by workers directly, each to the slice of its own chunks
+    _worker_state['columns'] = path and ResultColumns.open(path, 'r+')
+
+def _score_column_chunk(args):
+    (start, texts) = args
+    classifier = _worker_state['classifier']
+    rows = [score_row(classifier, text, _worker_state['tagged']) for text in texts]
+    columns = _worker_state['columns']
+    if columns:
+        columns.write_rows(start, rows)
+        columns.flush()
+        return (start, len(rows), None)
+    return (start, len(rows), rows)
+
+
+def score_columns(classifier, docs, columns, workers=1, tagged=True, chunksize=256, max_pending=None):
+    '''
+     Scores documents given as iterable of (id, text) into ResultColumns columns, writing the result of the n-th
+     document at row n. Returns number of documents scored.
+
+     With workers > 1, chunks of chunksize documents are scored by a pool of worker processes (see score_documents).
+     Workers write columns on disk straight into the rows of their chunk; in-memory columns are written by this process.
+    '''
+    count = 0
+    if workers <= 1:
+        rows = []
+        for (doc_id, text) in docs:
+            rows.append(score_row(classifier, text, tagged))
+            if len(rows) >= chunksize:
+                columns.write_rows(count, rows)
+                count += len(rows)
+                rows = []
+        columns.write_rows(count, rows)
+        columns.flush()
+        return count + len(rows)
+
+    if not max_pending:
+        max_pending = 2*workers
+    columns.flush()
+    pool = multiprocessing.Pool(workers, _init_column_worker, (classifier, tagged, columns.path))
+    try:
+        pending = []
+        def collect(job):
+            (start, size, rows) = job.get()
+            if rows is not None:
+                columns.write_rows(start, rows)
+            return size
+        for chunk in _chunks(docs, chunksize):
+            if count + len(chunk) > len(columns):
+                raise IndexError('Result columns hold %d documents, got document %d' % (len(columns), count + len(chunk) - 1))
+            pending.append(pool.apply_async(_score_column_chunk, ((count, [text for (doc_id, text) in chunk]),)))
+            count += len(chunk)
+            if len(pending) >= max_pending:
+                collect(pending.pop(0))
+        for job in pending:
+            collect(job)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return count
+
+
+def write_jsonl(results, out=None):
+    '''
+     Writes each result dict as a line of JSON to out (default stdout). Returns number of results written.
+    '''
+    if out is None:
+        out = sys.stdout
+    count = 0
+    for result in results:
+        out.write(json.dumps(result) + '\n')
+        count += 1
+    out.flush()
+    return count
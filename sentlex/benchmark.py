@@ -0,0 +1,498 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   benchmark.py - reproducible performance benchmarks for sentlex
+
+   Benchmarks run over synthetic POS-tagged corpora generated from the vocabularies of the
+   lexicons shipped with the package (GB1_S.lex and uic.lex), so that results are comparable
+   across machines and releases without any external data.
+
+   Each benchmark is a function registered in BENCHMARKS, taking a parameter dict and returning a
+   dict of measurements. Benchmarks are run in a separate process so that peak memory figures
+   are not polluted by previous runs. Results are plain dicts, ready to be dumped as JSON:
+
+      results = run_benchmarks(default_plan(doclens=[100, 1000]))
+      json.dump(results, open('bench.json', 'w'))
+
+   And two result files can be compared with compare_results().
+'''
+
+import os
+import sys
+import time
+import random
+import platform
+import subprocess
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Penn tags used for each part of speech when generating synthetic documents
+SYNTH_TAGS = {
+    'a': ['JJ', 'JJ', 'JJR', 'JJS'],
+    'v': ['VB', 'VBD', 'VBZ', 'VBG'],
+    'r': ['RB'],
+    'n': ['NN', 'NN', 'NNS'],
+}
+
+# Function words and punctuation mixed into synthetic documents
+SYNTH_FILLER = [
+    ('the', 'DT'), ('a', 'DT'), ('this', 'DT'), ('it', 'PRP'), ('i', 'PRP'),
+    ('was', 'VBD'), ('is', 'VBZ'), ('and', 'CC'), ('of', 'IN'), ('in', 'IN'),
+    ('with', 'IN'), ('to', 'TO'), ('but', 'CC'), ('very', 'RB'), (',', ','),
+]
+SYNTH_NEGATORS = [('not', 'RB'), ("n't", 'RB'), ('no', 'DT'), ('never', 'RB'), ('without', 'IN')]
+SYNTH_EOS = [('.', '.'), ('!', '.'), ('?', '.')]
+
+# default document lengths (in tokens) used in throughput benchmarks
+DEFAULT_DOCLENS = [50, 500, 5000]
+
+
+def _datapath(filename):
+    curpath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(curpath, 'data', filename)
+
+
+def load_vocabulary():
+    '''
+     Reads terms for each part of speech from the lexicon files shipped with the package.
+     Returns dict mapping pos ('a','v','r','n') to a sorted list of single-word terms.
+    '''
+    vocab = {'a': set(), 'v': set(), 'r': set(), 'n': set()}
+    for line in open(_datapath('GB1_S.lex')):
+        entry = line.strip().split(',')
+        if len(entry) >= 2 and entry[1].lower() in vocab:
+            vocab[entry[1].lower()].add(entry[0])
+    for line in open(_datapath('uic.lex')):
+        entry = line.strip().split(',')
+        if len(entry) >= 3 and entry[2] in vocab:
+            vocab[entry[2]].add(entry[1])
+    # multi-word entries never match a single tagged token
+    return dict((pos, sorted([t for t in terms if t and ' ' not in t])) for (pos, terms) in vocab.items())
+
+
+def generate_document(rnd, vocab, doclen, separator='/', sentiment_ratio=0.3, negation_ratio=0.03, sentence_len=15):
+    '''
+     Generates a synthetic POS-tagged document of doclen tokens using random generator rnd.
+     About sentiment_ratio of tokens are drawn from the lexicon vocabulary, negation_ratio are negators,
+     and sentences end on average every sentence_len tokens.
+    '''
+    poslist = [pos for pos in ['a', 'v', 'r', 'n'] if vocab.get(pos)]
+    tokens = []
+    for i in range(doclen):
+        draw = rnd.random()
+        if i == doclen - 1 or draw < 1.0 / sentence_len:
+            (word, tag) = rnd.choice(SYNTH_EOS)
+        elif draw < 1.0 / sentence_len + negation_ratio:
+            (word, tag) = rnd.choice(SYNTH_NEGATORS)
+        elif draw < 1.0 / sentence_len + negation_ratio + sentiment_ratio:
+            pos = rnd.choice(poslist)
+            (word, tag) = (rnd.choice(vocab[pos]), rnd.choice(SYNTH_TAGS[pos]))
+        else:
+            (word, tag) = rnd.choice(SYNTH_FILLER)
+        tokens.append(word + separator + tag)
+    return ' '.join(tokens)
+
+
+def generate_corpus(ndocs, doclen, seed=0, vocab=None, **kwargs):
+    '''
+     Returns list of ndocs synthetic POS-tagged documents with doclen tokens each.
+     The same seed always generates the same corpus.
+    '''
+    if vocab is None:
+        vocab = load_vocabulary()
+    rnd = random.Random(seed)
+    return [generate_document(rnd, vocab, doclen, **kwargs) for i in range(ndocs)]
+
+
+def peak_rss_kb():
+    '''
+     Peak resident set size of current process in KB (0 if not available on this platform)
+    '''
+    if not resource:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # OS X reports bytes
+        peak = peak / 1024
+    return peak
+
+
+def current_rss_kb():
+    '''
+     Current resident set size of this process in KB, read from /proc where available.
+    '''
+    try:
+        f = open('/proc/self/statm')
+        pages = int(f.read().split()[1])
+        f.close()
+        return pages * (os.sysconf('SC_PAGE_SIZE') / 1024)
+    except (IOError, OSError, ValueError, AttributeError):
+        return peak_rss_kb()
+
+
+def private_rss_kb():
+    '''
+     Unique (private, i.e. not shared with any other process) resident memory of this process in KB.
+     Read from /proc/self/smaps - returns None where not available.
+    '''
+    for filename in ['/proc/self/smaps_rollup', '/proc/self/smaps']:
+        try:
+            f = open(filename)
+        except IOError:
+            continue
+        total = 0
+        for line in f:
+            if line.startswith('Private_Clean:') or line.startswith('Private_Dirty:'):
+                total += int(line.split()[1])
+        f.close()
+        return total
+    return None
+
+
+def fork_private_growth(f, workers=2):
+    '''
+     Forks worker processes that each run f(), returning list with growth of private memory (KB) in each worker.
+     Memory inherited from this process stays shared until written to, so the growth shows how much
+     of the parent's data f() forces each worker to copy.
+    '''
+    growth = []
+    for i in range(workers):
+        (rfd, wfd) = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(rfd)
+            try:
+                before = private_rss_kb()
+                f()
+                os.write(wfd, str(private_rss_kb() - before))
+            finally:
+                os._exit(0)
+        os.close(wfd)
+        data = os.read(rfd, 64)
+        os.close(rfd)
+        os.waitpid(pid, 0)
+        growth.append(int(data))
+    return growth
+
+
+def _timeit(f, repeat):
+    '''
+     Runs f() repeat times, returning best wall time in seconds.
+    '''
+    best = None
+    for i in range(max(repeat, 1)):
+        t0 = time.time()
+        f()
+        elapsed = time.time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+#
+# Benchmarks
+#
+LEXICONS = {
+    'moby': 'MobyLexicon',
+    'uic': 'UICLexicon',
+    'swn3': 'SWN3Lexicon',
+}
+
+SCORERS = {
+    'basic': ('sentanalysis', 'AV_AllWordsDocSentiScore'),
+    'potts': ('sentanalysis_potts', 'AV_AggressivePottsSentiScore'),
+    'taboada': ('sentanalysis_taboada', 'AV_AggressiveTabSentiScore'),
+    'sentence': ('sentanalysis_sent', 'SentenceDocSentiScore'),
+}
+
+
+def _get_lexicon(name):
+    import sentlex
+    return getattr(sentlex, LEXICONS[name])()
+
+
+def _get_scorer(name, L):
+    (modname, classname) = SCORERS[name]
+    module = __import__('sentlex.' + modname, fromlist=[classname])
+    return getattr(module, classname)(L)
+
+
+def bench_lexicon_load(params):
+    '''
+     Time to construct (parse + frequency compile) a lexicon object.
+    '''
+    lexname = params.get('lexicon', 'moby')
+    # importing is not part of this measurement
+    import sentlex
+    elapsed = _timeit(lambda: _get_lexicon(lexname), params.get('repeat', 3))
+    return {'seconds': elapsed}
+
+
+def bench_negation(params):
+    '''
+     Throughput of negdetect.getNegationArray over synthetic tagged documents.
+    '''
+    import negdetect
+    corpus = [doc.split() for doc in generate_corpus(params['ndocs'], params['doclen'], seed=params.get('seed', 0))]
+    window = params.get('window', 5)
+
+    def run():
+        for doc in corpus:
+            negdetect.getNegationArray(doc, window)
+
+    elapsed = _timeit(run, params.get('repeat', 3))
+    ntokens = params['ndocs'] * params['doclen']
+    return {'seconds': elapsed, 'docs_per_sec': params['ndocs'] / elapsed, 'tokens_per_sec': ntokens / elapsed}
+
+
+def bench_score(params):
+    '''
+     Throughput of a document scorer (see SCORERS) over synthetic tagged documents.
+    '''
+    L = _get_lexicon(params.get('lexicon', 'moby'))
+    scorer = _get_scorer(params['scorer'], L)
+    corpus = generate_corpus(params['ndocs'], params['doclen'], seed=params.get('seed', 0))
+
+    def run():
+        for doc in corpus:
+            scorer.classify_document(doc, verbose=False)
+
+    elapsed = _timeit(run, params.get('repeat', 3))
+    ntokens = params['ndocs'] * params['doclen']
+    return {'seconds': elapsed, 'docs_per_sec': params['ndocs'] / elapsed, 'tokens_per_sec': ntokens / elapsed}
+
+
+def touch_lexicon(L, freq=True):
+    '''
+     Looks up every term of every part of speech in lexicon L - as a worker scoring a large corpus eventually would.
+     If freq is True, also looks up frequencies.
+    '''
+    freq = freq and L.LexFreq
+    for (table, getter) in [(L.A, L.getadjective), (L.V, L.getverb), (L.R, L.getadverb), (L.N, L.getnoun)]:
+        for term in table:
+            getter(term)
+            if freq: L.get_freq(term)
+
+
+def bench_fork_share(params):
+    '''
+     Per-worker private memory growth when forked workers read a lexicon loaded by their parent.
+     storage is 'dict' (regular lexicon), 'compact' (sentlex.CompactLexicon) or 'disk' (sentlex.DiskLexicon).
+    '''
+    import gc
+    import tempfile
+    import sentlex
+    import disklex
+    L = _get_lexicon(params.get('lexicon', 'moby'))
+    storage = params.get('storage', 'dict')
+    path = None
+    if storage == 'compact':
+        L = sentlex.CompactLexicon(L)
+    elif storage == 'disk':
+        (fd, path) = tempfile.mkstemp(suffix='.slx')
+        os.close(fd)
+        disklex.write_disk_lexicon(path, L)
+        L = disklex.DiskLexicon(path)
+    gc.collect()
+    try:
+        growth = fork_private_growth(lambda: touch_lexicon(L), params.get('workers', 2))
+    finally:
+        if path: os.unlink(path)
+    return {'worker_private_kb': growth}
+
+
+def bench_result_memory(params):
+    '''
+     Memory held per result when the results of every document in a corpus are kept.
+     storage is 'result' (ScoreResult, as returned by DocSentiScore.result) or 'dict' (resultdata dict).
+    '''
+    import gc
+    L = _get_lexicon(params.get('lexicon', 'moby'))
+    scorer = _get_scorer(params.get('scorer', 'basic'), L)
+    corpus = generate_corpus(params['ndocs'], params['doclen'], seed=params.get('seed', 0))
+    storage = params.get('storage', 'result')
+    # first pass warms up lemma caches and lookup tables, so only results are counted
+    for doc in corpus:
+        scorer.classify_document(doc, verbose=False)
+    gc.collect()
+    before = current_rss_kb()
+    results = []
+    for doc in corpus:
+        scorer.classify_document(doc, verbose=False)
+        if storage == 'dict':
+            results.append(scorer.resultdata)
+        else:
+            results.append(scorer.result)
+    gc.collect()
+    growth = current_rss_kb() - before
+    return {'rss_growth_kb': growth, 'bytes_per_result': growth * 1024.0 / len(results)}
+
+
+def bench_lexicon_reload(params):
+    '''
+     Background reload of a lexicon handle (see lexhandle) while a scorer keeps classifying documents: latency from
+     reload request to publishing, build time, memory growth while building, and how long the old version stayed
+     in memory after publishing (overlap_seconds) - until the scorer moved on to its next document.
+    '''
+    import lexhandle
+    lexname = params.get('lexicon', 'moby')
+    handle = lexhandle.LexiconHandle(lambda: _get_lexicon(lexname))
+    scorer = _get_scorer(params.get('scorer', 'basic'), handle)
+    corpus = generate_corpus(params['ndocs'], params['doclen'], seed=params.get('seed', 0))
+    for doc in corpus:
+        scorer.classify_document(doc, verbose=False)
+    reloading = handle.reload()
+    scored = 0
+    while reloading.is_alive():
+        scorer.classify_document(corpus[scored % len(corpus)], verbose=False)
+        scored += 1
+    reloading.join()
+    scorer.classify_document(corpus[0], verbose=False)
+    stats = handle.get_stats()
+    return {'seconds': stats['latency_seconds'], 'build_seconds': stats['build_seconds'], 'rss_growth_kb': stats['rss_growth_kb'],
+            'overlap_seconds': stats['overlap_seconds'], 'docs_during_reload': scored}
+
+
+# scripts timed by the cold start benchmark, run on a fresh interpreter
+COLD_START_SCRIPTS = {
+    'import': 'import sentlex',
+    'first_classification': '''
+import sentlex
+import sentlex.sentanalysis
+L = sentlex.%(lexicon)s()
+sentlex.sentanalysis.AV_AllWordsDocSentiScore(L).classify_document('this/DT is/VBZ a/DT good/JJ movie/NN ./.')
+''',
+}
+
+
+def bench_cold_start(params):
+    '''
+     Wall time for a fresh interpreter to import sentlex, and to import, load a lexicon and classify one document.
+     Interpreter startup alone ('python -c pass') is measured as a baseline.
+    '''
+    curpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = curpath + os.pathsep + env.get('PYTHONPATH', '')
+
+    def run_script(script):
+        return _timeit(lambda: subprocess.check_call([sys.executable, '-c', script], env=env), params.get('repeat', 3))
+
+    result = {'baseline_seconds': run_script('pass')}
+    for (name, script) in COLD_START_SCRIPTS.items():
+        result[name + '_seconds'] = run_script(script % {'lexicon': LEXICONS[params.get('lexicon', 'moby')]})
+    result['seconds'] = result['first_classification_seconds']
+    return result
+
+
+BENCHMARKS = {
+    'cold_start': bench_cold_start,
+    'fork_share': bench_fork_share,
+    'lexicon_load': bench_lexicon_load,
+    'lexicon_reload': bench_lexicon_reload,
+    'negation': bench_negation,
+    'result_memory': bench_result_memory,
+    'score': bench_score,
+}
+
+
+def _run_in_child(args):
+    '''
+     Worker entry point: runs one benchmark and adds memory figures.
+    '''
+    (name, params) = args
+    base_rss = current_rss_kb()
+    result = BENCHMARKS[name](params)
+    result['base_rss_kb'] = base_rss
+    result['peak_rss_kb'] = peak_rss_kb()
+    return result
+
+
+def run_benchmark(name, params, isolate=True):
+    '''
+     Runs a single benchmark, returning dict with benchmark name, parameters and measurements.
+     When isolate is True, benchmark runs in a fresh process so peak memory is measured for this run only.
+    '''
+    if isolate:
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+            result = pool.apply(_run_in_child, ((name, params),))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        result = _run_in_child((name, params))
+    return {'benchmark': name, 'params': params, 'result': result}
+
+
+def default_plan(doclens=None, ndocs=20, lexicons=None, scorers=None, repeat=3):
+    '''
+     Returns default list of (benchmark name, params) to run.
+    '''
+    if not doclens: doclens = DEFAULT_DOCLENS
+    if not lexicons: lexicons = ['moby', 'uic']
+    if not scorers: scorers = ['basic', 'potts', 'taboada', 'sentence']
+    plan = [('cold_start', {'lexicon': lexicons[0], 'repeat': repeat})]
+    for lexname in lexicons:
+        plan.append(('lexicon_load', {'lexicon': lexname, 'repeat': repeat}))
+        if hasattr(os, 'fork'):
+            for storage in ['dict', 'compact', 'disk']:
+                plan.append(('fork_share', {'lexicon': lexname, 'storage': storage, 'workers': 2}))
+    for doclen in doclens:
+        plan.append(('negation', {'ndocs': ndocs, 'doclen': doclen, 'window': 5, 'repeat': repeat}))
+    for scorer in scorers:
+        for doclen in doclens:
+            plan.append(('score', {'scorer': scorer, 'lexicon': lexicons[0], 'ndocs': ndocs, 'doclen': doclen, 'repeat': repeat}))
+    plan.append(('lexicon_reload', {'scorer': scorers[0], 'lexicon': lexicons[0], 'ndocs': ndocs, 'doclen': doclens[0]}))
+    for storage in ['dict', 'result']:
+        plan.append(('result_memory', {'scorer': scorers[0], 'lexicon': lexicons[0], 'ndocs': 1000, 'doclen': doclens[-1], 'storage': storage}))
+    return plan
+
+
+def run_benchmarks(plan=None, isolate=True, progress=None):
+    '''
+     Runs list of benchmarks given as (name, params) tuples - default_plan() if not given.
+     Returns JSON-serializable dict with run metadata and list of results.
+     progress, if given, is called with each result as benchmarks complete.
+    '''
+    if plan is None:
+        plan = default_plan()
+    results = []
+    for (name, params) in plan:
+        result = run_benchmark(name, params, isolate)
+        if progress: progress(result)
+        results.append(result)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results
+    }
+
+
+def _result_key(result):
+    return (result['benchmark'],) + tuple(sorted((k, str(v)) for (k, v) in result['params'].items() if k != 'repeat'))
+
+
+def compare_results(old, new, metric='seconds'):
+    '''
+     Compares two results dicts from run_benchmarks() on a given metric.
+     Returns list of (benchmark, params, old value, new value, new/old ratio) for benchmarks found in both.
+    '''
+    oldmap = dict((_result_key(r), r) for r in old['results'])
+    comparison = []
+    for r in new['results']:
+        previous = oldmap.get(_result_key(r))
+        if not previous or metric not in r['result'] or metric not in previous['result']:
+            continue
+        oldval = previous['result'][metric]
+        newval = r['result'][metric]
+        ratio = oldval and (newval / float(oldval)) or None
+        comparison.append((r['benchmark'], r['params'], oldval, newval, ratio))
+    return comparison
@@ -0,0 +1,382 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   disklex.py - disk based lexicons, for lexicons too large to be held in memory
+
+   A lexicon file holds one section per part of speech (and optionally one for term frequencies).
+   Each section is a list of records sorted by term:
+
+      key length (2 bytes) | key (utf-8) | values (width x 8 byte floats)
+
+   Followed by a block index - the file offset of every "blocksize"-th record. A lookup does a
+   binary search over the block index, then scans a single block. Files are read through mmap,
+   so pages are only read from disk as needed, and are shared by all processes using the file.
+
+   Lexicon files are written from any loaded lexicon:
+
+      write_disk_lexicon('moby.slx', sentlex.MobyLexicon())
+      L = DiskLexicon('moby.slx')
+
+   Or one part of speech at a time, straight from a loader function (see sentlex.ResourceLexicon),
+   so that at most one POS dictionary is in memory while building:
+
+      build_disk_lexicon('custom.slx', 'Custom', myloader, 'custom.lex')
+'''
+
+import os
+import mmap
+import json
+import hashlib
+import heapq
+import marshal
+import struct
+import tempfile
+from array import array
+
+import sentlex
+from docscoreutil import LRUCache
+
+# names exported to the sentlex package
+__all__ = ['DiskLexicon', 'DiskLexiconWriter', 'write_disk_lexicon', 'build_disk_lexicon']
+
+MAGIC = 'SENTLEXD'
+VERSION = 1
+# magic, version, header offset
+PREAMBLE = struct.Struct('<8sIQ')
+KEYLEN = struct.Struct('<H')
+
+DEFAULT_BLOCKSIZE = 64
+DEFAULT_CACHESIZE = 4096
+# records sorted in memory before spilling to temporary files
+DEFAULT_SORTBUFFER = 500000
+
+
+def _encode(key):
+    if isinstance(key, unicode):
+        return key.encode('utf-8')
+    return key
+
+
+def _sorted_records(items, sortbuffer):
+    '''
+     Sorts iterable of (key, values) by key, spilling sorted runs of sortbuffer records to temporary files
+     and merging them if input does not fit in one run.
+    '''
+    run = []
+    runfiles = []
+    for (key, values) in items:
+        run.append((_encode(key), tuple(values)))
+        if len(run) >= sortbuffer:
+            runfiles.append(_spill(run))
+            run = []
+    run.sort()
+    if not runfiles:
+        for record in run:
+            yield record
+        return
+    runfiles.append(_spill(run))
+    try:
+        for record in heapq.merge(*[_read_run(f) for f in runfiles]):
+            yield record
+    finally:
+        for f in runfiles:
+            f.close()
+
+
+def _spill(run):
+    run.sort()
+    f = tempfile.TemporaryFile()
+    for record in run:
+        marshal.dump(record, f)
+    f.seek(0)
+    return f
+
+
+def _read_run(f):
+    while True:
+        try:
+            yield marshal.load(f)
+        except EOFError:
+            return
+
+
+class DiskLexiconWriter(object):
+    '''
+     Writes a lexicon file section by section. Sections are 'a', 'v', 'r', 'n', and 'f' for frequencies.
+    '''
+    def __init__(self, path, name, blocksize=DEFAULT_BLOCKSIZE, sortbuffer=DEFAULT_SORTBUFFER):
+        self.path = path
+        self.header = {'name': name, 'blocksize': blocksize, 'sections': {}}
+        self.blocksize = blocksize
+        self.sortbuffer = sortbuffer
+        # written to a temporary name, and renamed on close() - readers never see a partial file
+        self.tmppath = path + '.tmp'
+        self.f = open(self.tmppath, 'wb')
+        self.f.write(PREAMBLE.pack(MAGIC, VERSION, 0))
+
+    def add_section(self, pos, items, width=2, distro=None):
+        '''
+         Writes section pos from iterable of (term, values), in any order. values is a tuple of width floats.
+         Terms must be unique within a section.
+        '''
+        assert pos not in self.header['sections'], 'Section %s already written' % pos
+        f = self.f
+        record = struct.Struct('<%dd' % width)
+        index = []
+        count = 0
+        lastkey = None
+        for (key, values) in _sorted_records(items, self.sortbuffer):
+            assert key != lastkey, 'Duplicate term in section %s: %s' % (pos, key)
+            assert len(key) <= 0xffff, 'Term too long'
+            if count % self.blocksize == 0:
+                index.append(f.tell())
+            f.write(KEYLEN.pack(len(key)))
+            f.write(key)
+            f.write(record.pack(*values))
+            lastkey = key
+            count += 1
+        end = f.tell()
+        f.write(struct.pack('<%dQ' % len(index), *index))
+        # block index follows the last record
+        self.header['sections'][pos] = {'count': count, 'width': width, 'end': end, 'nblocks': len(index), 'distro': distro}
+
+    def close(self):
+        f = self.f
+        header_offset = f.tell()
+        f.write(json.dumps(self.header))
+        f.seek(0)
+        f.write(PREAMBLE.pack(MAGIC, VERSION, header_offset))
+        f.close()
+        os.rename(self.tmppath, self.path)
+
+
+def _lexicon_sections(L, D):
+    return ((term, L.getbestvalues(term, D)) for term in D)
+
+
+def write_disk_lexicon(path, L, blocksize=DEFAULT_BLOCKSIZE):
+    '''
+     Writes lexicon L (any Lexicon with populated A/V/R/N dictionaries) to a lexicon file.
+     Scores are resolved at write time, as for sentlex.CompactLexicon.
+    '''
+    writer = DiskLexiconWriter(path, L.get_name(), blocksize)
+    for pos in ['a', 'v', 'r', 'n']:
+        D = getattr(L, pos.upper())
+        writer.add_section(pos, _lexicon_sections(L, D), 2, L._termdistro(D))
+    if L.LexFreq:
+        writer.add_section('f', ((term, (L.get_freq(term),)) for term in L.LexFreq), 1)
+    writer.close()
+
+
+def build_disk_lexicon(path, name, loader, datafile, blocksize=DEFAULT_BLOCKSIZE):
+    '''
+     Writes a lexicon file from a loader function f(pos, datafile) (see sentlex.ResourceLexicon),
+     loading one part of speech at a time. Frequencies are not written - use DiskLexicon.compile_frequency().
+    '''
+    L = sentlex.Lexicon()
+    writer = DiskLexiconWriter(path, name, blocksize)
+    for pos in ['a', 'v', 'r', 'n']:
+        D = loader(pos, datafile)
+        writer.add_section(pos, _lexicon_sections(L, D), 2, L._termdistro(D))
+        D = None
+    writer.close()
+
+
+class DiskTable(object):
+    '''
+      Read-only string-keyed table of fixed-width float records, stored in a section of a lexicon file.
+      Same interface as sentlex.PackedTable - iteration yields keys, and "in"/has_key()/get() work as for a dict.
+      Results of recent lookups (including misses) are kept in a cache of cachesize entries.
+    '''
+    def __init__(self, mm, section, blocksize, cachesize=DEFAULT_CACHESIZE):
+        self.mm = mm
+        self.size = section['count']
+        self.width = section['width']
+        self.end = section['end']
+        self.distro = section.get('distro') and tuple(section['distro'])
+        self.blocksize = blocksize
+        self.record = struct.Struct('<%dd' % self.width)
+        self.index = array('l', struct.unpack_from('<%dQ' % section['nblocks'], mm, self.end))
+        self.cache = LRUCache(cachesize)
+
+    def _key_at(self, offset):
+        keylen = KEYLEN.unpack_from(self.mm, offset)[0]
+        return self.mm[offset + 2:offset + 2 + keylen]
+
+    def _search(self, key):
+        index = self.index
+        (lo, hi) = (0, len(index))
+        # last block starting with a key <= key
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(index[mid]) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        mm = self.mm
+        offset = index[lo - 1]
+        recsize = self.record.size
+        for i in xrange(self.blocksize):
+            if offset >= self.end:
+                break
+            keylen = KEYLEN.unpack_from(mm, offset)[0]
+            curkey = mm[offset + 2:offset + 2 + keylen]
+            if curkey == key:
+                return self.record.unpack_from(mm, offset + 2 + keylen)
+            if curkey > key:
+                break
+            offset += 2 + keylen + recsize
+        return None
+
+    def get(self, key, default=None):
+        '''
+          Returns tuple of values stored for key, or default if not found
+        '''
+        key = _encode(key)
+        values = self.cache.get(key, False)
+        if values is False:
+            values = self._search(key)
+            self.cache[key] = values
+        if values is None:
+            return default
+        return values
+
+    def has_key(self, key):
+        return self.get(key) is not None
+
+    __contains__ = has_key
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        mm = self.mm
+        recsize = self.record.size
+        offset = self.index and self.index[0] or self.end
+        while offset < self.end:
+            keylen = KEYLEN.unpack_from(mm, offset)[0]
+            yield mm[offset + 2:offset + 2 + keylen]
+            offset += 2 + keylen + recsize
+
+    def iteritems(self):
+        mm = self.mm
+        recsize = self.record.size
+        offset = self.index and self.index[0] or self.end
+        while offset < self.end:
+            keylen = KEYLEN.unpack_from(mm, offset)[0]
+            yield (mm[offset + 2:offset + 2 + keylen], self.record.unpack_from(mm, offset + 2 + keylen))
+            offset += 2 + keylen + recsize
+
+
+class DiskLexicon(sentlex.Lexicon):
+    '''
+      Read-only lexicon served from a lexicon file (see write_disk_lexicon()), for lexicons too large to be held in memory.
+      Only the block indexes and a cache of recently looked up terms (cachesize entries per part of speech) are kept in memory.
+
+        L = DiskLexicon('custom.slx')
+
+      Like sentlex.CompactLexicon, A, V, R and N support iteration over terms, len() and membership,
+      but not access to individual sense tuples. A DiskLexicon can be used by scorers, or added to a CompositeLexicon.
+    '''
+    def __init__(self, path=None, cachesize=DEFAULT_CACHESIZE):
+        super(DiskLexicon,self).__init__()
+        self.cachesize = cachesize
+        self.mm = None
+        if path: self.open(path)
+
+    def open(self, path):
+        '''
+          Opens lexicon file at path
+        '''
+        f = open(path, 'rb')
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        (magic, version, header_offset) = PREAMBLE.unpack_from(mm, 0)
+        assert magic == MAGIC and version == VERSION, 'Not a lexicon file (or unsupported version): %s' % path
+        header = json.loads(mm[header_offset:])
+        sections = header['sections']
+        blocksize = header['blocksize']
+        self.path = path
+        self.mm = mm
+        self._fingerprint = None
+        self.LexName = str(header['name'])
+        self.A = DiskTable(mm, sections['a'], blocksize, self.cachesize)
+        self.V = DiskTable(mm, sections['v'], blocksize, self.cachesize)
+        self.R = DiskTable(mm, sections['r'], blocksize, self.cachesize)
+        self.N = DiskTable(mm, sections['n'], blocksize, self.cachesize)
+        if 'f' in sections:
+            self.LexFreq = DiskTable(mm, sections['f'], blocksize, self.cachesize)
+            self.is_compiled = True
+        self.is_loaded = True
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+            self.mm = None
+            self.is_loaded = False
+
+    def _termdistro(self, A):
+        if isinstance(A, DiskTable):
+            return A.distro
+        return super(DiskLexicon,self)._termdistro(A)
+
+    def get_freq(self, term):
+        if not isinstance(self.LexFreq, DiskTable):
+            # compiled with compile_frequency()
+            return super(DiskLexicon,self).get_freq(term)
+        return self.LexFreq.get(term, (0.0,))[0]
+
+    def get_fingerprint(self):
+        '''
+          Digest of the lexicon file, computed once per open file
+        '''
+        if not self._fingerprint:
+            digest = hashlib.sha1()
+            mm = self.mm
+            for offset in xrange(0, len(mm), 1 << 20):
+                digest.update(mm[offset:offset + (1 << 20)])
+            self._fingerprint = (mm, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def cache_info(self):
+        '''
+          Returns dict of (hits, misses, size) of lookup caches, by POS
+        '''
+        return dict([(pos, (T.cache.hits, T.cache.misses, len(T.cache))) for (pos, T) in
+                     [('a', self.A), ('v', self.V), ('r', self.R), ('n', self.N)]])
+
+    def getbestvalues(self, key, A):
+        values = A.get(key)
+        if values is None or (values[0] == 0.0 and values[1] == 0.0):
+            # same as getbestvalues() for terms w/out polarity
+            return (0,0)
+        return values
+
+    def hasnoun(self, term):
+        return term in self.N
+
+    def hasverb(self, term):
+        return term in self.V
+
+    def hasadverb(self, term):
+        return term in self.R
+
+    def hasadjective(self, term):
+        return term in self.A
+
+    def getadjective(self, term):
+        return self.getbestvalues(term, self.A)
+
+    def getadverb(self, term):
+        return self.getbestvalues(term, self.R)
+
+    def getverb(self, term):
+        return self.getbestvalues(term, self.V)
+
+    def getnoun(self, term):
+        return self.getbestvalues(term, self.N)
@@ -10,9 +10,41 @@ import sentlex
 import re
 import math
 import os
+import collections
 import negdetect
 import stopwords
 
+# Token parsing
+
+def str2tuple(s, sep='/'):
+    '''
+     Splits a tagged token string "word/TAG" into tuple (word, TAG) on the rightmost separator.
+     Returns (s, None) if separator is not found. Same behaviour as nltk.tag.str2tuple,
+     without requiring NLTK to be imported.
+    '''
+    loc = s.rfind(sep)
+    if loc >= 0:
+        return (s[:loc], s[loc+len(sep):].upper())
+    else:
+        return (s, None)
+
+# Result export
+
+def result_summary(resultdata, annotate=False):
+    '''
+     Returns JSON-serializable dict summarizing a classifier's resultdata:
+     scores and token counts, plus the annotated document if annotate is True.
+    '''
+    summary = {
+        'resultpos': resultdata.get('resultpos'),
+        'resultneg': resultdata.get('resultneg'),
+        'tokens_found': resultdata.get('tokens_found'),
+        'tokens_negated': resultdata.get('tokens_negated'),
+    }
+    if annotate:
+        summary['annotated_doc'] = resultdata.get('annotated_doc')
+    return summary
+
 # Score adjustment functions
 
 def scoreSimple(score, position, totaltags):
@@ -41,6 +73,137 @@ def scoreAdjModular(score, position, totaltags):
         return (score + 0.0) / 2.0
 
 
+# Caching
+
+class LRUCache(object):
+    '''
+     Dictionary-like cache holding up to maxsize items, discarding least recently used items first.
+     Keeps count of hits and misses on get().
+    '''
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.items[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self.items.pop(key, None)
+        self.items[key] = value
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Position weighting functions
+#
+# A weighting function w(score, i, N) adjusts the score of the i-th token (1-based) of a document of N tokens.
+# Functions can be registered by name, optionally with a vector form table(N) returning the list of weights
+# for positions 0..N, so that w(score, i, N) == score * table(N)[i]. Scorers then compute weights once per
+# document length and index into them. Functions registered as identity leave scores untouched.
+
+WeightFunction = collections.namedtuple('WeightFunction', ['name', 'function', 'table', 'identity'])
+
+WEIGHT_FUNCTIONS = {}
+
+# weight tables for recently seen (function, document length) pairs
+_weight_tables = LRUCache(256)
+
+def register_weight_function(name, function, table=None, identity=False):
+    '''
+     Registers weighting function under name, making it available to scorers via score_function=name.
+     table(N), if given, must return weights for positions 0..N such that function(score, i, N) == score * table(N)[i].
+    '''
+    WEIGHT_FUNCTIONS[name] = WeightFunction(name, function, table, identity)
+    # drop any tables computed by a function previously registered under this name
+    _weight_tables.clear()
+
+def get_weight_function(function):
+    '''
+     Returns registered WeightFunction given its name or function object, or None if not registered.
+    '''
+    if isinstance(function, basestring):
+        return WEIGHT_FUNCTIONS.get(function)
+    for entry in WEIGHT_FUNCTIONS.values():
+        if entry.function is function:
+            return entry
+    return None
+
+def get_position_weights(function, N):
+    '''
+     Returns weights for positions 0..N of a document of N tokens for a weighting function (name or function object):
+       - list of weights, if function is registered with a vector form
+       - () if function is registered as identity
+       - None otherwise, meaning the function itself must be called for each token
+    '''
+    entry = get_weight_function(function)
+    if entry is None:
+        return None
+    if entry.identity:
+        return ()
+    if entry.table is None or N == 0:
+        return None
+    key = (entry.name, N)
+    weights = _weight_tables.get(key)
+    if weights is None:
+        weights = _weight_tables[key] = entry.table(N)
+    return weights
+
+def weightNoop(score, i, N):
+    '''
+     no-op weighting - returns score as-is
+    '''
+    return score
+
+def weightLinear(score, i, N):
+    '''
+     linear weighting - scores vary from 0.5 to 1.0 of original value from start to end of document
+    '''
+    if N == 0:
+        return score
+    return score*(((float(i)/float(N))*0.5)+0.5)
+
+def linearWeights(N):
+    return [((float(i)/float(N))*0.5)+0.5 for i in range(N+1)]
+
+def _cosine_weight(norm_i):
+    return 0.5+((math.cos(20.0*norm_i/math.pi)+1.0)/4.0)
+
+def weightCosine(score, i, N):
+    '''
+     cosine weighting - heavier weight for scores at start and end of document, ranging from 0.5 to 1.0
+    '''
+    if N == 0:
+        return score
+    return score*_cosine_weight(float(i)/float(N))
+
+def cosineWeights(N):
+    return [_cosine_weight(float(i)/float(N)) for i in range(N+1)]
+
+register_weight_function('noop', weightNoop, identity=True)
+register_weight_function('linear', weightLinear, linearWeights)
+register_weight_function('cosine', weightCosine, cosineWeights)
+
+
 # Voting schemes
 
 def majorityVote(resultList, shift, threshold):
@@ -0,0 +1,167 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   lexhandle.py - versioned lexicons, reloaded while in use
+
+   A LexiconHandle holds the current version of a lexicon, built by a builder function (such as a
+   lexicon class). Reloading builds a new version in a background thread, then publishes it in one
+   step. Lexicon objects are never modified once published, so documents being scored keep the
+   version they started with, and a version is freed when the last classifier using it moves on:
+
+      handle = LexiconHandle(lambda: load_custom_lexicon('custom.lex'))
+      classifier = AV_AllWordsDocSentiScore(handle)
+      ...
+      handle.reload()          # returns at once, classifiers pick up the new version between documents
+      print handle.get_stats()
+
+   Classifiers given a handle (see DocSentiScore.set_lexicon) take its current version once at the
+   start of each document. Build time, reload latency, memory growth while building, and how long
+   retired versions stay in memory are kept for each version (see get_versions).
+'''
+
+import time
+import weakref
+import threading
+
+
+def _rss_kb():
+    # benchmark is only imported when reloading, as it pulls in multiprocessing
+    import benchmark
+    return benchmark.current_rss_kb()
+
+
+class LexiconHandle(object):
+    '''
+     Current version of a lexicon built by builder, a function taking no arguments and returning a loaded lexicon.
+     If lexicon is given it is published as the first version, otherwise the builder is called once here.
+    '''
+    def __init__(self, builder, lexicon=None):
+        self.builder = builder
+        self.lock = threading.Lock()
+        self.lexicon = None
+        self.version = 0
+        # record of each version, by version number (see get_versions)
+        self.versions = {}
+        # weak references to retired versions still in memory
+        self.retired = {}
+        self.reloading = None
+        self.failed_reloads = 0
+        self.last_error = None
+        if lexicon is None:
+            t0 = time.time()
+            lexicon = builder()
+            self.publish(lexicon, build_seconds=time.time() - t0)
+        else:
+            self.publish(lexicon)
+
+    def get(self):
+        '''
+         Returns current version of the lexicon.
+        '''
+        return self.lexicon
+
+    def get_version(self):
+        return self.version
+
+    def publish(self, lexicon, build_seconds=None, requested=None, rss_growth_kb=None):
+        '''
+         Makes lexicon the current version, returning its version number. The previous version is retired, and
+         freed as soon as no classifier holds it.
+        '''
+        assert lexicon.is_loaded or lexicon.is_deferred, 'Lexicon must be loaded before use.'
+        with self.lock:
+            now = time.time()
+            old = (self.lexicon, self.version)
+            self.version += 1
+            self.versions[self.version] = {
+                'version': self.version,
+                'name': lexicon.get_name(),
+                'build_seconds': build_seconds,
+                # time from reload request to publishing
+                'latency_seconds': requested and now - requested,
+                'rss_growth_kb': rss_growth_kb,
+                'published': now,
+                'retired': None,
+                'freed': None,
+            }
+            # a single assignment - readers see either the old or the new version
+            self.lexicon = lexicon
+            if old[0] is not None:
+                self.versions[old[1]]['retired'] = now
+                self.retired[old[1]] = weakref.ref(old[0], self._freed_callback(old[1]))
+            return self.version
+
+    def _freed_callback(self, version):
+        def freed(ref):
+            self.versions[version]['freed'] = time.time()
+            self.retired.pop(version, None)
+        return freed
+
+    def reload(self, background=True):
+        '''
+         Builds a new version with builder and publishes it. In the background (default), returns the thread
+         building it at once - a reload already in progress is returned instead of starting another.
+         Otherwise waits for the new version and returns its number. If the builder fails, the current version
+         is kept, and the error is found in last_error.
+        '''
+        if not background:
+            return self._reload()
+        with self.lock:
+            if self.reloading is None or not self.reloading.is_alive():
+                self.reloading = threading.Thread(target=self._reload, name='lexicon-reload')
+                self.reloading.daemon = True
+                self.reloading.start()
+            return self.reloading
+
+    def _reload(self):
+        requested = time.time()
+        rss = _rss_kb()
+        try:
+            lexicon = self.builder()
+        except Exception, e:
+            self.failed_reloads += 1
+            self.last_error = '%s: %s' % (e.__class__.__name__, str(e))
+            return None
+        build_seconds = time.time() - requested
+        return self.publish(lexicon, build_seconds, requested, _rss_kb() - rss)
+
+    def wait(self, timeout=None):
+        '''
+         Waits for a background reload to finish, if any. Returns current version number.
+        '''
+        reloading = self.reloading
+        if reloading is not None:
+            reloading.join(timeout)
+        return self.version
+
+    def get_versions(self):
+        '''
+         Returns list with record of each version, oldest first: version number, lexicon name, build_seconds,
+         latency_seconds (from reload request to publishing), rss_growth_kb (growth of resident memory while
+         building), and times the version was published, retired (replaced) and freed (None if not yet).
+        '''
+        with self.lock:
+            return [dict(self.versions[version]) for version in sorted(self.versions)]
+
+    def get_stats(self):
+        '''
+         Returns dict with current version, number of reloads and failed reloads, number of versions in memory,
+         and for the last reload its build time, latency, memory growth and overlap_seconds - how long the
+         version it replaced stayed in memory (None while still held by a classifier).
+        '''
+        versions = self.get_versions()
+        last = versions[-1]
+        stats = {
+            'version': self.version,
+            'reloads': len(versions) - 1,
+            'failed_reloads': self.failed_reloads,
+            'live_versions': 1 + len(self.retired),
+            'build_seconds': last['build_seconds'],
+            'latency_seconds': last['latency_seconds'],
+            'rss_growth_kb': last['rss_growth_kb'],
+            'overlap_seconds': None,
+        }
+        if len(versions) > 1 and versions[-2]['freed'] is not None:
+            stats['overlap_seconds'] = versions[-2]['freed'] - versions[-2]['retired']
+        return stats
@@ -22,6 +22,8 @@
   
 '''
 import re
+import itertools
+import collections
 
 # Pseudo-negations - to be ignored by the algorithm
 NEG_PSEUDO = set([
@@ -113,6 +115,194 @@ NEG_ENDOFWINDOW = set([
     'therefore'
 ])
 
+class NegationTracker(object):
+    '''
+      Incremental negation detector.
+      Receives tokens one at a time or in chunks via feed(), keeping negation window state between calls, and returns
+      negation flags (1 negated, 0 not) as soon as they are known. A token's flag depends on the token that follows it
+      (for bigram patterns), so each feed() returns flags up to, but not including, the last token fed. close() returns
+      the flag for the last token and resets the tracker for a new document.
+
+         tracker = NegationTracker(4, postag=True)
+         flags = tracker.feed(chunk1) + tracker.feed(chunk2) + tracker.close()
+
+      Flags are the same as those returned by getNegationArray for the concatenated chunks.
+      If postag is set and separator is not given, the separator is guessed from the first tokens (see guess_pos_separator).
+    '''
+    def __init__(self, windowsize, postag=False, separator=None, debugmode=False):
+        self.windowsize = windowsize
+        self.postag = postag
+        self.separator = separator
+        self.debugmode = debugmode
+        self.guess_separator = postag and not separator
+        self.reset()
+
+    def reset(self):
+        '''
+         Clears window state, readying tracker for a new document.
+        '''
+        self.inwindow = 0
+        self.found_neg_fwd = False
+        # word awaiting the next token to complete its bigram
+        self.pending = None
+        # tokens held back until POS separator is known
+        self.head = []
+        if self.guess_separator:
+            self.separator = None
+
+    def debug(self, msg):
+        if self.debugmode: print '[NegationTracker] - %s' % msg
+
+    def getword(self, token):
+        if self.postag:
+            token = token.split(self.separator)[0]
+        return token.lower()
+
+    def feed(self, tokens):
+        '''
+         Adds tokens to the document being tracked, returning list of flags for all tokens still pending, except the last one.
+        '''
+        if self.postag and self.separator is None:
+            self.head.extend(tokens)
+            if len(self.head) < 2:
+                return []
+            self.separator = guess_pos_separator(self.head)
+            (tokens, self.head) = (self.head, [])
+        postag = self.postag
+        separator = self.separator
+        windowsize = self.windowsize
+        inwindow = self.inwindow
+        found_neg_fwd = self.found_neg_fwd
+        unigram = self.pending
+        flags = []
+        for token in tokens:
+            if postag:
+                token = token.split(separator)[0]
+            nextword = token.lower()
+            if unigram is None:
+                unigram = nextword
+                continue
+            bigram = unigram + ' ' + nextword
+
+            # pre negations, unless this is a pseudo negation
+            if (bigram not in NEG_PSEUDO) and ((unigram in NEG_PRENEGATION) or (bigram in NEG_PRENEGATION)):
+                found_neg_fwd = True
+                if self.debugmode: self.debug('Found fwd negation at vicinity of: %s ' % bigram)
+
+            flag = 0
+            if found_neg_fwd:
+                if inwindow < windowsize:
+                    flag = 1
+                    inwindow += 1
+                else:
+                    found_neg_fwd = False
+                    inwindow = 0
+
+            # end of window resets negation state
+            if (unigram in NEG_ENDOFWINDOW) or (bigram in NEG_ENDOFWINDOW):
+                if self.debugmode: self.debug('End of negating window at %s.' % unigram)
+                inwindow = 0
+                found_neg_fwd = False
+
+            flags.append(flag)
+            unigram = nextword
+        self.inwindow = inwindow
+        self.found_neg_fwd = found_neg_fwd
+        self.pending = unigram
+        return flags
+
+    def close(self):
+        '''
+         Ends current document, returning flag for last pending token (an empty list if there is none), and resets tracker.
+        '''
+        flags = []
+        if self.head:
+            # document too short to guess separator from two tokens
+            self.separator = guess_pos_separator(self.head)
+            (head, self.head) = (self.head, [])
+            flags = self.feed(head)
+        unigram = self.pending
+        if unigram is not None:
+            flag = 0
+            if self.found_neg_fwd or (unigram in NEG_PRENEGATION):
+                if self.inwindow < self.windowsize:
+                    flag = 1
+            flags.append(flag)
+        self.reset()
+        return flags
+
+
+class NegationMask(object):
+    '''
+      Compact negation mask for a document: one byte per token (1 negated, 0 not), held in a bytearray.
+
+      Behaves like the list returned by getNegationArray for reading: mask[i] is an int, slices are lists,
+      len(), iteration, sum() and comparison with lists work as before. In addition:
+         count   - number of negated tokens
+         windows - list of (start, end) token ranges of negated windows, end exclusive
+         tolist() - mask as a list of ints
+         asarray() - mask as a NumPy bool array sharing the same memory (requires NumPy)
+    '''
+    __slots__ = ('mask', 'count', 'windows')
+
+    def __init__(self, flags=()):
+        self.mask = bytearray(flags)
+        self.count = self.mask.count('\x01')
+        windows = []
+        if self.count:
+            mask = self.mask
+            size = len(mask)
+            start = mask.find('\x01')
+            while start >= 0:
+                end = mask.find('\x00', start)
+                if end < 0:
+                    end = size
+                windows.append((start, end))
+                start = mask.find('\x01', end)
+        self.windows = windows
+
+    def __len__(self):
+        return len(self.mask)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self.mask[i])
+        return self.mask[i]
+
+    def __iter__(self):
+        return iter(self.mask)
+
+    def __eq__(self, other):
+        if isinstance(other, NegationMask):
+            return self.mask == other.mask
+        return list(self.mask) == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'NegationMask(%s)' % str(list(self.mask))
+
+    def tolist(self):
+        return list(self.mask)
+
+    def asarray(self):
+        import numpy
+        if not self.mask:
+            return numpy.zeros(0, dtype=numpy.bool_)
+        return numpy.frombuffer(self.mask, dtype=numpy.bool_)
+
+
+def getNegationMask(doc, windowsize, debugmode=False, postag=True):
+    '''
+      Same as getNegationArray, returning a NegationMask instead of a list.
+    '''
+    assert type(doc) is list, 'Input document must be a list of POS-tagged tokens'
+    (doc, postag) = _token_words(doc, postag)
+    tracker = NegationTracker(windowsize, postag=postag, debugmode=debugmode)
+    return NegationMask(tracker.feed(doc) + tracker.close())
+
+
 def getNegationArray(doc, windowsize, debugmode=False, postag=True):
     '''
       NegEx-based negation detection algorithm for text.
@@ -124,97 +314,55 @@ def getNegationArray(doc, windowsize, debugmode=False, postag=True):
 
       Arguments
       ---------
-         doc        - input doc as *list* of tokens, with or w/out part of speech
+         doc        - input doc as *list* of tokens, with or w/out part of speech, or list of (word, tag) tuples
          windowsize - the default cut off window size that limits the scope of a negation.
          debugmode  - prints more stuff
-         postag     - True/False, whether input document has been POS-tagged 
+         postag     - True/False, whether input document has been POS-tagged (ignored for (word, tag) tuples)
     '''
+    # check input is a list
+    assert type(doc) is list, 'Input document must be a list of POS-tagged tokens'
+    (doc, postag) = _token_words(doc, postag)
 
-    def debug(msg):
-        if debugmode: print '[getNegationArray] - %s' % msg
+    tracker = NegationTracker(windowsize, postag=postag, debugmode=debugmode)
+    return tracker.feed(doc) + tracker.close()
 
-    def get_pos_separator(doc):
-        '''
-         given a list of tokens "guesses" the part of speech separator based on first tokens
-        '''
-        docsize=len(doc)
-        if docsize>0 and re.search('[/_]', doc[0]):
-            separator = doc[0][re.search('[/_]', doc[0]).start()]
-        elif docsize>1 and re.search('[/_]', doc[1]):
-            # second try
-            separator = doc[1][re.search('[/_]', doc[1]).start()]
-        elif separator not in '_/':
-            debug('Warning. Could not find a separator from input. Using "_"')
-            separator = '_'
-        return separator
-
-    def get_next_ngram(doc, docsize, position, n, postag, separator):
-        '''
-         Returns next n-gram from document, stripping part of speech.
-         If position+n is larger than doc lenght, returns smallest n-gram that fits end of document.
-        '''
-        grams = []
-        for igram in range(n):
-            if position < (docsize - igram):
-                if postag:
-                    grams.append(doc[position + igram].split(separator)[0])
-                else:
-                    grams.append(doc[position + igram])
-        return ' '.join(grams).lower()
 
-    # check input is a list
-    assert type(doc) is list, 'Input document must be a list of POS-tagged tokens'
+def _token_words(doc, postag):
+    '''
+     Returns (tokens, postag) for a document given as list of tokens - words are taken as they are from (word, tag) tuples.
+    '''
+    if doc and not isinstance(doc[0], basestring):
+        return ([token[0] or '' for token in doc], False)
+    return (doc, postag)
 
-    # Initialise array
-    vNEG = [0 for t in range(len(doc))]
-    # Initialise window counters
-    winstart = 0
-    docsize = len(doc)
-    i = 0
-    found_pseudo = False
-    found_neg_fwd = False
-    found_neg_bck = False
-    inwindow = 0
-    separator = '_'
-    if postag: separator = get_pos_separator(doc)
-
-    for i in range(docsize):
-        unigram = get_next_ngram(doc, docsize, i, 1, postag, separator)
-        bigram = get_next_ngram(doc, docsize, i, 2, postag, separator)
-
-        # Search for pseudo negations
-        if bigram in NEG_PSEUDO:
-            found_pseudo = True
-
-        # Look for pre negations
-        if not found_pseudo:
-            if (unigram in NEG_PRENEGATION) or (bigram in NEG_PRENEGATION):
-                found_neg_fwd = True
-                debug('Found fwd negation at vicinity of: %s ' % bigram)
-            if (unigram in NEG_POSNEGATION) or (bigram in NEG_POSNEGATION):
-                found_neg_bck = True
-                debug('Found back negation at vicinity of: %s' % bigram)
-
-        # If found fwd/backw negation, then negate window
-        if found_neg_fwd:
-            # negate terms forward up to window
-            if inwindow < windowsize:
-                vNEG[i] = 1
-                inwindow += 1
-            else:
-                # out of window space. Reset fwd negation and window
-                found_neg_fwd = False
-                inwindow = 0
 
-        # now move window
-        if (unigram in NEG_ENDOFWINDOW) or (bigram in NEG_ENDOFWINDOW):
-            # found end of negation, must reset window and negation state
-            debug('End of negating window at %d, %s.' % (i, unigram))
-            inwindow = 0
-            found_neg_fwd = False
-            winstart = i
+def guess_pos_separator(tokens, default='_'):
+    '''
+     Given a list of POS-tagged tokens, guesses the part of speech separator ('/' or '_') from the first two tokens.
+    '''
+    for token in tokens[:2]:
+        m = re.search('[/_]', token)
+        if m:
+            return token[m.start()]
+    return default
 
-        # Always reset pseudo
-        found_pseudo = False
 
-    return vNEG
+def iterNegation(tokens, windowsize, postag=False, separator=None, debugmode=False, chunksize=64):
+    '''
+      Streaming version of getNegationArray.
+      Receives any iterable of tokens (a list, or a generator reading a large file) and yields (token, flag) for each token,
+      where flag is 1 if token is negated, 0 otherwise. Tokens are passed to a NegationTracker in chunks of chunksize,
+      so memory use does not depend on input size.
+    '''
+    tracker = NegationTracker(windowsize, postag=postag, separator=separator, debugmode=debugmode)
+    pending = collections.deque()
+    tokens = iter(tokens)
+    while True:
+        chunk = list(itertools.islice(tokens, chunksize))
+        if not chunk:
+            break
+        pending.extend(chunk)
+        for flag in tracker.feed(chunk):
+            yield (pending.popleft(), flag)
+    for flag in tracker.close():
+        yield (pending.popleft(), flag)
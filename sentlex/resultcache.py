@@ -0,0 +1,117 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   resultcache.py - cache of document results, for collections with repeated documents
+
+   Results are keyed by a digest of the document text, the tagged/annotate flags and the classifier's
+   fingerprint (its configuration and lexicon contents - see DocSentiScore.get_fingerprint), so a
+   change of parameters or lexicon never returns stale results. Recently used results are held in
+   memory, and optionally in a SQLite file that persists across runs:
+
+      cache = ResultCache(maxsize=10000, path='results.db')
+      for result in batch.score_documents(classifier, docs, cache=cache):
+          ...
+      print cache.get_stats()
+      cache.close()
+'''
+
+import json
+import sqlite3
+import hashlib
+
+from docscoreutil import LRUCache
+
+DEFAULT_CACHESIZE = 10000
+# results written to the SQLite file between commits
+DEFAULT_COMMIT_EVERY = 1000
+
+
+class ResultCache(object):
+    '''
+     Result summaries (see docscoreutil.result_summary) by key (see make_key). Up to maxsize results are held in
+     memory, least recently used discarded first. If path is given, results are also stored in a SQLite file,
+     looked up on memory misses.
+    '''
+    def __init__(self, maxsize=DEFAULT_CACHESIZE, path=None, commit_every=DEFAULT_COMMIT_EVERY):
+        self.memory = LRUCache(maxsize)
+        self.path = path
+        self.commit_every = commit_every
+        self.db = None
+        self.uncommitted = 0
+        self.disk_hits = 0
+        if path:
+            self.db = sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT)')
+            self.db.commit()
+
+    @staticmethod
+    def make_key(fingerprint, text, tagged=True, annotate=False):
+        '''
+         Returns key of result of scoring document text with classifier of given fingerprint.
+        '''
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        elif not isinstance(text, str):
+            # pre-tokenized documents
+            text = repr(text)
+        digest = hashlib.sha1('%s %d %d\0' % (fingerprint, bool(tagged), bool(annotate)))
+        digest.update(text)
+        return digest.hexdigest()
+
+    def get(self, key):
+        '''
+         Returns a copy of result stored under key, or None if not found.
+        '''
+        result = self.memory.get(key)
+        if result is None and self.db is not None:
+            row = self.db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row:
+                self.disk_hits += 1
+                result = json.loads(row[0])
+                self.memory[key] = result
+        if result is None:
+            return None
+        return dict(result)
+
+    def put(self, key, result):
+        '''
+         Stores result dict under key.
+        '''
+        self.memory[key] = dict(result)
+        if self.db is not None:
+            self.db.execute('INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)', (key, json.dumps(result)))
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.flush()
+
+    def get_stats(self):
+        '''
+         Returns dict with hits (memory_hits + disk_hits), misses, hit_rate and number of results held in memory.
+        '''
+        # a disk hit is a miss of the memory cache
+        hits = self.memory.hits + self.disk_hits
+        misses = self.memory.misses - self.disk_hits
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'memory_hits': self.memory.hits,
+            'disk_hits': self.disk_hits,
+            'hit_rate': total and float(hits) / total or 0.0,
+            'size': len(self.memory),
+        }
+
+    def flush(self):
+        '''
+         Commits results written to the SQLite file.
+        '''
+        if self.db is not None and self.uncommitted:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
@@ -0,0 +1,177 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   scoreserver.py - long running scoring service
+
+   Keeps a lexicon and classifier loaded in memory, and scores documents sent over a local socket
+   (Unix domain socket, or TCP). The protocol is newline-delimited JSON, one request per line:
+
+      {"doc": "this/DT is/VBZ good/JJ", "tagged": true, "annotate": false, "id": 1}
+
+   And one response line per request, in the same order:
+
+      {"id": 1, "resultpos": 0.5, "resultneg": 0.0, "tokens_found": 2, "tokens_negated": 0}
+
+   A request that cannot be processed gets a response of the form {"id": 1, "error": "message"}.
+   Addresses are either a filesystem path (Unix socket) or "host:port" (TCP).
+
+   If the classifier's lexicon is a lexhandle.LexiconHandle, {"command": "reload"} rebuilds it in the
+   background while requests are still served with the current version (see reload_lexicon), and
+   {"command": "lexicon"} returns the handle's stats.
+'''
+
+import os
+import json
+import socket
+import threading
+import SocketServer
+
+from docscoreutil import result_summary
+
+
+def parse_address(address):
+    '''
+     Returns (family, address) for a server address string: "host:port" for TCP, anything else is a Unix socket path.
+    '''
+    if ':' in address and not os.path.sep in address:
+        (host, port) = address.rsplit(':', 1)
+        return (socket.AF_INET, (host or 'localhost', int(port)))
+    return (socket.AF_UNIX, address)
+
+
+class ScoreRequestHandler(SocketServer.StreamRequestHandler):
+    '''
+     Reads requests from a connection until client closes it, writing one response per request.
+    '''
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            response = self.server.process_request_line(line)
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class ScoreServerMixin(object):
+    '''
+     Request processing shared by TCP and Unix socket servers.
+     Classifiers keep per-document state, so documents are scored one at a time across connections.
+    '''
+    def setup_classifier(self, classifier):
+        self.classifier = classifier
+        self.classifier_lock = threading.Lock()
+
+    def reload_lexicon(self, wait=False):
+        '''
+         Rebuilds the classifier's lexicon handle in the background, returning the thread doing it. Requests are served
+         with the current version until the new one is published, and the old version is released right after.
+        '''
+        handle = self.classifier.lexicon_handle
+        if handle is None:
+            raise ValueError('Classifier lexicon can not be reloaded')
+        def reload():
+            handle.reload().join()
+            # release the old version now, rather than on the next request
+            with self.classifier_lock:
+                self.classifier._pin_lexicon()
+        thread = threading.Thread(target=reload, name='lexicon-reload-release')
+        thread.daemon = True
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def process_command(self, command):
+        handle = self.classifier.lexicon_handle
+        if command == 'reload':
+            self.reload_lexicon()
+            return {'reloading': True, 'version': handle.get_version()}
+        elif command == 'lexicon':
+            if handle is None:
+                return {'version': None, 'name': self.classifier.L.get_name()}
+            return handle.get_stats()
+        raise ValueError('Unknown command: %s' % command)
+
+    def process_request_line(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if 'command' in request:
+                response = self.process_command(request['command'])
+                response['id'] = request_id
+                return response
+            doc = request['doc']
+            with self.classifier_lock:
+                self.classifier.classify_document(doc, tagged=request.get('tagged', True), verbose=False)
+                response = result_summary(self.classifier.result or {}, request.get('annotate', False))
+        except Exception, e:
+            response = {'error': '%s: %s' % (e.__class__.__name__, str(e))}
+        response['id'] = request_id
+        return response
+
+
+class TCPScoreServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer, ScoreServerMixin):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixScoreServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer, ScoreServerMixin):
+    daemon_threads = True
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def create_server(address, classifier):
+    '''
+     Creates a scoring server bound to address, serving requests with classifier (a DocSentiScore object
+     with lexicon and parameters already set). Call serve_forever() on returned object to start serving.
+    '''
+    (family, addr) = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            # remove stale socket from a previous run
+            os.unlink(addr)
+        server = UnixScoreServer(addr, ScoreRequestHandler)
+    else:
+        server = TCPScoreServer(addr, ScoreRequestHandler)
+    server.setup_classifier(classifier)
+    return server
+
+
+class ScoreClient(object):
+    '''
+     Client for a scoring server. Keeps a single connection open for any number of requests.
+    '''
+    def __init__(self, address, timeout=None):
+        (family, addr) = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        if timeout: self.sock.settimeout(timeout)
+        self.sock.connect(addr)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+        self.request_id = 0
+
+    def classify_document(self, Doc, tagged=True, annotate=False):
+        '''
+         Sends document to server, returning response dict (see module docs)
+        '''
+        self.request_id += 1
+        self.wfile.write(json.dumps({'id': self.request_id, 'doc': Doc, 'tagged': tagged, 'annotate': annotate}) + '\n')
+        self.wfile.flush()
+        line = self.rfile.readline()
+        if not line:
+            raise IOError('Connection closed by scoring server')
+        return json.loads(line)
+
+    def close(self):
+        self.wfile.close()
+        self.rfile.close()
+        self.sock.close()
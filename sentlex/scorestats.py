@@ -0,0 +1,70 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   scorestats.py - opt-in instrumentation for document scorers
+
+   A ScoreStats object collects wall time per classification stage and event counters,
+   aggregated over all classify_document() calls of the scorers it is attached to:
+
+      stats = ScoreStats()
+      classifier.set_stats(True, stats)
+      classifier.classify_document(doc)
+      stats.as_dict()
+
+   Scorers hold no stats object by default, in which case no timing calls are made.
+'''
+
+import time
+import collections
+
+# stages timed by document scorers, in pipeline order
+STAGES = ['tagging', 'detect_tag', 'negation', 'lemmatize', 'lookup', 'annotate']
+
+# counters maintained by document scorers
+# (cache_hits counts verb lemmas and lexicon lookups reused within or across documents)
+COUNTERS = ['calls', 'tokens', 'scored_tokens', 'cache_hits', 'lemmatizer_calls']
+
+
+class ScoreStats(object):
+    '''
+     Aggregated per-stage wall time (seconds) and counters for document scoring.
+    '''
+
+    # timer used for all measurements
+    timer = staticmethod(time.time)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+         Clears all timings and counters
+        '''
+        self.times = dict((stage, 0.0) for stage in STAGES)
+        self.counters = collections.Counter(dict((name, 0) for name in COUNTERS))
+
+    def add_time(self, stage, seconds):
+        self.times[stage] = self.times.get(stage, 0.0) + seconds
+
+    def incr(self, name, n=1):
+        self.counters[name] += n
+
+    def merge(self, other):
+        '''
+         Adds timings and counters from another ScoreStats object into this one (e.g. from a worker process)
+        '''
+        for (stage, seconds) in other.times.items():
+            self.add_time(stage, seconds)
+        self.counters.update(other.counters)
+
+    def as_dict(self):
+        '''
+         Returns plain dict export of this object, suitable for JSON and metrics pipelines:
+           {'times': {stage: seconds}, 'counters': {name: count}, 'total_time': seconds}
+        '''
+        return {
+            'times': dict(self.times),
+            'counters': dict(self.counters),
+            'total_time': sum(self.times.values()),
+        }
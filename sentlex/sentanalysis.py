@@ -9,16 +9,484 @@
 
 import re
 import math
-import nltk.stem
+import marshal
+import hashlib
 import collections
+from array import array
 
 # library imports
 import sentlex
 import negdetect
 import stopwords
+import scorestats
+from lexhandle import LexiconHandle
 from docscoreutil import *
 
 
+# Resolved parameters of a BasicDocSentiScore (see BasicDocSentiScore.get_config).
+# score_function is the name of a _score_<name> method, or the function itself if user defined.
+# extra holds (name, value) pairs of parameters added by subclasses.
+ScorerConfig = collections.namedtuple('ScorerConfig', ['scorer', 'a', 'v', 'n', 'r',
+                                                       'negation', 'negation_window', 'negated_term_adj',
+                                                       'score_mode', 'score_freq', 'score_stop', 'score_function', 'extra'])
+
+# Penn Treebank tag patterns for each part of speech, in order of precedence
+POS_TAG_PATTERNS = [('a', re.compile('(JJ|JJ.)$')), ('v', re.compile('(VB|VB.)$')), ('r', re.compile('RB$')), ('n', re.compile('NN$'))]
+
+# tag -> part of speech tables, one per combination of active parts of speech
+_tag_tables = {}
+
+# verb lemmas memoized per classifier (see BasicDocSentiScore._lemmatize_verb)
+DEFAULT_LEMMA_CACHE = 50000
+
+def get_tag_table(a, v, n, r):
+    '''
+     Returns dict mapping POS tags to active part of speech ('a', 'v', 'r', 'n'), or '' for tags that are not scored.
+     Tables are shared by all classifiers with same active parts of speech, and filled in as new tags are seen.
+    '''
+    key = (bool(a), bool(v), bool(n), bool(r))
+    table = _tag_tables.get(key)
+    if table is None:
+        table = _tag_tables[key] = {}
+    return table
+
+def tag_pos(table, tag, a, v, n, r):
+    '''
+     Looks up tag in table returned by get_tag_table, matching tag against POS_TAG_PATTERNS if not seen before.
+    '''
+    pos = table.get(tag)
+    if pos is None:
+        active = {'a': a, 'v': v, 'r': r, 'n': n}
+        pos = ''
+        for (thispos, pattern) in POS_TAG_PATTERNS:
+            if active[thispos] and pattern.search(tag):
+                pos = thispos
+        table[tag] = pos
+    return pos
+
+
+# lookup entry for tokens whose part of speech is not scored
+NOT_SCORED = ('', (0,0))
+
+def is_tokenized(Doc):
+    '''
+     True if Doc is a pre-tokenized document rather than a string (see token_pairs).
+    '''
+    return not isinstance(Doc, basestring)
+
+def token_pairs(Doc):
+    '''
+     Returns pre-tokenized document Doc as a sequence of (word, tag) pairs. Doc is either a sequence of
+     (word, tag) pairs, or a tuple of two parallel lists (words, tags).
+    '''
+    if type(Doc) is tuple and len(Doc) == 2 and type(Doc[0]) is list:
+        (words, tags) = Doc
+        assert len(words) == len(tags), 'Word and tag lists differ in length'
+        return zip(words, tags)
+    return Doc
+
+
+class PreparedDoc(object):
+    '''
+     Tokenized form of a POS-tagged document, shared by every scan of the same document:
+       doc - original document
+       tags - list of word/TAG token strings
+       parsed - list of (word, TAG) for each token, with word in lowercase. (word, None) for corrupt tokens.
+                Tag strings are parsed when first needed.
+       tokens - (word, tag) pairs of pre-tokenized documents, None for string documents
+       negmasks - NegationMask cache, by negation window
+       lookups - lexicon lookups per token, by lexicon and active parts of speech (see BasicDocSentiScore.get_lookups)
+       wordscores - (pos, scoretuple) by (pos, word), per lexicon
+       freqs - frequency damping factor by word, per lexicon (see BasicDocSentiScore._get_freq_factor)
+       source, segment - tagged string (or tag list) the tokens come from, and token range (start, end) of slices,
+                         kept by ScoreResult to rebuild the annotated document when needed
+
+     Pre-tokenized documents are given as pairs (see token_pairs), with tags and tagsep as None.
+     Their tag strings use '/' as separator.
+    '''
+    def __init__(self, doc, tags, tagsep, pairs=None):
+        self.doc = doc
+        self.tokens = None
+        parsed = None
+        if pairs is not None:
+            parsed = []
+            # no separator to detect or tokens to split
+            if not isinstance(pairs, (list, tuple)):
+                pairs = list(pairs)
+            tags = []
+            tagsep = '/'
+            for (thisword, thistag) in pairs:
+                if (not thistag) or (not thisword):
+                    thisword = thisword or ''
+                    tags.append(thistag and (thisword + '/' + thistag) or thisword)
+                    parsed.append((thisword, None))
+                else:
+                    tags.append(thisword + '/' + thistag)
+                    parsed.append((thisword.lower(), thistag.upper()))
+            self.tokens = pairs
+        self.tags = tags
+        # tagged string or tag list the tokens were split from, and (start, end) of slices in it (see slice)
+        self.source = tags
+        self.segment = None
+        self.tagsep = tagsep
+        # tag strings are parsed when first needed (see _get_parsed)
+        self._parsed = parsed
+        self.negmasks = {}
+        self.lookups = {}
+        self.wordscores = {}
+        self.freqs = {}
+
+    def slice(self, start, end):
+        '''
+         Returns PreparedDoc for tokens start to end-1 of this document (e.g. a sentence), without parsing them again.
+         Negation masks and lookups already computed for this document are sliced, and word scores are shared.
+        '''
+        part = PreparedDoc.__new__(PreparedDoc)
+        part.doc = self.doc
+        part.tags = self.tags[start:end]
+        part.tagsep = self.tagsep
+        part._parsed = self._parsed and self._parsed[start:end]
+        part.source = self.source
+        offset = self.segment and self.segment[0] or 0
+        part.segment = (offset + start, offset + end)
+        part.tokens = None
+        if self.tokens is not None:
+            part.tokens = self.tokens[start:end]
+        part.negmasks = dict([(key, negdetect.NegationMask(negmask.mask[start:end])) for (key, negmask) in self.negmasks.iteritems()])
+        part.lookups = dict([(key, lookups[start:end]) for (key, lookups) in self.lookups.iteritems()])
+        part.wordscores = self.wordscores
+        part.freqs = self.freqs
+        return part
+
+    def _get_parsed(self):
+        parsed = self._parsed
+        if parsed is None:
+            parsed = []
+            tagsep = self.tagsep
+            for tagword in self.tags:
+                # retrieves tuple (word, POS tag) from current word+tag string
+                (thisword, thistag) = str2tuple(tagword, sep=tagsep)
+                if (not thistag) or (not thisword):
+                    parsed.append((thisword, None))
+                else:
+                    parsed.append((thisword.lower(), thistag))
+            self._parsed = parsed
+        return parsed
+
+    parsed = property(_get_parsed)
+
+    def _get_words(self):
+        return [word for (word, tag) in self.parsed]
+
+    words = property(_get_words)
+
+    def __len__(self):
+        return len(self.tags)
+
+
+# header of files written by write_prepared
+PREPARED_MAGIC = 'SENTLEXP'
+PREPARED_VERSION = 1
+
+def write_prepared(path, docs):
+    '''
+     Writes PreparedDoc objects in docs to file in path: tokens, tags, and the word scores and frequency factors
+     computed so far (see BasicDocSentiScore.resolve_document), by lexicon fingerprint.
+     Negation masks are not written, as they are recomputed from the tokens for each negation window.
+     Returns number of documents written.
+    '''
+    count = 0
+    f = open(path, 'wb')
+    try:
+        marshal.dump((PREPARED_MAGIC, PREPARED_VERSION), f)
+        for prepared in docs:
+            assert prepared.segment is None, 'Slices of prepared documents can not be written'
+            source = prepared.source
+            if not isinstance(source, basestring):
+                source = list(source)
+            tokens = prepared.tokens
+            if tokens is not None:
+                tokens = list(tokens)
+            wordscores = dict([(L.get_fingerprint(), scores) for (L, scores) in prepared.wordscores.iteritems()])
+            freqs = dict([(L.get_fingerprint(), factors) for (L, factors) in prepared.freqs.iteritems()])
+            marshal.dump((prepared.doc, source, prepared.tagsep, tokens, prepared.parsed, wordscores, freqs), f)
+            count += 1
+    finally:
+        f.close()
+    return count
+
+def read_prepared(path, lexicons=()):
+    '''
+     Iterates over PreparedDoc objects written to path by write_prepared. Word scores and frequency factors are
+     restored for each lexicon in lexicons, when written for a lexicon of the same fingerprint (same contents).
+     Scoring these documents with those lexicons then needs no tagging, lemmatizing or lexicon lookups.
+    '''
+    byfingerprint = dict([(L.get_fingerprint(), L) for L in lexicons])
+    f = open(path, 'rb')
+    try:
+        header = marshal.load(f)
+        assert header == (PREPARED_MAGIC, PREPARED_VERSION), 'Not a prepared document file, or unsupported version'
+        while True:
+            try:
+                (doc, source, tagsep, tokens, parsed, wordscores, freqs) = marshal.load(f)
+            except EOFError:
+                break
+            prepared = PreparedDoc.__new__(PreparedDoc)
+            PreparedDoc.__init__(prepared, doc, isinstance(source, basestring) and source.split() or source, tagsep)
+            prepared.source = source
+            prepared.tokens = tokens
+            prepared._parsed = parsed
+            for (fingerprint, L) in byfingerprint.iteritems():
+                if fingerprint in wordscores:
+                    prepared.wordscores[L] = wordscores[fingerprint]
+                if fingerprint in freqs:
+                    prepared.freqs[L] = freqs[fingerprint]
+            yield prepared
+    finally:
+        f.close()
+
+
+
+# resultdata keys held by a ScoreResult, and those built from its token data when first read
+RESULT_FIELDS = ('doc', 'resultpos', 'resultneg', 'tokens_found', 'tokens_negated')
+RESULT_TOKEN_FIELDS = ('annotated_doc', 'found_list', 'unscored_list')
+_MISSING = object()
+
+class ScoreResult(object):
+    '''
+     Result of scoring one document, as found in DocSentiScore.result. Holds scores and counts
+     (doc, resultpos, resultneg, tokens_found, tokens_negated), and keeps the token data of the scan
+     in compact arrays instead of building annotated_doc, found_list and unscored_list for every document:
+       source, segments - tagged string (or tag list) of the document, and flat list of (start, end) token ranges
+                          scanned in it, None for the whole document
+       scored - index of each scored token, with its (pos, neg) contribution in values and negation flag in negflags
+                (None if negation detection was off)
+       unscored - index of scored tokens not found in the lexicon
+       corrupt - index of tokens left out of the annotated document
+       extra - dict of fields added by other classifiers (e.g. sentence_scores)
+
+     annotated_doc, found_list and unscored_list are built when first read, and kept. The result reads like the
+     old resultdata dict (result['tokens_found'], result.get('annotated_doc')), and as_dict() returns it as one.
+    '''
+    __slots__ = ('doc', 'resultpos', 'resultneg', 'tokens_found', 'tokens_negated', 'extra',
+                 'source', 'segments', 'scored', 'values', 'negflags', 'unscored', 'corrupt', '_fields')
+
+    def __init__(self, doc=None, resultpos=0, resultneg=0, tokens_found=0, tokens_negated=0, extra=None):
+        self.doc = doc
+        self.resultpos = resultpos
+        self.resultneg = resultneg
+        self.tokens_found = tokens_found
+        self.tokens_negated = tokens_negated
+        self.extra = extra
+        self.source = None
+        self.segments = None
+        self.scored = None
+        self.values = None
+        self.negflags = None
+        self.unscored = None
+        self.corrupt = None
+        self._fields = None
+
+    @classmethod
+    def from_scan(cls, prepared, resultpos, resultneg, tokens_negated, scored, values, negflags, unscored, corrupt):
+        '''
+         Returns result of a scan of PreparedDoc prepared. scored, unscored and corrupt are token indices in prepared,
+         values a flat list of (pos, neg) contributions of scored tokens, and negflags a bytearray (or None).
+        '''
+        result = cls(prepared.doc, resultpos, resultneg, len(scored), tokens_negated)
+        result.source = prepared.source
+        offset = 0
+        if prepared.segment:
+            offset = prepared.segment[0]
+            result.segments = array('l', prepared.segment)
+        if offset:
+            scored = [i + offset for i in scored]
+            unscored = [i + offset for i in unscored]
+            corrupt = [i + offset for i in corrupt]
+        result.scored = array('l', scored)
+        # str() of ints and floats differs in the annotated document - lexicons with int scores keep a list
+        for value in values:
+            if type(value) is not float:
+                break
+        else:
+            values = array('d', values)
+        result.values = values
+        result.negflags = negflags
+        result.unscored = array('l', unscored)
+        result.corrupt = array('l', corrupt)
+        return result
+
+    @classmethod
+    def from_dict(cls, resultdata):
+        '''
+         Returns result holding fields of resultdata dict, as set by classifiers that build their own.
+        '''
+        result = cls(*[resultdata.get(key, 0) for key in RESULT_FIELDS])
+        result._fields = resultdata
+        return result
+
+    @classmethod
+    def join(cls, doc, results, resultpos, resultneg, extra=None):
+        '''
+         Returns result of a document scored in parts (e.g. sentences) from results of each part, with annotated
+         documents concatenated, counts added, and resultpos/resultneg given. Token data is kept unbuilt if
+         all parts were scanned from the same document.
+        '''
+        joined = cls(doc, resultpos, resultneg, sum([r.tokens_found for r in results]),
+                     sum([r.tokens_negated for r in results]), extra)
+        source = None
+        if results: source = results[0].source
+        if source is not None and all([(r.source is source) and (r.segments is not None) and (r._fields is None) and\
+                                       ((r.negflags is None) == (results[0].negflags is None)) for r in results]):
+            joined.source = source
+            joined.segments = array('l')
+            joined.scored = array('l')
+            joined.unscored = array('l')
+            joined.corrupt = array('l')
+            if all([type(r.values) is array for r in results]):
+                joined.values = array('d')
+            else:
+                joined.values = []
+            if results[0].negflags is not None:
+                joined.negflags = bytearray()
+            for r in results:
+                for attr in ['segments', 'scored', 'values', 'unscored', 'corrupt']:
+                    getattr(joined, attr).extend(getattr(r, attr))
+                if r.negflags is not None:
+                    joined.negflags.extend(r.negflags)
+            return joined
+        found = collections.Counter()
+        unscored = []
+        for r in results:
+            found.update(r.get('found_list') or ())
+            unscored += r.get('unscored_list') or []
+        joined._fields = dict([(key, getattr(joined, key)) for key in RESULT_FIELDS])
+        joined._fields.update({'annotated_doc': ''.join([r.get('annotated_doc') or '' for r in results]),
+                               'found_list': found, 'unscored_list': unscored})
+        if extra:
+            joined._fields.update(extra)
+        return joined
+
+    def copy(self, **fields):
+        '''
+         Returns a copy of this result sharing its token data, with fields (doc, resultpos, resultneg, extra, ...) replaced.
+        '''
+        result = ScoreResult.__new__(ScoreResult)
+        for attr in ScoreResult.__slots__:
+            setattr(result, attr, getattr(self, attr))
+        if self._fields is not None:
+            result._fields = dict(self._fields)
+            for key in (self.extra or {}):
+                result._fields.pop(key, None)
+            result._fields.update(fields.get('extra') or {})
+        for (key, value) in fields.iteritems():
+            setattr(result, key, value)
+            if result._fields is not None and key in RESULT_FIELDS:
+                result._fields[key] = value
+        return result
+
+    def rebase(self, source, start):
+        '''
+         Returns copy of the result of a range of tokens (see PreparedDoc.slice), for the same tokens found at
+         position start of source (a tagged string or tag list).
+        '''
+        result = ScoreResult(self.doc, self.resultpos, self.resultneg, self.tokens_found, self.tokens_negated, self.extra)
+        result.source = source
+        result.values = self.values
+        result.negflags = self.negflags
+        shift = start - self.segments[0]
+        for attr in ['segments', 'scored', 'unscored', 'corrupt']:
+            positions = getattr(self, attr)
+            if shift and positions:
+                positions = array('l', [i + shift for i in positions])
+            setattr(result, attr, positions)
+        return result
+
+    def _get_tags(self):
+        source = self.source
+        if isinstance(source, basestring):
+            return source.split()
+        return source
+
+    def _build(self, key):
+        tags = self._get_tags()
+        if key == 'found_list':
+            return collections.Counter([tags[i] for i in self.scored])
+        if key == 'unscored_list':
+            return [tags[i] for i in self.unscored]
+        # annotated_doc - tokens joined by ' ' within each range, ranges joined by ''
+        segments = self.segments or (0, len(tags))
+        (scored, values, negflags) = (self.scored, self.values, self.negflags)
+        corrupt = set(self.corrupt)
+        nscored = len(scored)
+        k = 0
+        parts = []
+        for s in xrange(0, len(segments), 2):
+            annotatedTags = []
+            for i in xrange(segments[s], segments[s+1]):
+                if k < nscored and scored[k] == i:
+                    if negflags is None:
+                        negtag = 'NONEG'
+                    else:
+                        negtag = str(negflags[k])
+                    annotatedTags.append(tags[i] + '##NEGAT:' + negtag + '##POS:' + str(values[2*k]) + '##NEG:' + str(values[2*k+1]))
+                    k += 1
+                elif i not in corrupt:
+                    annotatedTags.append(tags[i])
+            parts.append(' '.join(annotatedTags))
+        return ''.join(parts)
+
+    def get(self, key, default=None):
+        fields = self._fields
+        if fields is not None and key in fields:
+            return fields[key]
+        if key in RESULT_FIELDS:
+            return getattr(self, key)
+        if key in RESULT_TOKEN_FIELDS and self.source is not None:
+            value = self._build(key)
+            if fields is None:
+                fields = self._fields = {}
+            fields[key] = value
+            return value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def has_key(self, key):
+        return key in self.keys()
+
+    __contains__ = has_key
+
+    def keys(self):
+        keys = set(RESULT_FIELDS)
+        if self.source is not None:
+            keys.update(RESULT_TOKEN_FIELDS)
+        keys.update(self.extra or {})
+        keys.update(self._fields or {})
+        return list(keys)
+
+    def as_dict(self):
+        '''
+         Returns result as a resultdata dict, building (and keeping) all token fields.
+         The same dict is returned by later calls, so changes to it are seen by get().
+        '''
+        fields = self._fields
+        if fields is None or len(fields) < len(self.keys()):
+            fields = dict([(key, self.get(key)) for key in self.keys()])
+            self._fields = fields
+        return fields
+
+    annotated_doc = property(lambda self: self.get('annotated_doc'))
+    found_list = property(lambda self: self.get('found_list'))
+    unscored_list = property(lambda self: self.get('unscored_list'))
+
+
 class DocSentiScore(object):
     '''
      DocSentiScore
@@ -27,6 +495,13 @@ class DocSentiScore(object):
      given a set of parameters that configure the classification algorithm.
     '''
 
+    # instrumentation is off by default (see set_stats)
+    stats = None
+    # ScoreResult of last document scored
+    result = None
+    # LexiconHandle the lexicon is taken from, if any (see set_lexicon)
+    lexicon_handle = None
+
     def __init__(self):
         # initialize the default stopwords list
         self.objectiveWords = stopwords.Stopword()
@@ -63,9 +538,65 @@ class DocSentiScore(object):
         raise NotImplementedError
 
     def set_lexicon(self, newL):
-        assert newL.is_loaded, 'Lexicon must be loaded before use.'
+        '''
+         Sets lexicon used by this classifier. newL can also be a lexhandle.LexiconHandle: its current version is then
+         taken at the start of each document (see _pin_lexicon), so reloaded lexicons are used from the next document on.
+        '''
+        if isinstance(newL, LexiconHandle):
+            self.lexicon_handle = newL
+            newL = newL.get()
+        else:
+            self.lexicon_handle = None
+        assert newL.is_loaded or newL.is_deferred, 'Lexicon must be loaded before use.'
         self.L = newL
 
+    def _pin_lexicon(self, taken=None):
+        '''
+         Takes current version of the lexicon handle, if any, as self.L for the document about to be scored.
+         taken holds versions already taken by handle, so classifiers working together on a document use the same one.
+         Returns taken.
+        '''
+        handle = self.lexicon_handle
+        if handle is not None:
+            if taken is None:
+                taken = {}
+            L = taken.get(handle)
+            if L is None:
+                L = taken[handle] = handle.get()
+            if L is not self.L:
+                self.L = L
+        return taken
+
+    def set_stats(self, mode=True, stats=None):
+        '''
+         Enables/disables collection of per-stage timings and counters across classify_document calls.
+         An existing scorestats.ScoreStats object can be given to aggregate data from several classifiers.
+        '''
+        if mode:
+            self.stats = stats or scorestats.ScoreStats()
+        else:
+            self.stats = None
+
+    def get_stats(self):
+        '''
+         Returns collected instrumentation data as a dict, or None if instrumentation is disabled.
+        '''
+        if self.stats:
+            return self.stats.as_dict()
+        return None
+
+    def get_fingerprint(self):
+        '''
+         Returns hex digest identifying this classifier's configuration and lexicon, so that documents scored by
+         classifiers with the same fingerprint get the same results (see resultcache).
+         Subclasses with parameters of their own extend _fingerprint_data.
+        '''
+        self._pin_lexicon()
+        return hashlib.sha1(repr(self._fingerprint_data())).hexdigest()
+
+    def _fingerprint_data(self):
+        return (self.__class__.__name__, self.L and self.L.get_fingerprint())
+
     def _detect_tag(self, Doc):
         '''
          For an input doc, detect POS separator (Brown or UPenn), if any, based on first 3 tokens.
@@ -73,7 +604,7 @@ class DocSentiScore(object):
         '''
         def check_sep(sep, tokens):
             # does my separator generates tuples?
-            seplist = [nltk.tag.str2tuple(i, sep=sep)[1] for i in tokens]
+            seplist = [str2tuple(i, sep=sep)[1] for i in tokens]
             if None in seplist:
                 return None
             return sep
@@ -90,9 +621,27 @@ class DocSentiScore(object):
     def pos_tag(self, Doc):
         '''
          Returns POS-tagged document using NLTK's recommended tagger.
+         A pre-tokenized document (list of words) is returned as a list of (word, tag) pairs.
         '''
+        import nltk
+        if is_tokenized(Doc):
+            return nltk.pos_tag(list(Doc))
         return ' '.join([x[0]+'/'+x[1] for x in nltk.pos_tag(nltk.word_tokenize(Doc))])
 
+    def _get_resultdata(self):
+        if self.result is None:
+            return {}
+        return self.result.as_dict()
+
+    def _set_resultdata(self, resultdata):
+        if resultdata:
+            self.result = ScoreResult.from_dict(resultdata)
+        else:
+            self.result = None
+
+    # results of last document scored, as a dict (see ScoreResult)
+    resultdata = property(_get_resultdata, _set_resultdata)
+
     def _debug(self, msg):
         if self.verbose: print msg
 
@@ -112,6 +661,13 @@ class BasicDocSentiScore(DocSentiScore):
 
     '''
 
+    # parameters making up a ScorerConfig. Assigning any of them invalidates the current config.
+    config_params = ('a', 'v', 'n', 'r', 'negation', 'negation_window', 'negated_term_adj',
+                     'score_mode', 'score_freq', 'score_stop', 'score_function')
+    # subclass specific parameters, stored in ScorerConfig.extra
+    config_extra = ()
+    _config = None
+
     def __init__(self):
         # calls superclass
         super(BasicDocSentiScore,self).__init__()
@@ -123,9 +679,73 @@ class BasicDocSentiScore(DocSentiScore):
         self.score_freq = False
         self.score_stop = False
         self.score_function = self._score_noop
+        # weights by token position for document being scored (see docscoreutil.get_position_weights)
+        self.position_weights = None
         self.negated_term_adj = 0.0
-        # Setup stem preprocessing for verbs
-        self.wnl = nltk.stem.WordNetLemmatizer()
+        # Stem preprocessing for verbs - lemmatizer is created on first use (see wnl)
+        self._wnl = None
+        self.lemma_cache = LRUCache(DEFAULT_LEMMA_CACHE)
+
+    def _get_lemmatizer(self):
+        '''
+         WordNet lemmatizer used on verbs, created on first use so NLTK and WordNet are
+         only loaded when a document actually needs lemmatizing.
+        '''
+        if self._wnl is None:
+            import nltk.stem
+            self._wnl = nltk.stem.WordNetLemmatizer()
+        return self._wnl
+
+    def _set_lemmatizer(self, wnl):
+        self._wnl = wnl
+
+    wnl = property(_get_lemmatizer, _set_lemmatizer)
+
+    def __setattr__(self, name, value):
+        if name in self.config_params or name in self.config_extra:
+            self.__dict__['_config'] = None
+        object.__setattr__(self, name, value)
+
+    def get_config(self):
+        '''
+         Returns ScorerConfig holding current parameters. The config is built once and reused until a parameter changes.
+         Configs are hashable, and can be applied to other classifiers of the same class with set_config.
+        '''
+        config = self._config
+        if config is None:
+            function = self.score_function
+            name = getattr(function, '__name__', '')
+            entry = get_weight_function(function)
+            if entry:
+                function = entry.name
+            elif getattr(function, 'im_self', None) is self and name.startswith('_score_'):
+                function = name[len('_score_'):]
+            config = ScorerConfig(self.__class__.__name__, self.a, self.v, self.n, self.r,
+                                  self.negation, self.negation_window, self.negated_term_adj,
+                                  self.score_mode, self.score_freq, self.score_stop, function,
+                                  tuple([(param, getattr(self, param)) for param in self.config_extra]))
+            self.__dict__['_config'] = config
+        return config
+
+    def _fingerprint_data(self):
+        return (self.get_config(), self.L and self.L.get_fingerprint())
+
+    def set_config(self, config):
+        '''
+         Sets all parameters from ScorerConfig config, as returned by get_config.
+        '''
+        self.set_active_pos(config.a, config.v, config.n, config.r)
+        self.set_neg_detection(config.negation, config.negation_window, config.negated_term_adj)
+        self.score_mode = config.score_mode
+        self.score_freq = config.score_freq
+        self.score_stop = config.score_stop
+        if isinstance(config.score_function, basestring):
+            self.score_function = self._resolve_score_function(config.score_function)
+        else:
+            self.score_function = config.score_function
+        for (param, value) in config.extra:
+            setattr(self, param, value)
+        self.__dict__['_config'] = config
 
     def set_neg_detection(self, mode, window=5, negated_adj=0.0):
         '''
@@ -150,12 +770,22 @@ class BasicDocSentiScore(DocSentiScore):
     #
     def _negation_calc(self, tags, window):
         '''
-         for a list of tokens, calculate array of negated words based on a negation detection
-         algorithm (NegEx in our case).
-         returns arran vNEG containing [0,1] for each index of token on original tags list, indicating negation.
+         for a list of tokens (word/TAG strings, or (word, tag) pairs), calculate array of negated words based on
+         a negation detection algorithm (NegEx in our case).
+         returns negdetect.NegationMask containing [0,1] for each index of token on original tags list, indicating negation.
         '''
-        vNEG = negdetect.getNegationArray(tags, window)
-        return vNEG
+        return negdetect.getNegationMask(tags, window)
+
+    def _get_vNEG(self):
+        '''
+         Negation flags of last classified document as a list, for backward compatibility. See self.negmask.
+        '''
+        return self.negmask.tolist()
+
+    def _set_vNEG(self, flags):
+        self.negmask = negdetect.NegationMask(flags)
+
+    vNEG = property(_get_vNEG, _set_vNEG)
 
     def _get_word_contribution(self, thisword, tagword, scoretuple, i, doclen):
         '''
@@ -166,8 +796,8 @@ class BasicDocSentiScore(DocSentiScore):
         negval = 0.0
         # Negation detection: flip indexes for pos/neg values if negated word
         if self.negation:
-            posindex = self.vNEG[i-1]
-            negindex = (1+self.vNEG[i-1])%2
+            posindex = self.negmask.mask[i-1]
+            negindex = (1+posindex)%2
         else:
             posindex = 0
             negindex = 1
@@ -185,17 +815,35 @@ class BasicDocSentiScore(DocSentiScore):
               (not self.score_stop)
              )
            ):
-            posval = self.score_function(scoretuple[posindex], i, doclen)
-            negval = self.score_function(scoretuple[negindex], i, doclen)
+            weights = self.position_weights
+            if weights:
+                posval = scoretuple[posindex]*weights[i]
+                negval = scoretuple[negindex]*weights[i]
+            elif weights is None:
+                posval = self.score_function(scoretuple[posindex], i, doclen)
+                negval = self.score_function(scoretuple[negindex], i, doclen)
+            else:
+                posval = scoretuple[posindex]
+                negval = scoretuple[negindex]
             if self.score_freq:
                 # Scoring with frequency information
                 # Frequency is a real valued at 0.0-1.0. We calculate sqrt function so that the value grows faster even for numbers close to 0 
-                posval *= 1.0 - max(math.sqrt(self.L.get_freq(thisword)), 0.25)
-                negval *= 1.0 - max(math.sqrt(self.L.get_freq(thisword)), 0.25)
+                factor = self._get_freq_factor(thisword)
+                posval *= factor
+                negval *= factor
             self._debug('[_get_word_contribution] word %s (%s) at %d-th place on docsize %d is eligible (%2.2f, %2.2f).' % (thisword, str(scoretuple), i, doclen, posval, negval))
 
         return (posval, negval)
 
+    def _get_freq_factor(self, word):
+        '''
+         Returns frequency damping factor of word, kept with the prepared document being scored (see score_prepared)
+        '''
+        factor = self.freq_factors.get(word)
+        if factor is None:
+            factor = self.freq_factors[word] = 1.0 - max(math.sqrt(self.L.get_freq(word)), 0.25)
+        return factor
+
 
     def _doc_score_adjust(self, posval, negval):
         '''
@@ -204,9 +852,22 @@ class BasicDocSentiScore(DocSentiScore):
         return (posval, negval)
 
 
+    def _lemmatize_verb(self, word):
+        '''
+         Returns verb lemma for word, memoized in self.lemma_cache (up to DEFAULT_LEMMA_CACHE most recent words)
+        '''
+        lemma = self.lemma_cache.get(word)
+        if lemma is None:
+            if self.stats: self.stats.incr('lemmatizer_calls')
+            lemma = self.wnl.lemmatize(word, pos='v')
+            self.lemma_cache[word] = lemma
+        elif self.stats:
+            self.stats.incr('cache_hits')
+        return lemma
+
     def _reset_runtime_vars(self):
-        self.vNEG = []
-        self.resultdata = {}
+        self.negmask = negdetect.NegationMask()
+        self.result = None
         self.tag_counter = collections.Counter()
 
 
@@ -214,6 +875,8 @@ class BasicDocSentiScore(DocSentiScore):
         '''
          Performs lexicon-based sentiment classification of input document.
          Doc is a POS-tagged document, which can optionally be tagged on-the-fly when tagged=False.
+         Doc can also be pre-tokenized: a sequence of (word, tag) pairs, or a tuple of parallel (words, tags) lists
+         (or a list of words, if tagged=False).
          **kwards are parameter settings for this algorithm. (optional)
 
          In addition to default parameters, this class accepts the following
@@ -224,110 +887,251 @@ class BasicDocSentiScore(DocSentiScore):
 
          Returns: (pos_Score, neg_score) - total scores obtained from the scan.
 
+         Classification runs in two steps that can also be called separately: prepare_document()
+         tokenizes the document, and score_prepared() scans it.
         '''
         # Process input parameters, if any
-        self.set_parameters(**kwargs)
+        if kwargs:
+            self.set_parameters(**kwargs)
         self.verbose = verbose
-        assert self.L and self.L.is_loaded, 'Lexicon has not been assigned, or not loaded'
+        self._pin_lexicon()
+        return self.score_prepared(self.prepare_document(Doc, tagged))
+
+    def prepare_document(self, Doc, tagged=True):
+        '''
+         Returns PreparedDoc for Doc, POS-tagging it first if tagged is False.
+        '''
+        stats = self.stats
+        if stats:
+            timer = stats.timer
+            t0 = timer()
 
         # POS-taging and tag detection
         if not tagged:
             tagged_doc = self.pos_tag(Doc)
         else:
             tagged_doc = Doc
-        tagsep = self._detect_tag(tagged_doc)
-        assert tagsep, 'Unable to detect tag separator'
+        if stats:
+            t1 = timer()
+            stats.add_time('tagging', t1 - t0)
+        if is_tokenized(tagged_doc):
+            prepared = PreparedDoc(Doc, None, None, token_pairs(tagged_doc))
+        else:
+            tagsep = self._detect_tag(tagged_doc)
+            assert tagsep, 'Unable to detect tag separator'
+            self._debug('[prepare_document] - tag separator is %s' % tagsep)
+            prepared = PreparedDoc(Doc, tagged_doc.split(), tagsep)
+            prepared.source = tagged_doc
+        if stats: stats.add_time('detect_tag', timer() - t1)
+        return prepared
+
+    def get_negation_mask(self, prepared):
+        '''
+         Returns NegationMask of prepared document for this classifier's negation window, computed once per prepared document.
+        '''
+        key = (self._negation_calc.im_func, self.negation_window)
+        negmask = prepared.negmasks.get(key)
+        if negmask is None:
+            stats = self.stats
+            if stats: t0 = stats.timer()
+            # Negation detection pre-processing - return an array w/ position of negated terms
+            if prepared.tokens is not None:
+                negmask = self._negation_calc(prepared.tokens, self.negation_window)
+            else:
+                negmask = self._negation_calc(prepared.tags, self.negation_window)
+            if not isinstance(negmask, negdetect.NegationMask):
+                negmask = negdetect.NegationMask(negmask)
+            prepared.negmasks[key] = negmask
+            if stats: stats.add_time('negation', stats.timer() - t0)
+        return negmask
+
+    def get_lookups(self, prepared, active=None):
+        '''
+         Returns list with (pos, scoretuple) for each token of prepared document, as found in this classifier's lexicon
+         for active parts of speech (or parts of speech given in active, as tuple of flags (a, v, n, r)).
+         pos is '' for tokens not scored, and the entry is None for corrupt tokens.
+         Lookups are computed once per prepared document, lexicon and set of active parts of speech.
+        '''
+        L = self.L
+        if active is None:
+            config = self.get_config()
+            active = (config.a, config.v, config.n, config.r)
+        (a, v, n, r) = active
+        key = (L, a, v, n, r)
+        lookups = prepared.lookups.get(key)
+        if lookups is not None:
+            return lookups
+
+        stats = self.stats
+        if stats:
+            timer = stats.timer
+            t0 = timer()
+        tagtable = get_tag_table(a, v, n, r)
+        # lookups shared by all sets of parts of speech for this lexicon
+        wordscores = prepared.wordscores.setdefault(L, {})
+
+        # first pass - part of speech of each token, and words not looked up yet
+        tokenpos = []
+        pending = {'a': set(), 'v': set(), 'r': set(), 'n': set()}
+        for (thisword, thistag) in prepared.parsed:
+            if thistag is None:
+                tokenpos.append(None)  # discard corrupt data
+                continue
+            # part of speech of this tag, if active
+            pos = tagtable.get(thistag)
+            if pos is None:
+                pos = tag_pos(tagtable, thistag, a, v, n, r)
+            tokenpos.append(pos)
+            if pos:
+                if (pos, thisword) not in wordscores and thisword not in pending[pos]:
+                    pending[pos].add(thisword)
+                elif stats:
+                    stats.incr('cache_hits')
+
+        # batch lookups per part of speech. Verbs (VBP / VBD/ etc...) are looked up by lemma
+        if stats: t1 = timer()
+        verbs = list(pending['v'])
+        lemmas = [self._lemmatize_verb(word) for word in verbs]
+        if stats: tlemma = timer() - t1
+        for (pos, words) in [('a', list(pending['a'])), ('v', verbs), ('r', list(pending['r'])), ('n', list(pending['n']))]:
+            if not words:
+                continue
+            scores = L.get_scores(pos, (pos == 'v') and lemmas or words)
+            for (thisword, scoretuple) in zip(words, scores):
+                wordscores[(pos, thisword)] = (pos, scoretuple)
+
+        # second pass - lookup result for each token
+        lookups = []
+        for (pos, (thisword, thistag)) in zip(tokenpos, prepared.parsed):
+            if pos:
+                lookups.append(wordscores[(pos, thisword)])
+            elif pos is None:
+                lookups.append(None)
+            else:
+                lookups.append(NOT_SCORED)
+        prepared.lookups[key] = lookups
+        if stats:
+            stats.add_time('lemmatize', tlemma)
+            stats.add_time('lookup', timer() - t0 - tlemma)
+        return lookups
+
+    def resolve_document(self, prepared):
+        '''
+         Looks up every word of prepared document in this classifier's lexicon for all parts of speech, and computes
+         their frequency factors if the lexicon has frequencies compiled. The prepared document can then be scored
+         under any parameters (see set_parameters) without further lemmatizing or lexicon lookups, by this or other
+         classifiers with the same lexicon, also after being written to disk (see write_prepared).
+         Only the negation detection is run again, on the tokens, when the negation window changes.
+        '''
+        L = self.L
+        lookups = self.get_lookups(prepared, active=(True, True, True, True))
+        if L.is_compiled:
+            freqs = prepared.freqs.setdefault(L, {})
+            sqrt = math.sqrt
+            for ((thisword, thistag), lookup) in zip(prepared.parsed, lookups):
+                if lookup and lookup[0] and thisword not in freqs:
+                    freqs[thisword] = 1.0 - max(sqrt(L.get_freq(thisword)), 0.25)
+        return prepared
+
+    def classify_lexicons(self, Doc, lexicons, tagged=True, verbose=False):
+        '''
+         Scores document against each lexicon in lexicons, returning list with (pos_score, neg_score) for each lexicon.
+         The document is tagged, tokenized and negation-detected once, verbs are lemmatized once, and each lexicon
+         is queried once per distinct word (see Lexicon.get_scores).
+
+         self.lexicon_resultdata holds the result (ScoreResult) of each lexicon. The classifier's own lexicon is left unchanged.
+        '''
+        self.verbose = verbose
+        self._pin_lexicon()
+        prepared = self.prepare_document(Doc, tagged)
+        L = self.L
+        results = []
+        self.lexicon_resultdata = []
+        try:
+            for lexicon in lexicons:
+                self.L = lexicon
+                results.append(self.score_prepared(prepared))
+                self.lexicon_resultdata.append(self.result)
+        finally:
+            self.L = L
+        return results
+
+    def score_prepared(self, prepared):
+        '''
+         Scans PreparedDoc with current parameters, returning (pos_score, neg_score) and setting self.result.
+         Negation detection and lexicon lookups are reused when the same prepared document is scored again,
+         possibly by other classifiers (see sentanalysis_ensemble).
+        '''
+        L = self.L
+        assert L and (L.is_loaded or L.is_deferred), 'Lexicon has not been assigned, or not loaded'
+        stats = self.stats
 
         # ready to start - reset runtime vars
         self._reset_runtime_vars()
-        self._debug('[classify_document] - tag separator is %s' % tagsep)
-        tags = tagged_doc.split()
-        annotatedTags = []
+        tags = prepared.tags
+        words = prepared.words
         doclen = len(tags)
-        i = 0
+        self.position_weights = get_position_weights(self.score_function, doclen)
+        negmask = self.negmask = self.get_negation_mask(prepared)
+        negflags = negmask.mask
+        lookups = self.get_lookups(prepared)
+        self.freq_factors = prepared.freqs.setdefault(L, {})
         postotal = 0.0
         negtotal = 0.0
-        foundcounter = 0
         negcount = 0
-        self.tag_counter = collections.Counter()
-        tagUnscored = []
- 
-        # Negation detection pre-processing - return an array w/ position of negated terms
-        self.vNEG = self._negation_calc(tags, self.negation_window)
+        tag_counter = self.tag_counter
+        # token data of the scan, kept in the result (see ScoreResult)
+        scored = []
+        values = []
+        negs = None
+        if self.negation: negs = bytearray()
+        unscored = []
+        corrupt = []
 
         # Scan for scores for each POS
         # After POS-tagging a term will appear as either term/POS or term_POS
         # We assume such weirdnesses will not naturally occur on plain text.
-        for tagword in tags:
-            i+=1
-            scoretuple = (0,0)
-            tagfound = False
-            # retrieves tuple (word, POS tag) from current word+tag string
-            (thisword, thistag) = nltk.tag.str2tuple(tagword, sep=tagsep)
-            if (not thistag) or (not thisword):
+        for i in xrange(1, doclen+1):
+            lookup = lookups[i-1]
+            if lookup is None:
+                corrupt.append(i-1)
                 continue  # discard corrupt data
-            thisword = thisword.lower()
-
-            # Adjectives 
-            if self.a and re.search('(JJ|JJ.)$', thistag):
-                tagfound = True
-                scoretuple = self.L.getadjective(thisword)
-
-            # Verbs (VBP / VBD/ etc...)
-            if self.v and re.search('(VB|VB.)$', thistag):
-                tagfound = True
-                thislemma = self.wnl.lemmatize(thisword, pos='v')
-                scoretuple = self.L.getverb(thislemma)
-          
-            # Adverbs
-            if self.r and re.search('RB$', thistag):
-                tagfound = True
-                scoretuple = self.L.getadverb(thisword)
-
-            # Nouns
-            if self.n and re.search('NN$', thistag):
-                tagfound = True
-                scoretuple = self.L.getnoun(thisword)
+            (pos, scoretuple) = lookup
 
             #
             # Add this word contribution to total
             #
-            if tagfound:
-                (posval, negval) = self._get_word_contribution(thisword, tagword, scoretuple, i, doclen)
+            if pos:
+                tagword = tags[i-1]
+                (posval, negval) = self._get_word_contribution(words[i-1], tagword, scoretuple, i, doclen)
                 postotal += posval
                 negtotal += negval
                 self._debug('Running total (pos,neg): %2.2f, %2.2f'%(postotal,negtotal))
 
                 # Found a tag - increase counters and add tag to list
-                self.tag_counter.update([tagword])
-                if scoretuple == (0,0): tagUnscored.append(tagword)
-                foundcounter += 1
-                if self.negation and self.vNEG[i-1]==1:
-                    negcount += 1
-                if self.negation: 
-                    negtag = str(self.vNEG[i-1])
-                else:
-                    negtag = 'NONEG'
-                annotatedTags.append(tagword + '##NEGAT:' + negtag + '##POS:' + str(posval) + '##NEG:' + str(negval))
-            else:
-                annotatedTags.append(tagword)
+                tag_counter[tagword] += 1
+                if scoretuple == (0,0): unscored.append(i-1)
+                scored.append(i-1)
+                values.append(posval)
+                values.append(negval)
+                if self.negation:
+                    negs.append(negflags[i-1])
+                    if negflags[i-1]==1:
+                        negcount += 1
 
         # Completed scan - execute final score adjustments
         (resultpos, resultneg) = self._doc_score_adjust(postotal, negtotal)
 
         # updates class data structures containing results
-        self.resultdata = {
-            'annotated_doc': ' '.join(annotatedTags),
-            'doc': Doc,
-            'resultpos': resultpos,
-            'resultneg': resultneg,
-            'tokens_found': foundcounter,
-            'tokens_negated': sum(self.vNEG),
-            'found_list': self.tag_counter,
-            'unscored_list': tagUnscored
-        }
-
-        self._debug('Result data: %s'%str(self.resultdata))
+        if stats: t0 = stats.timer()
+        self.result = ScoreResult.from_scan(prepared, resultpos, resultneg, negmask.count, scored, values, negs, unscored, corrupt)
+        if stats:
+            stats.add_time('annotate', stats.timer() - t0)
+            stats.incr('calls')
+            stats.incr('tokens', doclen)
+            stats.incr('scored_tokens', len(scored))
+
+        if self.verbose: self._debug('Result data: %s'%str(self.resultdata))
         return (resultpos, resultneg)
 
 
@@ -368,43 +1172,40 @@ class BasicDocSentiScore(DocSentiScore):
         if kwargs.has_key('score_stop'): self.score_stop = kwargs['score_stop']
 
         if kwargs.has_key('score_function'):
-            try:
-                self.score_function = getattr(self, '_score_'+kwargs['score_function'])
-            except Exception:
-                self.score_function = self._score_noop
+            self.score_function = self._resolve_score_function(kwargs['score_function'])
 
     #
     # score weight adjustment functions
+    # built-in functions are registered in docscoreutil with their vector forms (see get_position_weights)
     #
-    def _score_noop(self, score, i, N):
-        '''
-          no-op function: returns score given as-is
-        '''
-        return score
+    _score_noop = staticmethod(weightNoop)
+    _score_linear = staticmethod(weightLinear)
+    _score_cosine = staticmethod(weightCosine)
 
-    def _score_linear(self, score, i, N):
+    def _resolve_score_function(self, name):
         '''
-         lineasr adjustment of scores per word position in text
+         Returns weighting function for name: a _score_<name> method, or a function registered in docscoreutil.
+         Defaults to no-op if none is found.
         '''
-        # we want the interval to vary from 0.5-1.0 of original score
-        BAND=0.5
-        FLOOR=0.5
-        if N==0: 
-            return score
-        else:
-            return score*(((float(i)/float(N))*BAND)+FLOOR)
+        function = getattr(self, '_score_' + name, None)
+        if function is None:
+            entry = get_weight_function(name)
+            if entry:
+                function = entry.function
+            else:
+                function = self._score_noop
+        return function
 
-    def _score_cosine(self, score, i, N):
+    def _weigh(self, score, i, doclen):
         '''
-         cosine adjustment gives a heavier weight to scores at the start and end of document
+         Applies position weighting to score of i-th token, using weight table for current document if available.
         '''
-        if N==0: return score
-        BAND=0.5
-        # normalize word position
-        norm_i = float(i)/float(N)
-        # get cosine function, ranging from 0.5-1.0
-        cos_val = BAND+((math.cos(20.0*norm_i/math.pi)+1.0)/4.0)
-        return score*cos_val
+        weights = self.position_weights
+        if weights:
+            return score*weights[i]
+        elif weights is None:
+            return self.score_function(score, i, doclen)
+        return score
 
 
 #
@@ -0,0 +1,132 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   sentanalysis_ensemble.py - ensemble of lexicon-based classifiers scored in a single document pass
+
+'''
+
+# library imports
+import sentlex
+from docscoreutil import *
+from sentanalysis import DocSentiScore, BasicDocSentiScore, ScoreResult
+
+
+class EnsembleDocSentiScore(DocSentiScore):
+    '''
+     Combines scores of several classifiers (members) by voting (see docscoreutil voting schemes).
+
+     Members derived from BasicDocSentiScore share a single PreparedDoc per document, so the document is
+     tokenized once, negation is detected once per negation window, and lexicon lookups are done once per
+     lexicon. Only the scan itself runs once per member. Other classifiers are called as usual.
+
+        ensemble = EnsembleDocSentiScore([AV_AllWordsDocSentiScore(L), AV_LightPottsSentiScore(L), AV_LightTabSentiScore(L)])
+        (pos, neg) = ensemble.classify_document(doc)
+
+     Returns the scores from the vote. Each member's scores are found in resultdata['member_scores'],
+     and the full vote result (posflag, negflag, posscore, negscore) in resultdata['vote'].
+    '''
+
+    VOTES = {
+        'majority': majorityVote,
+        'sum': sumVote,
+        'max': maxVote,
+    }
+
+    def __init__(self, members=None, vote='sum', shift=0.0, threshold=0.0):
+        # calls superclass
+        super(DocSentiScore, self).__init__()
+        self.verbose = False
+        self.members = []
+        for member in (members or []):
+            self.add_member(member)
+        self.set_vote(vote, shift, threshold)
+        self.L = self.members and self.members[0].L or None
+
+    def add_member(self, classifier):
+        '''
+         Adds classifier to the ensemble. Classifier must have its lexicon set.
+        '''
+        self.members.append(classifier)
+        if self.stats:
+            classifier.set_stats(True, self.stats)
+
+    def set_vote(self, vote='sum', shift=0.0, threshold=0.0):
+        '''
+         Sets voting scheme ('majority', 'sum', 'max' or a function with the same signature) and its parameters.
+        '''
+        if isinstance(vote, basestring):
+            vote = self.VOTES[vote]
+        self.vote_function = vote
+        self.vote_shift = shift
+        self.vote_threshold = threshold
+
+    def set_parameters(self, **kwargs):
+        '''
+         Parameters are set on every member of the ensemble.
+        '''
+        for member in self.members:
+            member.set_parameters(**kwargs)
+
+    def _fingerprint_data(self):
+        vote = getattr(self.vote_function, '__name__', self.vote_function)
+        return (self.__class__.__name__, vote, self.vote_shift, self.vote_threshold,
+                tuple([member.get_fingerprint() for member in self.members]))
+
+    def _pin_lexicon(self, taken=None):
+        '''
+         Members sharing a lexicon handle score each document with the same version.
+        '''
+        taken = super(EnsembleDocSentiScore, self)._pin_lexicon(taken)
+        if taken is None:
+            taken = {}
+        for member in self.members:
+            member._pin_lexicon(taken)
+        self.L = self.members and self.members[0].L or None
+        return taken
+
+    def set_stats(self, mode=True, stats=None):
+        '''
+         Instrumentation is shared with all members.
+        '''
+        super(EnsembleDocSentiScore, self).set_stats(mode, stats)
+        for member in self.members:
+            member.set_stats(mode, self.stats)
+
+    def classify_document(self, Doc, tagged=True, verbose=False, **kwargs):
+        '''
+         Scores document with every member, returning (pos, neg) scores from the vote.
+        '''
+        assert self.members, 'Ensemble has no members'
+        if kwargs:
+            self.set_parameters(**kwargs)
+        self.verbose = verbose
+        self._pin_lexicon()
+
+        if not tagged:
+            # tag once for all members
+            tagged_doc = self.pos_tag(Doc)
+        else:
+            tagged_doc = Doc
+        prepared = None
+        member_scores = []
+        member_results = []
+        for member in self.members:
+            member.verbose = verbose
+            if isinstance(member, BasicDocSentiScore):
+                if prepared is None:
+                    prepared = member.prepare_document(tagged_doc)
+                    prepared.doc = Doc
+                member_scores.append(member.score_prepared(prepared))
+            else:
+                member_scores.append(member.classify_document(tagged_doc, tagged=True, verbose=verbose))
+            member_results.append(member.result or ScoreResult())
+
+        vote = self.vote_function(member_scores, self.vote_shift, self.vote_threshold)
+        (resultpos, resultneg) = (vote[2], vote[3])
+
+        # token data reported from first member
+        self.result = member_results[0].copy(doc=Doc, resultpos=resultpos, resultneg=resultneg,
+                                             extra={'member_scores': member_scores, 'vote': vote})
+        self._debug('[EnsembleDocSentiScore] - member scores %s, vote %s' % (str(member_scores), str(vote)))
+        return (resultpos, resultneg)
@@ -33,9 +33,10 @@ class PottsDocSentiScore(BasicDocSentiScore):
         '''
         (postmp, negtmp) = super(PottsDocSentiScore,self)._doc_score_adjust(posval, negval)
         if self.negation:
-            # at this point we should have vNEG populated by the scoring algorithm
-            if len(self.vNEG)>=3:
-                negated_instances = len([self.vNEG[i:i+2] for i in range(len(self.vNEG)-1) if self.vNEG[i:i+2]==[0,1]])
+            # at this point we should have negmask populated by the scoring algorithm
+            # negated instances are windows starting after first token (a 0->1 transition)
+            if len(self.negmask)>=3:
+                negated_instances = len([start for (start, end) in self.negmask.windows if start > 0])
             else:
                 negated_instances = 0
             # with the total of negated instances we can compute the adjustment
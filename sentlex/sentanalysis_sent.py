@@ -8,12 +8,17 @@
 
 # library imports
 import sentlex
+import hashlib
 import collections
 from docscoreutil import *
-from sentanalysis import DocSentiScore
+from sentanalysis import DocSentiScore, BasicDocSentiScore, ScoreResult, is_tokenized, token_pairs
 from sentanalysis_potts import AV_AggressivePottsSentiScore
 
 
+# sentence results kept by default (see SentenceDocSentiScore.set_sentence_cache)
+DEFAULT_SENTENCE_CACHE = 10000
+
+
 class SentenceDocSentiScore(DocSentiScore):
     '''
      Subclass of DocSentiScore implementing a sentence-based lexicon-based classifier.
@@ -31,6 +36,71 @@ class SentenceDocSentiScore(DocSentiScore):
             self.sentence_classifier.set_lexicon(Lex)
 
         self.set_lexicon(Lex)
+        self.set_sentence_cache(DEFAULT_SENTENCE_CACHE)
+
+    def _pin_lexicon(self, taken=None):
+        taken = super(SentenceDocSentiScore, self)._pin_lexicon(taken)
+        return self.sentence_classifier._pin_lexicon(taken)
+
+    def set_sentence_cache(self, maxsize=DEFAULT_SENTENCE_CACHE):
+        '''
+         Sets number of sentence results kept for reuse (0 disables the cache). Hits and misses are found in
+         self.sentence_cache.hits/misses, and in the 'sentence_cache_hits' counter of instrumentation.
+        '''
+        if maxsize:
+            self.sentence_cache = LRUCache(maxsize)
+        else:
+            self.sentence_cache = None
+        # lexicon and configuration of the sentence classifier the cached results are for (see _get_cache_prefix)
+        self._cache_lexicon = None
+        self._cache_config = None
+        self._cache_prefix = None
+
+    def _get_cache_prefix(self):
+        '''
+         Returns key prefix of cached sentence results for the sentence classifier's current parameters, computed
+         again only when they change (see BasicDocSentiScore.get_config). Cached results are dropped when its
+         lexicon changes, e.g. when a new version is pinned. Other classifiers are keyed by their fingerprint.
+        '''
+        classifier = self.sentence_classifier
+        if classifier.L is not self._cache_lexicon:
+            self.sentence_cache.clear()
+            self._cache_lexicon = classifier.L
+            self._cache_config = None
+        if not isinstance(classifier, BasicDocSentiScore):
+            return classifier.get_fingerprint()
+        config = classifier.get_config()
+        if config is not self._cache_config:
+            self._cache_config = config
+            self._cache_prefix = hashlib.sha1(repr(config)).hexdigest()
+        return self._cache_prefix
+
+    def _tokenize_document(self, Doc, tagged=True):
+        '''
+         Returns list of sentences of Doc, tagging it first if tagged is False. Sentences are strings, or lists
+         of (word, tag) pairs for pre-tokenized documents.
+        '''
+        stats = self.stats
+        if stats: t0 = stats.timer()
+        if not tagged:
+            tagged_doc = self.pos_tag(Doc)
+        else:
+            tagged_doc = Doc
+        if stats:
+            t1 = stats.timer()
+            stats.add_time('tagging', t1 - t0)
+        if is_tokenized(tagged_doc):
+            # pre-tokenized - no separator to detect
+            tagsep = None
+        else:
+            tagsep = self._detect_tag(tagged_doc)
+            assert tagsep, 'Unable to detect tag separator'
+        if stats: stats.add_time('detect_tag', stats.timer() - t1)
+
+        # tokenize into sentences
+        if tagsep:
+            return self._sent_tokenize(tagged_doc, tagsep)
+        return self._sent_tokenize_pairs(token_pairs(tagged_doc))
 
     def _sent_tokenize(self, doc, separator):
         '''
@@ -51,6 +121,38 @@ class SentenceDocSentiScore(DocSentiScore):
             sentences.append(' '.join(cur_sent))
         return sentences
 
+    def _sent_tokenize_pairs(self, pairs):
+        '''
+         Same as _sent_tokenize, for a document given as (word, tag) pairs. Returns list of lists of pairs.
+        '''
+        cur_sent = []
+        sentences = []
+        for pair in pairs:
+            cur_sent.append(pair)
+            if pair[1] == '.' and pair[0] in ('.', '!', '?'):
+                sentences.append(cur_sent)
+                cur_sent = []
+        if cur_sent:
+            sentences.append(cur_sent)
+        return sentences
+
+    def _sent_ranges(self, prepared):
+        '''
+         Takes a PreparedDoc and returns list of (start, end) token ranges, one for each sentence, end exclusive.
+         Sentences end at the same tokens as in _sent_tokenize.
+        '''
+        end_of_sentence = set([x+prepared.tagsep+'.' for x in ['.','!','?']])
+        ranges = []
+        start = 0
+        for (i, token) in enumerate(prepared.tags):
+            if token in end_of_sentence:
+                ranges.append((start, i+1))
+                start = i+1
+        # finally, if there are tokens left count as last sentence
+        if start < len(prepared.tags):
+            ranges.append((start, len(prepared.tags)))
+        return ranges
+
     def _calc_sentence_scores(self, sent_scores):
         '''
          Given list of tuples indicating individual scores for each sentence, returns aggregate (pos,neg) scores for document.
@@ -64,40 +166,71 @@ class SentenceDocSentiScore(DocSentiScore):
         '''
           Tokenize input document into sentences, then call classifier on each sentence separately.
           Return aggregate positive and negative scores in tuple (postotal,negtotal)
+
+          If the sentence classifier is a BasicDocSentiScore, the document is tokenized once (see prepare_document),
+          and each sentence is scored over its range of tokens. Other classifiers are given each sentence as a string
+          (or list of (word, tag) pairs for pre-tokenized documents).
+
+          Results of recently scored sentences are kept (see set_sentence_cache), and reused for sentences with the same
+          tagged tokens scored with the same classifier configuration and lexicon.
         '''
         # Process input parameters, if any
-        self.set_parameters(**kwargs)
+        if kwargs:
+            self.set_parameters(**kwargs)
         self.verbose = verbose
-        assert self.L and self.L.is_loaded, 'Lexicon has not been assigned, or not loaded'
+        self._pin_lexicon()
+        assert self.L and (self.L.is_loaded or self.L.is_deferred), 'Lexicon has not been assigned, or not loaded'
 
-        # POS-taging and tag detection
-        if not tagged:
-            tagged_doc = self.pos_tag(Doc)
+        classifier = self.sentence_classifier
+        prepared = None
+        # sentence results are reused when the same sentence is found again, unless debugging
+        memo = None
+        if not verbose and self.sentence_cache is not None:
+            memo = self.sentence_cache
+            fingerprint = self._get_cache_prefix()
+        if isinstance(classifier, BasicDocSentiScore):
+            classifier.verbose = verbose
+            prepared = classifier.prepare_document(Doc, tagged)
+            # sentences are sliced when scored
+            tagged_sentences = self._sent_ranges(prepared)
+            score_sentence = lambda (start, end): classifier.score_prepared(prepared.slice(start, end))
+            if memo is not None:
+                keys = [(fingerprint, tuple(prepared.tags[start:end])) for (start, end) in tagged_sentences]
         else:
-            tagged_doc = Doc
-        tagsep = self._detect_tag(tagged_doc)
-        assert tagsep, 'Unable to detect tag separator'
-
-        # tokenize into sentences
-        tagged_sentences = self._sent_tokenize(tagged_doc, tagsep)
+            tagged_sentences = self._tokenize_document(Doc, tagged)
+            score_sentence = lambda sentence: classifier.classify_document(sentence, tagged=True, verbose=verbose)
+            if memo is not None:
+                keys = [(fingerprint, isinstance(sentence, basestring) and sentence or tuple(sentence)) for sentence in tagged_sentences]
+        if memo is not None:
+            entries = [memo.get(key) for key in keys]
+        else:
+            entries = [None] * len(tagged_sentences)
+        if prepared is not None and None in entries:
+            # negation and lookups are computed once for the whole document, then sliced for each sentence
+            classifier.get_negation_mask(prepared)
+            classifier.get_lookups(prepared)
         self._debug('[sent classifier] - Found %d sentences' % len(tagged_sentences))
         sent_scores = []
-        # initialize data structure containing results
-        self.resultdata = {
-            'annotated_doc': '',
-            'doc': Doc,
-            'resultpos': 0,
-            'resultneg': 0,
-            'tokens_found': 0,
-            'tokens_negated': 0,
-            'found_list': collections.Counter(),
-            'unscored_list': []
-        }
-        for sentence in tagged_sentences:
+        sent_results = []
+        for (k, sentence) in enumerate(tagged_sentences):
             # classify sentence
             try:
-                self._debug('[sent classifier] %s' % sentence)
-                (cur_pos, cur_neg)=self.sentence_classifier.classify_document(sentence, tagged=True, verbose=verbose)
+                if verbose: self._debug('[sent classifier] %s' % (prepared is not None and ' '.join(prepared.tags[sentence[0]:sentence[1]]) or str(sentence)))
+                entry = entries[k]
+                if entry:
+                    (cur_pos, cur_neg, result) = entry
+                    if prepared is not None:
+                        result = result.rebase(prepared.source, sentence[0])
+                    if self.stats: self.stats.incr('sentence_cache_hits')
+                else:
+                    (cur_pos, cur_neg)=score_sentence(sentence)
+                    result = classifier.result or ScoreResult()
+                    if memo is not None:
+                        if prepared is not None:
+                            # cached results of token ranges keep the sentence's own tokens, not the whole document
+                            memo[keys[k]] = (cur_pos, cur_neg, result.rebase(keys[k][1], 0))
+                        else:
+                            memo[keys[k]] = (cur_pos, cur_neg, result)
                 if cur_pos>cur_neg:
                    sent_scores.append((1,0))
                 elif cur_neg>cur_pos:
@@ -105,21 +238,14 @@ class SentenceDocSentiScore(DocSentiScore):
                 else:
                    sent_scores.append((0,0))
                 self._debug('[sent classifier] - sentence scores: %s' % str(sent_scores))
-
-                # update algorithm results
-                self.resultdata['tokens_found'] += self.sentence_classifier.resultdata['tokens_found']
-                self.resultdata['annotated_doc'] += self.sentence_classifier.resultdata['annotated_doc']
-                self.resultdata['tokens_negated'] += self.sentence_classifier.resultdata['tokens_negated']
-                self.resultdata['unscored_list'] += self.sentence_classifier.resultdata['unscored_list']
-                self.resultdata['found_list'].update(self.sentence_classifier.resultdata['found_list'])
+                sent_results.append(result)
             except Exception,e:
                 self._debug('[sent classifier] - Error processing sentence: %s' % str(e))
                 raise #continue
 
+        # update algorithm results - sentence results joined in a single result for the document
         (resultpos, resultneg) = self._calc_sentence_scores(sent_scores)
-        self.resultdata['resultpos'] = resultpos
-        self.resultdata['resultneg'] = resultneg
-        self.resultdata['sentence_scores'] = sent_scores
+        self.result = ScoreResult.join(Doc, sent_results, resultpos, resultneg, {'sentence_scores': sent_scores})
         return (resultpos, resultneg)
 
     def set_parameters(self, **kwargs):
@@ -127,3 +253,14 @@ class SentenceDocSentiScore(DocSentiScore):
          Algorithm parameters are set for the underlying sentence classifier algorithm.
         '''
         self.sentence_classifier.set_parameters(**kwargs)
+
+    def _fingerprint_data(self):
+        return (self.__class__.__name__, self.sentence_classifier.get_fingerprint())
+
+    def set_stats(self, mode=True, stats=None):
+        '''
+         Instrumentation is shared with the underlying sentence classifier, so stage timings
+         include per-sentence work, and 'calls' counts classified sentences.
+        '''
+        super(SentenceDocSentiScore, self).set_stats(mode, stats)
+        self.sentence_classifier.set_stats(mode, self.stats)
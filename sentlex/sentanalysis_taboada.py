@@ -7,12 +7,15 @@
 
 '''
 
+import math
+import itertools
+
 # library imports
 import sentlex
 import negdetect
 import stopwords
 from docscoreutil import *
-from sentanalysis import BasicDocSentiScore
+from sentanalysis import BasicDocSentiScore, ScoreResult
 
 class TaboadaDocSentiScore(BasicDocSentiScore):
     '''
@@ -20,6 +23,8 @@ class TaboadaDocSentiScore(BasicDocSentiScore):
      and a backoff mechanism for counting repeated terms.
     '''
 
+    config_extra = ('negated_shift_adj',)
+
     def __init__(self):
         # calls superclass
         super(TaboadaDocSentiScore, self).__init__()
@@ -69,21 +74,127 @@ class TaboadaDocSentiScore(BasicDocSentiScore):
             if self.negation:
                 # these adjustments will not count unless word is negated
                 if (posval>negval):
-                    posval = posval - ((self.vNEG[i-1])*self.negated_shift_adj)
+                    posval = posval - ((self.negmask.mask[i-1])*self.negated_shift_adj)
                 if (negval>posval):
-                    negval = negval - ((self.vNEG[i-1])*self.negated_shift_adj)
+                    negval = negval - ((self.negmask.mask[i-1])*self.negated_shift_adj)
             # Adjust score
-            posval = self.score_function(posval, i, doclen)
-            negval = self.score_function(negval, i, doclen)
+            posval = self._weigh(posval, i, doclen)
+            negval = self._weigh(negval, i, doclen)
             if self.score_freq:
                 # Scoring with frequency information
                 # Frequency is a real valued at 0.0-1.0. We calculate sqrt function so that the value grows faster even for numbers close to 0 
-                posval *= 1.0 - max(math.sqrt(self.L.get_freq(thisword)), 0.25)
-                negval *= 1.0 - max(math.sqrt(self.L.get_freq(thisword)), 0.25)
+                factor = self._get_freq_factor(thisword)
+                posval *= factor
+                negval *= factor
             self._debug('[_get_word_contribution] word %s (%s) at %d-th place on docsize %d is eligible (%2.2f, %2.2f).' % (thisword, str(scoretuple), i, doclen, posval, negval))
 
         return (posval, negval)
 
+    def _can_fuse(self):
+        '''
+         True if score_prepared can use the fused scan - i.e. not debugging, and scan methods are not overriden by a subclass.
+        '''
+        cls = self.__class__
+        return (not self.verbose) and\
+               cls._get_word_contribution.im_func is TaboadaDocSentiScore._get_word_contribution.im_func and\
+               cls._doc_score_adjust.im_func is BasicDocSentiScore._doc_score_adjust.im_func
+
+    def score_prepared(self, prepared):
+        '''
+         Same results as BasicDocSentiScore.score_prepared with _get_word_contribution above, computed in a single loop:
+         parameters are resolved once per document, damping factors once per distinct word, and the backoff count,
+         negation shift and position weight are applied inline for each scored token.
+        '''
+        if not self._can_fuse():
+            return super(TaboadaDocSentiScore, self).score_prepared(prepared)
+        L = self.L
+        assert L and (L.is_loaded or L.is_deferred), 'Lexicon has not been assigned, or not loaded'
+        stats = self.stats
+
+        self._reset_runtime_vars()
+        tags = prepared.tags
+        doclen = len(tags)
+        weights = self.position_weights = get_position_weights(self.score_function, doclen)
+        negmask = self.negmask = self.get_negation_mask(prepared)
+        lookups = self.get_lookups(prepared)
+        if stats: t0 = stats.timer()
+
+        # parameters, resolved once for the whole document
+        eligible = (self.score_mode == self.BACKOFF)
+        is_stop = self.score_stop and self.objectiveWords.is_stop
+        negation = self.negation
+        shift = self.negated_shift_adj
+        score_function = self.score_function
+        score_freq = self.score_freq
+        get_freq = L.get_freq
+        sqrt = math.sqrt
+        damping = self.freq_factors = prepared.freqs.setdefault(L, {})
+        tag_counter = self.tag_counter
+        scored = []
+        values = []
+        negs = None
+        if negation: negs = bytearray()
+        unscored = []
+        corrupt = []
+        postotal = 0.0
+        negtotal = 0.0
+
+        i = 0
+        for (lookup, tagword, (thisword, thistag), negflag) in itertools.izip(lookups, tags, prepared.parsed, negmask.mask):
+            i += 1
+            if lookup is None:
+                corrupt.append(i-1)
+                continue  # discard corrupt data
+            (pos, scoretuple) = lookup
+            if not pos:
+                continue
+
+            posval = 0.0
+            negval = 0.0
+            if eligible and not (is_stop and is_stop(thisword)):
+                # backoff - n-th occurrence of word/tag counts 1/n
+                backoff = tag_counter[tagword]+1.0
+                posval = scoretuple[0]/backoff
+                negval = scoretuple[1]/backoff
+                # negated terms are shifted
+                if negation and negflag:
+                    if (posval>negval):
+                        posval = posval - shift
+                    if (negval>posval):
+                        negval = negval - shift
+                if weights:
+                    posval = posval*weights[i]
+                    negval = negval*weights[i]
+                elif weights is None:
+                    posval = score_function(posval, i, doclen)
+                    negval = score_function(negval, i, doclen)
+                if score_freq:
+                    factor = damping.get(thisword)
+                    if factor is None:
+                        factor = damping[thisword] = 1.0 - max(sqrt(get_freq(thisword)), 0.25)
+                    posval *= factor
+                    negval *= factor
+            postotal += posval
+            negtotal += negval
+
+            tag_counter[tagword] += 1
+            if scoretuple == (0,0): unscored.append(i-1)
+            scored.append(i-1)
+            values.append(posval)
+            values.append(negval)
+            if negation:
+                negs.append(negflag)
+
+        (resultpos, resultneg) = self._doc_score_adjust(postotal, negtotal)
+        self.result = ScoreResult.from_scan(prepared, resultpos, resultneg, negmask.count, scored, values, negs, unscored, corrupt)
+        if stats:
+            # scan and annotation are not timed separately
+            stats.add_time('annotate', stats.timer() - t0)
+            stats.incr('calls')
+            stats.incr('tokens', doclen)
+            stats.incr('scored_tokens', len(scored))
+        return (resultpos, resultneg)
+
 
 #
 # Pre-defined algorithms based on PottsDocSentiScore
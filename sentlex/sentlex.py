@@ -14,14 +14,74 @@ TODO:
 '''
 
 import os
-import nltk
-from nltk.corpus import brown
+import hashlib
+import collections
+from array import array
 import sentlexutil
 
+# Scores of all terms of a part of speech: terms, parallel arrays of positive and negative scores, and term -> index dict
+ScoreTable = collections.namedtuple('ScoreTable', ['terms', 'pos', 'neg', 'index'])
+
 
 #
 # Lexicon super-class
 #
+def _sign(x):
+    if x > 0.0:
+        return 1
+    elif x == 0.0:
+        return 0
+    else:
+        return -1
+
+def _get_numpy():
+    '''
+      Returns numpy module, imported on first use so that importing sentlex does not load it, or None if not installed.
+    '''
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _compare_valences(T1, T2, idx1, idx2):
+    '''
+      Valence statistics for ScoreTables T1 and T2, over terms at positions idx1 (in T1) and idx2 (in T2).
+    '''
+    result = {'intersect': len(idx1), 'agree': None, 'correlation': None}
+    numpy = _get_numpy()
+    if numpy is not None:
+        V1 = numpy.frombuffer(T1.pos, dtype=numpy.float64) - numpy.frombuffer(T1.neg, dtype=numpy.float64) if T1.terms else numpy.zeros(0)
+        V2 = numpy.frombuffer(T2.pos, dtype=numpy.float64) - numpy.frombuffer(T2.neg, dtype=numpy.float64) if T2.terms else numpy.zeros(0)
+        result['distro'] = (int((V1 > 0.0).sum()), int((V1 < 0.0).sum()), int((V1 == 0.0).sum()))
+        result['distro_other'] = (int((V2 > 0.0).sum()), int((V2 < 0.0).sum()), int((V2 == 0.0).sum()))
+        if idx1:
+            X = V1[numpy.array(idx1, dtype=numpy.intp)]
+            Y = V2[numpy.array(idx2, dtype=numpy.intp)]
+            result['agree'] = int((numpy.sign(X) == numpy.sign(Y)).sum())/(len(idx1)+0.0)
+            if len(idx1) > 1 and X.std() > 0.0 and Y.std() > 0.0:
+                result['correlation'] = float(numpy.corrcoef(X, Y)[0, 1])
+        return result
+
+    V1 = [p - n for (p, n) in zip(T1.pos, T1.neg)]
+    V2 = [p - n for (p, n) in zip(T2.pos, T2.neg)]
+    for (key, V) in [('distro', V1), ('distro_other', V2)]:
+        signs = collections.Counter([_sign(x) for x in V])
+        result[key] = (signs[1], signs[-1], signs[0])
+    if idx1:
+        X = [V1[i] for i in idx1]
+        Y = [V2[i] for i in idx2]
+        result['agree'] = len([1 for (x, y) in zip(X, Y) if _sign(x) == _sign(y)])/(len(idx1)+0.0)
+        N = float(len(X))
+        (mx, my) = (sum(X)/N, sum(Y)/N)
+        sxy = sum([(x - mx)*(y - my) for (x, y) in zip(X, Y)])
+        sxx = sum([(x - mx)**2 for x in X])
+        syy = sum([(y - my)**2 for y in Y])
+        if len(X) > 1 and sxx > 0.0 and syy > 0.0:
+            result['correlation'] = sxy/(sxx*syy)**0.5
+    return result
+
+
 class Lexicon(object):
     '''
       Lexicon class is a generic class holding in memory databases for a sentiment lexicon.
@@ -39,8 +99,13 @@ class Lexicon(object):
         self.N = {}
         self.LexName = 'Superclass'
         self.LexFreq = None
+        # (LexFreq, total count, frequency of most frequent term) - see get_freq
+        self._freqnorm = None
+        # ScoreTable and its source dictionary, by POS - see get_score_table
+        self._score_tables = {}
         self.is_loaded = False
         self.is_compiled = False
+        self.is_deferred = False
         #  Baseline words used to QA a lexicon
         self.baselinewords = ['good', 'bad', 'pretty', 'awful', 'excellent',
                              'misfortune', 'incompetent', 'tough',
@@ -54,14 +119,14 @@ class Lexicon(object):
         postotal = 0
         negtotal = 0
         neutral = 0
-        for itemlist in A:
-            for item in A[itemlist]:
+        for itemlist in A.itervalues():
+            for item in itemlist:
                 if (item[1] > item[2]):
-                    postotal = postotal+1
+                    postotal += 1
                 elif (item[2] > item[1]):
-                    negtotal = negtotal+1
+                    negtotal += 1
                 else:
-                    neutral = neutral+1
+                    neutral += 1
         return (postotal, negtotal, neutral)
 
     def print_info(self):
@@ -121,6 +186,17 @@ class Lexicon(object):
     def hasadjective(self,term):
       return self.A.has_key(term)
 
+    # lookup methods by part of speech ('a', 'v', 'r', 'n' - same codes used by lexicon loaders)
+    POS_GETTERS = {'a': 'getadjective', 'v': 'getverb', 'r': 'getadverb', 'n': 'getnoun'}
+
+    def get_scores(self, pos, terms):
+      '''
+        Batch lookup - returns list of (pos,neg) tuples for a list of terms of part of speech pos ('a', 'v', 'r' or 'n').
+        Same values as calling getadjective(), getverb() etc. for each term.
+      '''
+      getter = getattr(self, Lexicon.POS_GETTERS[pos])
+      return [getter(term) for term in terms]
+
     def get_name(self):
       '''
         Returns name for this lexicon
@@ -133,50 +209,86 @@ class Lexicon(object):
       '''
       self.LexName = newname
 
+    def get_score_table(self, pos):
+      '''
+        Returns ScoreTable with scores of every term of part of speech pos ('a', 'v', 'r', 'n'), as returned by
+        get_scores(). Tables are built once, and rebuilt only if the underlying dictionary is replaced.
+      '''
+      D = getattr(self, pos.upper())
+      cached = self._score_tables.get(pos)
+      if cached and cached[0] is D:
+          return cached[1]
+      table = self._build_score_table(pos, D)
+      self._score_tables[pos] = (D, table)
+      return table
+
+    def _build_score_table(self, pos, D):
+      terms = list(D)
+      scores = self.get_scores(pos, terms)
+      return ScoreTable(terms, array('d', [x[0] for x in scores]), array('d', [x[1] for x in scores]),
+                        dict(zip(terms, xrange(len(terms)))))
+
+    # (dictionary of each part of speech, digest) - see get_fingerprint
+    _fingerprint = None
+
+    def get_fingerprint(self):
+      '''
+        Returns hex digest identifying the contents of this lexicon - its name, and the terms and scores of
+        every part of speech (see get_score_table). Computed once, and again if a dictionary is replaced.
+        Only the digest is kept: score tables are not built for it, unless already built for scoring.
+      '''
+      dicts = tuple([getattr(self, pos.upper()) for pos in ['a', 'v', 'r', 'n']])
+      cached = self._fingerprint
+      if cached and all([D is cachedD for (D, cachedD) in zip(dicts, cached[0])]):
+          return cached[1]
+      digest = hashlib.sha1(self.get_name())
+      for (pos, D) in zip(['a', 'v', 'r', 'n'], dicts):
+          table = self._score_tables.get(pos)
+          if table and table[0] is D:
+              (terms, posvals, negvals) = table[1][:3]
+          else:
+              terms = list(D)
+              scores = self.get_scores(pos, terms)
+              posvals = array('d', [x[0] for x in scores])
+              negvals = array('d', [x[1] for x in scores])
+          digest.update('\0'.join([(isinstance(term, unicode) and term.encode('utf-8') or term) for term in terms]))
+          digest.update(posvals.tostring())
+          digest.update(negvals.tostring())
+      self._fingerprint = (dicts, digest.hexdigest())
+      return self._fingerprint[1]
+
+    def compare_all(self, L, poslist=('a', 'v', 'r', 'n')):
+      '''
+        Compares this lexicon with L for each part of speech in poslist. Returns dict by POS code, each holding:
+          intersect   - number of terms found in both lexicons
+          agree       - proportion of intersecting terms whose valence (positive - negative score) has same sign in both lexicons
+          correlation - Pearson correlation of valences of intersecting terms (None if undefined)
+          distro      - (positive, negative, neutral) term counts by sign of valence, for this lexicon
+          distro_other - same, for L
+        Uses NumPy if available.
+      '''
+      results = {}
+      for pos in poslist:
+          T1 = self.get_score_table(pos)
+          T2 = L.get_score_table(pos)
+          common = set(T1.index).intersection(T2.index)
+          idx1 = [T1.index[term] for term in common]
+          idx2 = [T2.index[term] for term in common]
+          results[pos] = _compare_valences(T1, T2, idx1, idx2)
+      return results
+
     def compare(self, L, pos):
       '''
         Compares current lexicon with "L" on "pos" part of speech ('a','v','n','r')
+        See compare_all() for more statistics.
       '''
-      def getsign(x):
-          if x > 0.0:
-              return 1
-          elif x == 0.0:
-              return 0
-          else:
-              return -1
-
-      if pos == 'a':
-          lComp = self.A
-      elif pos == 'v':
-          lComp = self.V
-      elif pos == 'n':
-          lComp = self.N
-      elif pos == 'r':
-          lComp = self.R
-
-      # Intersection
-      I = []
-      for term in lComp:
-          if (pos == 'a' and L.hasadjective(term))\
-             or (pos == 'v' and L.hasverb(term))\
-             or (pos == 'r' and L.hasadverb(term))\
-             or (pos == 'n' and L.hasnoun(term)):
-              I.append(term)
-
-      print " POS = "+pos+". Intersection of " + self.LexName + " and " + L.get_name() + " -> " + str(len(I))
+      result = self.compare_all(L, [pos])[pos]
+      print " POS = "+pos+". Intersection of " + self.LexName + " and " + L.get_name() + " -> " + str(result['intersect'])
 
       # % Agreement between lexicons - we consider terms in agreement if overall valence (positive-negative) is of same sign.
-      agree = 0.0
-      for term in I:
-          if (pos == 'a' and (getsign(L.getadjective(term)[0] - L.getadjective(term)[1]) == getsign(self.getadjective(term)[0] - self.getadjective(term)[1])))\
-           or (pos == 'v' and (getsign(L.getverb(term)[0] - L.getverb(term)[1]) == getsign(self.getverb(term)[0] - self.getverb(term)[1])))\
-           or (pos == 'r' and (getsign(L.getadverb(term)[0] - L.getadverb(term)[1]) == getsign(self.getadverb(term)[0] - self.getadverb(term)[1])))\
-           or (pos == 'n' and (getsign(L.getnoun(term)[0] - L.getnoun(term)[1]) == getsign(self.getnoun(term)[0] - self.getnoun(term)[1]))):
-              agree = agree+1
-
-      if I:
-          print " POS = "+pos+". % Agreement on ("+self.LexName+") Intersec. ("+L.get_name()+") -> "+str(agree/(len(I)+0.0))
-          return {'intersect':len(I), 'agree': agree/(len(I)+0.0)}
+      if result['intersect']:
+          print " POS = "+pos+". % Agreement on ("+self.LexName+") Intersec. ("+L.get_name()+") -> "+str(result['agree'])
+          return {'intersect': result['intersect'], 'agree': result['agree']}
 
 
     def getbestvalues(self, key, A):
@@ -215,6 +327,10 @@ class Lexicon(object):
           Generate corpus based frequency distribution for terms in this lexicon.
           We use NLTK's brown corpus of (potentially) opinionated articles as our source data.
         '''
+        # NLTK and its corpora are only imported when frequencies are needed
+        import nltk
+        from nltk.corpus import brown
+
         # Load corpus
         # Mar-14 - extending to entire brown corpus for better coverage
         BC = brown.words()
@@ -227,8 +343,13 @@ class Lexicon(object):
         '''
           Retrieves term's *relative* frequency in relation to lexicon's most frequent term as obtained from Brown corpus data
         '''
-        assert self.LexFreq, "Please initialize frequency distributions with compileFrequency()"
-        return self.LexFreq.freq(term)/self.LexFreq.freq(self.LexFreq.max())
+        LexFreq = self.LexFreq
+        assert LexFreq, "Please initialize frequency distributions with compileFrequency()"
+        if self._freqnorm is None or self._freqnorm[0] is not LexFreq:
+            # FreqDist.freq() and max() scan the whole distribution, so compute normalizers once
+            self._freqnorm = (LexFreq, float(LexFreq.N()), LexFreq.freq(LexFreq.max()))
+        (ignore, total, maxfreq) = self._freqnorm
+        return (LexFreq[term]/total)/maxfreq
 
     def printstdterms(self):
         '''
@@ -262,17 +383,38 @@ class ResourceLexicon(Lexicon):
      Note that it is common for a word to map to more than a single sense, thus multiple data points are allowed.
 
      Sample loader functions for various knowledge resources can be found in the sentlexutil module.
+
+     Loading can be deferred with load(datafile, deferred=True): the file is then only read (and frequencies
+     compiled) the first time lexicon data is accessed.
     '''
+    # attributes that trigger loading of a deferred lexicon
+    DEFERRED_ATTRS = set(['A', 'V', 'R', 'N', 'LexFreq'])
+
     def __init__(self, name=None, loader=None):
         super(ResourceLexicon,self).__init__()
         if name: self.LexName = name
         if loader: self.f_loader=loader
     
-    def load(self,datafile):
+    def __getattr__(self, name):
+        # only called for missing attributes - i.e. lexicon data of a deferred lexicon
+        if name in ResourceLexicon.DEFERRED_ATTRS and self.__dict__.get('is_deferred'):
+            self.load(self.__dict__['datafile'])
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def load(self, datafile, deferred=False):
         '''
-           Loads lexicon from file into dictionaries
+           Loads lexicon from file into dictionaries.
+           If deferred, only records the data file, which is loaded on first use.
         '''
         assert self.f_loader, 'This lexicon does not have an associated loader function.'
+        self.datafile = datafile
+        if deferred:
+            # remove data attributes so first access goes through __getattr__
+            for attr in ResourceLexicon.DEFERRED_ATTRS:
+                self.__dict__.pop(attr, None)
+            self.is_deferred = True
+            return True
 
         self.A = self.f_loader('a',datafile)
         self.V = self.f_loader('v',datafile)
@@ -280,6 +422,7 @@ class ResourceLexicon(Lexicon):
         self.N = self.f_loader('n',datafile)
         self.compile_frequency()
         self.is_loaded = True
+        self.is_deferred = False
         return True
 
     def getadjective(self,term):
@@ -307,6 +450,12 @@ class ResourceLexicon(Lexicon):
         '''
         return self.getbestvalues(term, self.N)
 
+    def get_scores(self, pos, terms):
+        # A/V/R/N dictionaries are named after POS codes
+        D = getattr(self, pos.upper())
+        getbestvalues = self.getbestvalues
+        return [getbestvalues(term, D) for term in terms]
+
 
 ##
 #
@@ -347,6 +496,15 @@ class CompositeLexicon(Lexicon):
         '''
         self.factor = newval
 
+    def get_fingerprint(self):
+        '''
+         Digest of the fingerprints of lexicons in the list, in order, and the confidence factor.
+        '''
+        digest = hashlib.sha1('%s %r' % (self.get_name(), self.factor))
+        for L in self.LLIST:
+            digest.update(L.get_fingerprint())
+        return digest.hexdigest()
+
     def _scan_lexlist_val(self, lexlist, term, f_checker, f_getter, notfound_val):
         '''
          Generic scanner, iterates lexicon list for term, using "checker" and "getter"
@@ -395,7 +553,221 @@ class CompositeLexicon(Lexicon):
  
     def hasadjective(self, term):
         return self._scan_lexlist_presence(self.LLIST, term, "hasadjective")
+
+    def get_score_table(self, pos):
+        '''
+         Table covers terms of all lexicons in the list. It is rebuilt on every call, as lexicons may be added.
+        '''
+        terms = []
+        seen = set()
+        for L in self.LLIST:
+            for term in L.get_score_table(pos).terms:
+                if term not in seen:
+                    seen.add(term)
+                    terms.append(term)
+        return self._build_score_table(pos, terms)
  
+##
+#
+# Compact Lexicon
+#
+##
+class PackedTable(object):
+    '''
+      Read-only string-keyed table of fixed-width float records, packed into a handful of flat buffers:
+
+        keys    - one string holding all keys back to back
+        offsets - array of key start positions in keys
+        values  - array of floats, "width" values per key
+        slots   - open addressing hash table (array) mapping hashed keys to record index
+
+      Lookups never create or reference per-key Python objects, so a table built before os.fork()
+      stays shared between processes - reading it does not trigger copy-on-write of its pages.
+      Iterating over a table yields its keys, and "in"/has_key() work as for a dict.
+    '''
+    def __init__(self, items, width, distro=None):
+        '''
+          items - list of (key, values) pairs, where values is a tuple of "width" floats
+        '''
+        items = sorted([(self._encode(k), v) for (k, v) in items])
+        self.width = width
+        self.distro = distro
+        self.size = len(items)
+        self.keys = ''.join([k for (k, v) in items])
+        self.offsets = array('l', [0])
+        self.values = array('d')
+        pos = 0
+        for (k, v) in items:
+            pos += len(k)
+            self.offsets.append(pos)
+            self.values.extend(v)
+        # hash table is kept at most half full
+        nslots = 8
+        while nslots < 2*self.size:
+            nslots *= 2
+        self.mask = nslots - 1
+        self.slots = array('l', [-1])*nslots
+        for (idx, (k, v)) in enumerate(items):
+            h = hash(k) & self.mask
+            while self.slots[h] >= 0:
+                h = (h+1) & self.mask
+            self.slots[h] = idx
+
+    def _encode(self, key):
+        if isinstance(key, unicode):
+            return key.encode('utf-8')
+        return key
+
+    def find(self, key):
+        '''
+          Returns record index for key, or -1 if not found
+        '''
+        key = self._encode(key)
+        keys = self.keys
+        offsets = self.offsets
+        slots = self.slots
+        mask = self.mask
+        h = hash(key) & mask
+        idx = slots[h]
+        while idx >= 0:
+            if keys[offsets[idx]:offsets[idx+1]] == key:
+                return idx
+            h = (h+1) & mask
+            idx = slots[h]
+        return -1
+
+    def get(self, key, default=None):
+        '''
+          Returns tuple of values stored for key, or default if not found
+        '''
+        idx = self.find(key)
+        if idx < 0:
+            return default
+        start = idx*self.width
+        return tuple(self.values[start:start+self.width])
+
+    def has_key(self, key):
+        return self.find(key) >= 0
+
+    __contains__ = has_key
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for idx in xrange(self.size):
+            yield self.keys[self.offsets[idx]:self.offsets[idx+1]]
+
+
+class CompactLexicon(Lexicon):
+    '''
+      Read-only copy of a loaded lexicon, with all data held in a few flat buffers (see PackedTable) instead
+      of dictionaries holding millions of lists, tuples and floats.
+
+      Intended for lexicons that are loaded once in a parent process and then used from forked workers:
+
+        L = CompactLexicon(SWN3Lexicon())
+
+      The dict-based lexicon can be discarded after the copy is built. Scores are the same as the source
+      lexicon's getadjective()/getverb()/... values, as these are resolved at build time.
+      A, V, R and N are PackedTable objects: they support iteration over terms, len() and membership,
+      but not access to individual sense tuples.
+    '''
+    def __init__(self, L=None):
+        super(CompactLexicon,self).__init__()
+        if L: self.build(L)
+
+    def build(self, L):
+        '''
+          Builds compact tables from lexicon L (any Lexicon with populated A/V/R/N dictionaries)
+        '''
+        self.LexName = L.get_name()
+        self.A = self._pack(L, L.A)
+        self.V = self._pack(L, L.V)
+        self.R = self._pack(L, L.R)
+        self.N = self._pack(L, L.N)
+        if L.LexFreq:
+            # relative frequencies, as computed by get_freq()
+            self.LexFreq = PackedTable([(term, (L.get_freq(term),)) for term in L.LexFreq], 1)
+            self.is_compiled = True
+        self.is_loaded = True
+
+    def _pack(self, L, D):
+        return PackedTable([(term, L.getbestvalues(term, D)) for term in D], 2, L._termdistro(D))
+
+    def _termdistro(self, A):
+        return A.distro
+
+    def compile_frequency(self):
+        # frequencies are copied from the source lexicon at build time
+        pass
+
+    def get_freq(self, term):
+        assert self.LexFreq, "Please initialize frequency distributions with compileFrequency()"
+        idx = self.LexFreq.find(term)
+        if idx < 0:
+            return 0.0
+        return self.LexFreq.values[idx]
+
+    def getbestvalues(self, key, A):
+        idx = A.find(key)
+        if idx < 0:
+            return (0,0)
+        posval = A.values[2*idx]
+        negval = A.values[2*idx+1]
+        if posval == 0.0 and negval == 0.0:
+            # same as getbestvalues() for terms w/out polarity
+            return (0,0)
+        return (posval, negval)
+
+    def _build_score_table(self, pos, D):
+        # scores are already held in flat arrays, as (pos, neg) pairs in term order
+        terms = list(D)
+        return ScoreTable(terms, D.values[0::2], D.values[1::2], dict(zip(terms, xrange(len(terms)))))
+
+    def get_scores(self, pos, terms):
+        table = getattr(self, pos.upper())
+        find = table.find
+        values = table.values
+        scores = []
+        for term in terms:
+            idx = find(term)
+            if idx < 0:
+                scores.append((0,0))
+                continue
+            posval = values[2*idx]
+            negval = values[2*idx+1]
+            if posval == 0.0 and negval == 0.0:
+                scores.append((0,0))
+            else:
+                scores.append((posval, negval))
+        return scores
+
+    def hasnoun(self, term):
+        return self.N.find(term) >= 0
+
+    def hasverb(self, term):
+        return self.V.find(term) >= 0
+
+    def hasadverb(self, term):
+        return self.R.find(term) >= 0
+
+    def hasadjective(self, term):
+        return self.A.find(term) >= 0
+
+    def getadjective(self, term):
+        return self.getbestvalues(term, self.A)
+
+    def getadverb(self, term):
+        return self.getbestvalues(term, self.R)
+
+    def getverb(self, term):
+        return self.getbestvalues(term, self.V)
+
+    def getnoun(self, term):
+        return self.getbestvalues(term, self.N)
+
+
 ##
 # Sample Lexicons
 #
@@ -416,11 +788,11 @@ class MobyLexicon(ResourceLexicon):
       2011 IEEE Workshops of International Conference on. IEEE, 2011.
     '''
 
-    def __init__(self):
+    def __init__(self, deferred=False):
         curpath = os.path.dirname(os.path.abspath(__file__))
         datapath = os.path.join(curpath, 'data/GB1_S.lex')
         super(MobyLexicon,self).__init__('Moby-GB', sentlexutil.readMoby)
-        self.load(datapath)
+        self.load(datapath, deferred)
 
 
 class SWN3Lexicon(ResourceLexicon):
@@ -433,11 +805,11 @@ class SWN3Lexicon(ResourceLexicon):
 
       See further details on file SentiWordNet_3.0.0.lex in the data directory.
     '''
-    def __init__(self):
+    def __init__(self, deferred=False):
         curpath = os.path.dirname(os.path.abspath(__file__))
         datapath = os.path.join(curpath, 'data/SentiWordNet_3.0.0.lex')
         super(SWN3Lexicon,self).__init__('SWN3', sentlexutil.readSWN3)
-        self.load(datapath)
+        self.load(datapath, deferred)
 
 
 class UICLexicon(ResourceLexicon):
@@ -455,8 +827,8 @@ class UICLexicon(ResourceLexicon):
        Washington, USA, 
 
     '''
-    def __init__(self):
+    def __init__(self, deferred=False):
         curpath = os.path.dirname(os.path.abspath(__file__))
         datapath = os.path.join(curpath, 'data/uic.lex')
         super(UICLexicon,self).__init__('UIC', sentlexutil.readUIC)
-        self.load(datapath)
+        self.load(datapath, deferred)
@@ -12,14 +12,24 @@ import os
 class Stopword(object):
     '''
      Stopword class - encapsulates dict containing all known stop words in lowercase
+     The default stop words file is only read when the word list is first used.
     '''
 
     def __init__(self, filename=None):
-        self.worddict = {}
+        self._worddict = {}
+        self._pending = None
         if not filename:
             curpath = os.path.dirname(os.path.abspath(__file__))
-            filename = os.path.join(curpath, 'data/objective.txt')
+            self._pending = os.path.join(curpath, 'data/objective.txt')
+
+    def _get_worddict(self):
+        if self._pending:
+            filename = self._pending
+            self._pending = None
             self.load(filename)
+        return self._worddict
+
+    worddict = property(_get_worddict)
 
     def load(self, filename):
         f = open(filename)
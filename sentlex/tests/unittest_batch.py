@@ -0,0 +1,110 @@
+try:
+    import sentlex.batch as batch
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentlex as sentlex
+except Exception:
+    import batch
+    import sentanalysis as sentdoc
+    import sentlex
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+#####
+#
+# Unit Testing for bulk document scoring
+#
+####
+
+TESTDOCS = ['good/JJ good/JJ nice/JJ', 'not/DT bad/JJ ./. not/DT really/RR bad/JJ', 'this/DT is/VBZ bad/JJ', 'nothing/NN here/RB']
+
+
+# T0 - documents are read from directories, globs and streams
+class T0_input(unittest.TestCase):
+    def runTest(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, 'sub'))
+            paths = [os.path.join(tmpdir, 'a.txt'), os.path.join(tmpdir, 'b.pos'), os.path.join(tmpdir, 'sub', 'c.txt')]
+            for (path, doc) in zip(paths, TESTDOCS):
+                open(path, 'w').write(doc)
+            self.assertEqual(list(batch.iter_documents([tmpdir])), zip(paths, TESTDOCS), 'Directory walk failed')
+            self.assertEqual([d[0] for d in batch.iter_documents([os.path.join(tmpdir, '*.txt')])], paths[:1], 'Glob expansion failed')
+            self.assertRaises(IOError, list, batch.iter_documents([os.path.join(tmpdir, 'missing*')]))
+        finally:
+            shutil.rmtree(tmpdir)
+
+        stream = StringIO('\n'.join(TESTDOCS[:2]) + '\n\n')
+        self.assertEqual(list(batch.iter_documents(stream=stream)), [(1, TESTDOCS[0]), (2, TESTDOCS[1])], 'Line input failed')
+        stream = StringIO(json.dumps({'id': 'x', 'doc': TESTDOCS[0]}) + '\n' + json.dumps({'text': TESTDOCS[1]}) + '\n')
+        self.assertEqual(list(batch.iter_documents(stream=stream, input_format='jsonl')), [('x', TESTDOCS[0]), (2, TESTDOCS[1])], 'JSONL input failed')
+
+        # malformed lines are reported as errors, and the run goes on
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        stream = StringIO(json.dumps({'doc': TESTDOCS[0]}) + '\nnotjson\n[1, 2]\n' + json.dumps({'doc': TESTDOCS[1]}) + '\n')
+        results = list(batch.score_documents(ds, batch.iter_documents(stream=stream, input_format='jsonl')))
+        self.assertEqual([r['id'] for r in results], [1, 2, 3, 4])
+        self.assertEqual(['error' in r for r in results], [False, True, True, False], 'Malformed lines not reported')
+        self.assertTrue(results[1]['error'].startswith('InputError: line 2'))
+
+
+# T1 - bulk scoring matches single document scoring, with and without workers
+class T1_score(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        expected = []
+        for doc in TESTDOCS:
+            (pos, neg) = ds.classify_document(doc, verbose=False)
+            expected.append((pos, neg, ds.resultdata['tokens_found']))
+
+        docs = list(enumerate(TESTDOCS * 5))
+        for workers in [1, 2]:
+            results = list(batch.score_documents(ds, iter(docs), workers=workers, chunksize=3, annotate=(workers == 2)))
+            self.assertEqual([r['id'] for r in results], range(len(docs)), 'Results out of order')
+            for r in results:
+                self.assertEqual((r['resultpos'], r['resultneg'], r['tokens_found']), expected[r['id'] % len(TESTDOCS)], 'Bulk result differs')
+            self.assertEqual('annotated_doc' in results[0], workers == 2, 'Annotation flag ignored')
+
+        out = StringIO()
+        self.assertEqual(batch.write_jsonl(batch.score_documents(ds, docs[:2]), out), 2)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [0, 1], 'JSONL output failed')
+
+# T2 - columnar results match result dicts, in memory and on disk, with and without workers
+class T2_columns(unittest.TestCase):
+    def runTest(self):
+        try:
+            import numpy
+        except ImportError:
+            return
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        docs = list(enumerate(TESTDOCS * 5 + [None]))
+        expected = [(r['resultpos'], r['resultneg'], r['tokens_found'], r['tokens_negated']) for r in batch.score_documents(ds, docs[:-1])]
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for (workers, path) in [(1, None), (2, None), (1, os.path.join(tmpdir, 'serial')), (2, os.path.join(tmpdir, 'workers'))]:
+                columns = batch.ResultColumns(len(docs) + 1, path)
+                self.assertEqual(batch.score_columns(ds, iter(docs), columns, workers=workers, chunksize=3), len(docs))
+                if path:
+                    # reopened read-only from disk
+                    columns = batch.ResultColumns.open(path)
+                rows = zip(columns['resultpos'], columns['resultneg'], columns['tokens_found'], columns['tokens_negated'])
+                self.assertEqual(rows[:-2], expected, 'Column results differ (workers=%d, path=%s)' % (workers, path))
+                self.assertEqual(list(columns['status']), [1] * len(expected) + [-1, 0], 'Wrong status column')
+            self.assertRaises(IndexError, batch.score_columns, ds, iter(docs), batch.ResultColumns(2))
+        finally:
+            shutil.rmtree(tmpdir)
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
@@ -0,0 +1,54 @@
+try:
+    import sentlex.benchmark as benchmark
+except Exception:
+    import benchmark
+
+import json
+import unittest
+
+#####
+#
+# Unit Testing for benchmark harness
+#
+####
+
+# T0 - synthetic corpora
+class T0_corpus(unittest.TestCase):
+    def runTest(self):
+        vocab = benchmark.load_vocabulary()
+        for pos in ['a', 'v', 'r', 'n']:
+            self.assertTrue(len(vocab[pos]) > 0, 'No vocabulary loaded for %s' % pos)
+
+        C1 = benchmark.generate_corpus(5, 100, seed=42)
+        C2 = benchmark.generate_corpus(5, 100, seed=42)
+        C3 = benchmark.generate_corpus(5, 100, seed=43)
+        self.assertEqual(C1, C2, 'Same seed should generate same corpus')
+        self.assertNotEqual(C1, C3, 'Different seeds generated same corpus')
+        for doc in C1:
+            tokens = doc.split(' ')
+            self.assertEqual(len(tokens), 100, 'Wrong document length')
+            self.assertTrue(all(['/' in t for t in tokens]), 'Untagged token in synthetic document')
+
+# T1 - running benchmarks and comparing results
+class T1_run(unittest.TestCase):
+    def runTest(self):
+        plan = [('negation', {'ndocs': 3, 'doclen': 50, 'repeat': 1})]
+        results = benchmark.run_benchmarks(plan, isolate=False)
+        self.assertEqual(len(results['results']), 1, 'Missing benchmark results')
+        r = results['results'][0]['result']
+        self.assertTrue(r['seconds'] >= 0.0 and r['tokens_per_sec'] > 0, 'Bad throughput figures')
+        self.assertTrue('peak_rss_kb' in r, 'No memory figures reported')
+
+        # results must survive a JSON round-trip, and compare to themselves
+        results = json.loads(json.dumps(results))
+        comparison = benchmark.compare_results(results, results)
+        self.assertEqual(len(comparison), 1, 'Unable to compare results')
+        self.assertEqual(comparison[0][4], 1.0, 'Same results should compare equal')
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
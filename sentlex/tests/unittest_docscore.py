@@ -81,6 +81,9 @@ class T1_scoring_documents(unittest.TestCase):
         (dpos, dneg) = ds.classify_document(TESTDOC_NEGATED, verbose=True)
         self.assertTrue(dpos > dneg, 'Did not find positive words on TESTDOC_NEGATED')
         print 'TESTDOC_NEGATED (pos,neg): %2.2f %2.2f' % (dpos, dneg)
+        self.assertEqual(type(ds.vNEG), list, 'vNEG no longer a list')
+        self.assertEqual(ds.vNEG, ds.negmask.tolist(), 'vNEG differs from negation mask')
+        self.assertEqual(ds.resultdata['tokens_negated'], sum(ds.vNEG), 'Negated token count is wrong')
 
         # currupt data - should still work
         (dpos, dneg) = ds.classify_document(TESTDOC_CORRUPT, verbose=True)
@@ -149,6 +152,214 @@ class T4_sample_classes(unittest.TestCase):
             (p,n) = algo.classify_document(TESTDOC_ADJ, verbose=True)
             self.assertTrue(p>n, 'Sample document not scored correctly in %s' % str(algo.__class__))
 
+class T5_instrumentation(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+
+        # off by default
+        self.assertEqual(ds.get_stats(), None, 'Instrumentation should be disabled by default')
+        ds.classify_document(TESTDOC_ADJ)
+
+        ds.set_stats(True)
+        ds.classify_document(TESTDOC_ADJ)
+        ds.classify_document(TESTDOC_UNTAGGED, tagged=False)
+        stats = ds.get_stats()
+        self.assertEqual(stats['counters']['calls'], 2, 'Calls not aggregated')
+        self.assertEqual(stats['counters']['tokens'], 10 + len(ds.pos_tag(TESTDOC_UNTAGGED).split()), 'Wrong token count')
+        self.assertTrue(stats['counters']['scored_tokens'] >= 10, 'Wrong scored token count')
+        self.assertTrue(stats['counters']['lemmatizer_calls'] > 0, 'Lemmatizer calls not counted')
+        self.assertTrue(stats['times']['tagging'] > 0.0, 'Tagging time not measured')
+        print stats
+
+        # 'is' appears twice - second lemmatization is a cache hit
+        self.assertTrue(stats['counters']['cache_hits'] > 0, 'Cache hits not counted')
+
+        # lemma memo is bounded
+        ds.lemma_cache = sentdoc.LRUCache(2)
+        ds.classify_document('was/VBD is/VBZ ran/VBD went/VBD', verbose=False)
+        self.assertEqual(len(ds.lemma_cache), 2, 'Lemma cache not bounded')
+
+        ds.set_stats(False)
+        ds.classify_document(TESTDOC_ADJ)
+        self.assertEqual(ds.get_stats(), None, 'Unable to disable instrumentation')
+
+class T6_config(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_Cos_AllWordsDocSentiScore(L)
+        config = ds.get_config()
+        self.assertTrue(ds.get_config() is config, 'Config rebuilt without parameter changes')
+        self.assertEqual((config.score_function, config.negation_window), ('cosine', 5))
+        self.assertEqual(hash(config), hash(ds.get_config()), 'Config is not hashable')
+
+        # parameter changes, through setters or direct assignment, invalidate config
+        ds.set_parameters(negation_window=3, negation=True)
+        self.assertEqual(ds.get_config().negation_window, 3, 'Config not updated by set_parameters')
+        ds.score_freq = False
+        self.assertEqual(ds.get_config().score_freq, False, 'Config not updated by assignment')
+        ds.classify_document(TESTDOC_NEGATED, verbose=False, score_function='linear')
+        self.assertEqual(ds.get_config().score_function, 'linear', 'Config not updated by classify_document')
+
+        # config applied to another classifier gives same results
+        other = sentdoc.BasicDocSentiScore()
+        other.set_lexicon(L)
+        other.set_config(ds.get_config())
+        self.assertEqual(other.get_config()[1:], ds.get_config()[1:], 'Config not applied')
+        for doc in [TESTDOC_ADJ, TESTDOC_NEGATED, TESTDOC_CORRUPT]:
+            self.assertEqual(other.classify_document(doc, verbose=False), ds.classify_document(doc, verbose=False))
+
+class T7_weight_functions(unittest.TestCase):
+    def runTest(self):
+        try:
+            import sentlex.docscoreutil as docscoreutil
+        except Exception:
+            import docscoreutil
+
+        # vector forms match per-token functions exactly
+        for (name, function) in [('linear', docscoreutil.weightLinear), ('cosine', docscoreutil.weightCosine)]:
+            for N in [1, 7, 100]:
+                weights = docscoreutil.get_position_weights(name, N)
+                self.assertEqual(len(weights), N + 1)
+                self.assertEqual([0.3*w for w in weights[1:]], [function(0.3, i, N) for i in range(1, N + 1)], 'Weight table differs for %s' % name)
+                self.assertTrue(docscoreutil.get_position_weights(function, N) is weights, 'Weight table not cached')
+        self.assertEqual(docscoreutil.get_position_weights('noop', 10), ())
+        self.assertEqual(docscoreutil.get_position_weights(lambda s, i, N: s, 10), None)
+
+        # user defined function, with and without its vector form
+        L = sentlex.MobyLexicon()
+        def lateweight(score, i, N):
+            return score*float(i)/N
+        docscoreutil.register_weight_function('late', lateweight, lambda N: [float(i)/N for i in range(N + 1)])
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        ds.set_parameters(score_function='late')
+        self.assertEqual(ds.get_config().score_function, 'late', 'Registered function not used')
+        ref = sentdoc.AV_AllWordsDocSentiScore(L)
+        ref.score_function = lambda score, i, N: score*float(i)/N
+        for doc in [TESTDOC_ADJ, TESTDOC_NEGATED, TESTDOC_CORRUPT]:
+            self.assertEqual(ds.classify_document(doc, verbose=False), ref.classify_document(doc, verbose=False), 'Vectorized scores differ')
+            self.assertEqual(ds.resultdata['annotated_doc'], ref.resultdata['annotated_doc'])
+        del docscoreutil.WEIGHT_FUNCTIONS['late']
+
+        # LRU cache evicts least recently used items
+        cache = docscoreutil.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache.get('a')
+        cache['c'] = 3
+        self.assertEqual(('a' in cache, 'b' in cache, 'c' in cache, len(cache)), (True, False, True, 2))
+        self.assertEqual((cache.get('b'), cache.hits, cache.misses), (None, 1, 1))
+
+class T8_multiple_lexicons(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        U = sentlex.UICLexicon()
+        C = sentlex.CompactLexicon(L)
+        ds = sentdoc.AV_Lin_AllWordsDocSentiScore(L)
+        for doc in [TESTDOC_ADJ, TESTDOC_NEGATED, TESTDOC_CORRUPT, 'I/PRP liked/VBD and/CC liked/VBD it/PRP ./.']:
+            results = ds.classify_lexicons(doc, [U, L, C])
+            self.assertTrue(ds.L is L, 'Classifier lexicon changed')
+            for (lexicon, result, resultdata) in zip([U, L, C], results, ds.lexicon_resultdata):
+                ref = sentdoc.AV_Lin_AllWordsDocSentiScore(lexicon)
+                self.assertEqual(result, ref.classify_document(doc, verbose=False), 'Scores differ for %s' % lexicon.get_name())
+                self.assertEqual(resultdata['annotated_doc'], ref.resultdata['annotated_doc'])
+
+# T9 - pre-tokenized documents score the same as tagged strings
+class T9_pretokenized(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        for ds in [sentdoc.AV_AllWordsDocSentiScore(L), sentdoc.A_Cos_AllWordsDocSentiScore(L), sentdoc.AV_OnceWordsDocSentiScore(L)]:
+            for (doc, sep) in [(TESTDOC_ADJ, '/'), (TESTDOC_BADADJ, '_'), (TESTDOC_NEGATED, '/'), (TESTDOC_CORRUPT, '_')]:
+                pairs = [sentdoc.str2tuple(token, sep) for token in doc.split()]
+                expected = ds.classify_document(doc, verbose=False)
+                resultdata = ds.resultdata
+                parallel = ([word for (word, tag) in pairs], [tag for (word, tag) in pairs])
+                for tokens in [pairs, parallel]:
+                    self.assertEqual(ds.classify_document(tokens, verbose=False), expected, 'Scores differ for %s' % doc)
+                    self.assertEqual((ds.resultdata['tokens_found'], ds.resultdata['tokens_negated']), (resultdata['tokens_found'], resultdata['tokens_negated']))
+                    if sep == '/':
+                        # tag strings of pre-tokenized documents use '/'
+                        for key in ['annotated_doc', 'found_list', 'unscored_list']:
+                            self.assertEqual(ds.resultdata[key], resultdata[key], 'Result %s differs for %s' % (key, doc))
+        self.assertEqual(ds.classify_document([], verbose=False), (0.0, 0.0), 'Empty document failed')
+
+# T10 - results keep token data until read, and read like the resultdata dict
+class T10_score_result(unittest.TestCase):
+    def runTest(self):
+        U = sentlex.UICLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(U)
+        doc = 'good/JJ not/DT bad/JJ movie_NN ./. good/JJ'
+        ds.classify_document(doc, verbose=False, negation=True, negation_window=5)
+        result = ds.result
+        self.assertEqual((result.doc, result.tokens_found, result.tokens_negated), (doc, 3, 4))
+        self.assertTrue(result._fields is None, 'Token fields built before use')
+        annotated = result['annotated_doc'].split(' ')
+        self.assertEqual(len(annotated), 5, 'Corrupt token not left out')
+        self.assertTrue(annotated[2].startswith('bad/JJ##NEGAT:1##POS:'), 'Wrong annotation')
+        self.assertEqual(result['found_list'], {'good/JJ': 2, 'bad/JJ': 1})
+        self.assertEqual(result.get('unscored_list'), [])
+        self.assertEqual(sorted(result.keys()), sorted(ds.resultdata.keys()))
+        self.assertEqual(result.get('sentence_scores', 'none'), 'none')
+        self.assertRaises(KeyError, lambda: result['sentence_scores'])
+
+        # joined results of slices of the same document, as for sentences
+        prepared = ds.prepare_document(doc)
+        parts = []
+        for (start, end) in [(0, 5), (5, 6)]:
+            ds.score_prepared(prepared.slice(start, end))
+            parts.append(ds.result)
+        joined = sentdoc.ScoreResult.join(doc, parts, 1, 0, {'sentence_scores': [(1,0), (1,0)]})
+        self.assertTrue(joined.source is prepared.source, 'Token data of slices not joined')
+        self.assertEqual(joined['annotated_doc'], parts[0]['annotated_doc'] + parts[1]['annotated_doc'])
+        self.assertEqual(joined['sentence_scores'], [(1,0), (1,0)])
+
+        # dicts set by other classifiers, and copies
+        ds.resultdata = {'doc': doc, 'resultpos': 1, 'resultneg': 0, 'annotated_doc': 'x'}
+        self.assertEqual((ds.result.resultpos, ds.result['annotated_doc']), (1, 'x'))
+        copy = joined.copy(resultpos=2, extra={'vote': 1})
+        self.assertEqual((copy['resultpos'], copy['vote'], copy.get('sentence_scores')), (2, 1, None))
+        self.assertEqual(copy['annotated_doc'], joined['annotated_doc'])
+        ds.resultdata = {}
+        self.assertEqual((ds.result, ds.resultdata), (None, {}))
+
+# T11 - resolved documents are rescored under any parameters without lookups, also after written to disk
+class T11_resolved_documents(unittest.TestCase):
+    def runTest(self):
+        import tempfile
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        docs = [TESTDOC_NEGATED, TESTDOC_CORRUPT, 'not/RB a/DT good/JJ movie/NN ,/, I/PRP hated/VBD it/PRP badly/RB', [('never', 'RB'), ('boring', 'JJ')]]
+        prepared = [ds.resolve_document(ds.prepare_document(doc)) for doc in docs]
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertEqual(sentdoc.write_prepared(path, prepared), len(docs))
+            restored = list(sentdoc.read_prepared(path, [L]))
+        finally:
+            os.remove(path)
+        self.assertEqual(restored[0].tags, prepared[0].tags)
+
+        settings = [{}, {'negation_window': 2}, {'score_freq': True, 'n': True, 'r': True}, {'score_function': 'linear', 'negation': False, 'score_mode': ds.SCOREONCE}]
+        expected = []
+        for params in settings:
+            ds = sentdoc.AV_AllWordsDocSentiScore(L)
+            ds.set_parameters(**params)
+            expected.append([(ds.classify_document(doc, verbose=False), ds.resultdata) for doc in docs])
+
+        # no lexicon lookups from here on
+        L.get_scores = None
+        try:
+            for (params, results) in zip(settings, expected):
+                ds = sentdoc.AV_AllWordsDocSentiScore(L)
+                ds.set_parameters(**params)
+                ds.set_stats(True)
+                for (item, (scores, resultdata)) in zip(restored, results):
+                    self.assertEqual(ds.score_prepared(item), scores, 'Scores differ for %s' % str(params))
+                    self.assertEqual(ds.resultdata, resultdata)
+                self.assertEqual(ds.get_stats()['counters'].get('lemmatizer_calls', 0), 0, 'Resolved document lemmatized again')
+        finally:
+            del L.get_scores
+
 #
 # Runs unit testing if module is called directly
 #
@@ -0,0 +1,71 @@
+try:
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentanalysis_potts as sentdoc_potts
+    import sentlex.sentanalysis_taboada as sentdoc_tab
+    import sentlex.sentanalysis_sent as sentdoc_sent
+    import sentlex.sentanalysis_ensemble as sentdoc_ensemble
+    import sentlex.docscoreutil as docscoreutil
+    import sentlex.sentlex as sentlex
+except Exception:
+    import sentanalysis as sentdoc
+    import sentanalysis_potts as sentdoc_potts
+    import sentanalysis_taboada as sentdoc_tab
+    import sentanalysis_sent as sentdoc_sent
+    import sentanalysis_ensemble as sentdoc_ensemble
+    import docscoreutil
+    import sentlex
+
+import unittest
+
+#####
+#
+# Unit Testing for ensemble classifier
+#
+####
+
+TESTDOCS = [
+    'good/JJ good/JJ good/JJ not/RB bad/JJ ./. I/PRP liked/VBD it/PRP',
+    'not/DT bad/JJ movie/NN ./. blah/NN blah/NN not/DT really/RR good/JJ either/DT ./.',
+    'this_DT doc_NN is_VB not_DT not_DT not_DT in great/JJ shape/JJ good_JJ good_JJ good_JJ',
+]
+
+
+def make_members(L, U):
+    return [sentdoc.AV_AllWordsDocSentiScore(L), sentdoc.A_Cos_AllWordsDocSentiScore(L), sentdoc.AV_OnceWordsDocSentiScore(U),
+            sentdoc_potts.AV_AggressivePottsSentiScore(L), sentdoc_tab.AV_LightTabSentiScore(L), sentdoc_sent.SentenceDocSentiScore(L)]
+
+
+# T0 - ensemble members give same scores as when run on their own, and vote is applied
+class T0_ensemble(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        U = sentlex.UICLexicon()
+        reference = make_members(L, U)
+        for vote in ['majority', 'sum', 'max']:
+            ensemble = sentdoc_ensemble.EnsembleDocSentiScore(make_members(L, U), vote=vote, shift=0.1)
+            for doc in TESTDOCS:
+                expected = [m.classify_document(doc, verbose=False) for m in reference]
+                (pos, neg) = ensemble.classify_document(doc)
+                self.assertEqual(ensemble.resultdata['member_scores'], expected, 'Member scores differ')
+                for (member, ref) in zip(ensemble.members, reference):
+                    self.assertEqual(member.resultdata['annotated_doc'], ref.resultdata['annotated_doc'], 'Member annotation differs')
+                vote_result = ensemble.VOTES[vote](expected, 0.1, 0.0)
+                self.assertEqual(ensemble.resultdata['vote'], vote_result)
+                self.assertEqual((pos, neg), vote_result[2:])
+                self.assertEqual(ensemble.resultdata['doc'], doc)
+
+        # untagged documents are tagged once
+        ensemble = sentdoc_ensemble.EnsembleDocSentiScore(make_members(L, U))
+        ensemble.set_stats(True)
+        ensemble.classify_document('this cookie is not good. it is very bad indeed', tagged=False)
+        self.assertEqual(len(ensemble.resultdata['member_scores']), 6)
+        # one prepared document shared by basic members - lexicon lookups reused
+        self.assertTrue(ensemble.get_stats()['counters']['cache_hits'] > 0, 'Lookups not shared')
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
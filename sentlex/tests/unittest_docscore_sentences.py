@@ -60,6 +60,61 @@ class T1_scoring_documents(unittest.TestCase):
         # currupt data - should still work
         (dpos, dneg) = ds.classify_document(TESTDOC_CORRUPT, verbose=True)
 
+# pre-tokenized documents
+class T2_pretokenized(unittest.TestCase):
+    def runTest(self):
+        L=sentlex.MobyLexicon()
+        ds=sentdoc.SentenceDocSentiScore(L)
+        for doc in [TESTDOC_ADJ, TESTDOC_NEGATED, LARGE1]:
+            expected = ds.classify_document(doc, verbose=False)
+            resultdata = ds.resultdata
+            pairs = [tuple(token.rsplit('/', 1)) for token in doc.split()]
+            self.assertEqual(ds.classify_document(pairs, verbose=False), expected, 'Scores differ')
+            self.assertEqual(ds.resultdata['sentence_scores'], resultdata['sentence_scores'])
+            self.assertEqual(ds.resultdata['annotated_doc'], resultdata['annotated_doc'])
+
+# sentences scored over token ranges give the same results as scoring each sentence string
+class T3_token_ranges(unittest.TestCase):
+    def runTest(self):
+        L=sentlex.MobyLexicon()
+        ds=sentdoc.SentenceDocSentiScore(L)
+        for doc in [TESTDOC_ADJ, TESTDOC_BADADJ, TESTDOC_NEGATED, TESTDOC_CORRUPT, LARGE1]:
+            sentences = ds._sent_tokenize(doc, ds._detect_tag(doc))
+            prepared = ds.sentence_classifier.prepare_document(doc)
+            self.assertEqual([' '.join(prepared.tags[start:end]) for (start, end) in ds._sent_ranges(prepared)], sentences)
+            ds.classify_document(doc, verbose=False)
+            annotated = ''
+            for sentence in sentences:
+                ds.sentence_classifier.classify_document(sentence, verbose=False)
+                annotated += ds.sentence_classifier.resultdata['annotated_doc']
+            self.assertEqual(ds.resultdata['annotated_doc'], annotated, 'Sentence scores differ')
+
+# repeated sentences are taken from the sentence cache, with same results
+class T5_sentence_cache(unittest.TestCase):
+    def runTest(self):
+        L=sentlex.MobyLexicon()
+        docs = [TESTDOC_NEGATED, 'great/JJ movie/NN ./. ' + TESTDOC_NEGATED, LARGE1, TESTDOC_NEGATED + ' ' + TESTDOC_ADJ, TESTDOC_CORRUPT]
+        ds=sentdoc.SentenceDocSentiScore(L)
+        ref=sentdoc.SentenceDocSentiScore(L)
+        ref.set_sentence_cache(0)
+        for doc in docs + [[tuple(token.rsplit('/', 1)) for token in TESTDOC_NEGATED.split()]]:
+            self.assertEqual(ds.classify_document(doc, verbose=False), ref.classify_document(doc, verbose=False))
+            self.assertEqual(ds.resultdata, ref.resultdata, 'Cached sentence results differ')
+        self.assertTrue(ds.sentence_cache.hits >= 6, 'Sentences not reused')
+        for (pos, neg, result) in ds.sentence_cache.items.values():
+            self.assertTrue(type(result.source) is tuple, 'Cached sentence holds document')
+        # parameters are part of the key
+        ds.set_parameters(negation=False)
+        ref.set_parameters(negation=False)
+        self.assertEqual(ds.classify_document(TESTDOC_NEGATED, verbose=False), ref.classify_document(TESTDOC_NEGATED, verbose=False))
+        self.assertEqual(ds.resultdata['annotated_doc'], ref.resultdata['annotated_doc'])
+        # cache keys need no lexicon fingerprint, and results are dropped with the lexicon
+        self.assertTrue(L._fingerprint is None, 'Lexicon fingerprinted for sentence cache')
+        U = sentlex.UICLexicon()
+        for classifier in [ds, ref]:
+            classifier.sentence_classifier.set_lexicon(U)
+        self.assertEqual(ds.classify_document(TESTDOC_NEGATED, verbose=False), ref.classify_document(TESTDOC_NEGATED, verbose=False))
+        self.assertEqual(ds.resultdata, ref.resultdata, 'Results of previous lexicon reused')
 
 class T4_large_docs(unittest.TestCase):
     def runTest(self):
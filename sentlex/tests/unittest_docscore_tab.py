@@ -94,6 +94,23 @@ class T4_sample_classes(unittest.TestCase):
             print ' ==> ' + str(algo.__class__)
             (p,n) = algo.classify_document(TESTDOC_NEGATED, verbose=True)
 
+# T5 - fused scan gives same results as generic scan (used when debugging)
+class T5_fused_scan(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        for params in [{}, {'score_function': 'linear', 'negation_shift': 0.8}, {'score_stop': False, 'score_freq': False, 'n': True}, {'negation': False}]:
+            for algo in [sentdoc.AV_LightTabSentiScore(L), sentdoc.AV_AggressiveTabSentiScore(L)]:
+                if params: algo.set_parameters(**params)
+                for doc in [TESTDOC_ADJ, TESTDOC_BADADJ, TESTDOC_NEGATED, TESTDOC_CORRUPT]:
+                    scores = algo.classify_document(doc, verbose=False)
+                    self.assertTrue(algo._can_fuse())
+                    resultdata = algo.resultdata
+                    algo.verbose = True
+                    self.assertFalse(algo._can_fuse())
+                    prepared = algo.prepare_document(doc)
+                    self.assertEqual(algo.score_prepared(prepared), scores, 'Fused scan differs on %s' % doc)
+                    self.assertEqual(algo.resultdata, resultdata)
+
 #
 # Runs unit testing if module is called directly
 #
@@ -0,0 +1,101 @@
+try:
+    import sentlex.lexhandle as lexhandle
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentanalysis_sent as sentdoc_sent
+    import sentlex.sentanalysis_ensemble as sentdoc_ensemble
+    import sentlex.sentanalysis_potts as sentdoc_potts
+    import sentlex.sentlex as sentlex
+except Exception:
+    import lexhandle
+    import sentanalysis as sentdoc
+    import sentanalysis_sent as sentdoc_sent
+    import sentanalysis_ensemble as sentdoc_ensemble
+    import sentanalysis_potts as sentdoc_potts
+    import sentlex
+
+import unittest
+
+#####
+#
+# Unit Testing for versioned lexicons
+#
+####
+
+TESTDOC = 'good/JJ not/DT bad/JJ ./. nice/JJ movie/NN'
+
+
+# builds the lexicons in turn, failing when out of them
+def make_builder(lexicons):
+    lexicons = list(lexicons)
+    def builder():
+        return lexicons.pop(0)
+    return builder
+
+
+# T0 - reloaded versions are published at once, used from the next document on, and freed when unused
+class T0_reload(unittest.TestCase):
+    def runTest(self):
+        (L, U) = (sentlex.MobyLexicon(), sentlex.UICLexicon())
+        expected = []
+        for lexicon in [L, U]:
+            ds = sentdoc.AV_AllWordsDocSentiScore(lexicon)
+            expected.append(ds.classify_document(TESTDOC, verbose=False))
+        self.assertNotEqual(expected[0], expected[1])
+
+        handle = lexhandle.LexiconHandle(make_builder([L, U]))
+        del L
+        ds = sentdoc.AV_AllWordsDocSentiScore(handle)
+        self.assertEqual((handle.get_version(), ds.classify_document(TESTDOC, verbose=False)), (1, expected[0]))
+        fingerprint = ds.get_fingerprint()
+
+        # a document being scored keeps its version
+        prepared = ds.prepare_document(TESTDOC)
+        del U
+        self.assertEqual(handle.reload().join() or handle.wait(), 2)
+        self.assertEqual(ds.score_prepared(prepared), expected[0], 'Version changed during document')
+        self.assertEqual(handle.get_stats()['live_versions'], 2)
+        self.assertEqual(handle.get_stats()['overlap_seconds'], None)
+
+        # prepared documents hold lookups of their version
+        del prepared
+        self.assertEqual(ds.classify_document(TESTDOC, verbose=False), expected[1], 'New version not used')
+        self.assertNotEqual(ds.get_fingerprint(), fingerprint)
+        stats = handle.get_stats()
+        self.assertEqual((stats['version'], stats['reloads'], stats['live_versions']), (2, 1, 1), 'Old version not freed')
+        self.assertTrue(stats['overlap_seconds'] >= 0 and stats['build_seconds'] >= 0 and stats['latency_seconds'] >= 0)
+        versions = handle.get_versions()
+        self.assertTrue(versions[0]['freed'] >= versions[0]['retired'] >= versions[0]['published'])
+
+        # failed builds keep the current version
+        self.assertEqual(handle.reload(background=False), None)
+        self.assertEqual((handle.get_version(), handle.failed_reloads), (2, 1))
+        self.assertTrue(handle.last_error.startswith('IndexError'))
+
+
+# T1 - classifiers working together on a document share one version
+class T1_shared_handle(unittest.TestCase):
+    def runTest(self):
+        (L, U) = (sentlex.MobyLexicon(), sentlex.UICLexicon())
+        handle = lexhandle.LexiconHandle(make_builder([L, U]))
+        ensemble = sentdoc_ensemble.EnsembleDocSentiScore([sentdoc.AV_AllWordsDocSentiScore(handle), sentdoc_potts.AV_LightPottsSentiScore(handle)])
+        sentences = sentdoc_sent.SentenceDocSentiScore(handle)
+        for classifier in [ensemble, sentences]:
+            classifier.classify_document(TESTDOC, verbose=False)
+        handle.reload(background=False)
+        for classifier in [ensemble, sentences]:
+            classifier.classify_document(TESTDOC, verbose=False)
+        self.assertTrue(ensemble.L is U and sentences.sentence_classifier.L is U)
+        self.assertTrue(ensemble.members[0].L is ensemble.members[1].L)
+
+        # plain lexicons are kept as they are
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        ds.classify_document(TESTDOC, verbose=False)
+        self.assertTrue(ds.L is L and ds.lexicon_handle is None)
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
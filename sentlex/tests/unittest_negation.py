@@ -73,6 +73,68 @@ class T2_negationwindow(unittest.TestCase):
         for i in range(4):
             self.assertTrue(negatedsums[i] < negatedsums[i+1], 'Something wrong with window size %d'%i)
 
+# T3 - streaming detection matches whole document detection
+class T3_streaming(unittest.TestCase):
+    def runTest(self):
+        docs = [STR_NONEGATION, STR_NEGATION, STR_DOUBLE, STR_PSEUDO, STR_WINDOW, STR_OTHERTAG, STR_BACK]
+        for doc in docs:
+            for window in [1, 4]:
+                tokens = doc.split()
+                A = neg.getNegationArray(tokens, window, False, True)
+                B = [flag for (token, flag) in neg.iterNegation(iter(tokens), window, postag=True)]
+                self.assertEqual(A, B, 'Streaming detection differs on %s' % doc)
+                self.assertEqual(A, [flag for (token, flag) in neg.iterNegation(tokens, window, postag=True, separator=tokens[0][-3])])
+        tokens = STR_UNTAGGED.split()
+        self.assertEqual(neg.getNegationArray(tokens, 4, False, False), [f for (t, f) in neg.iterNegation(tokens, 4)])
+        self.assertEqual(list(neg.iterNegation([], 4)), [], 'Failed to deal with empty input')
+
+# T4 - incremental tracker gives same flags regardless of chunking, and can be reused after close()
+class T4_tracker(unittest.TestCase):
+    def runTest(self):
+        tracker = neg.NegationTracker(4, postag=True)
+        for doc in [STR_NEGATION, STR_PSEUDO, STR_OTHERTAG, STR_WINDOW]:
+            tokens = doc.split()
+            A = neg.getNegationArray(tokens, 4)
+            for size in [1, 2, 5, len(tokens)]:
+                flags = []
+                for i in range(0, len(tokens), size):
+                    flags += tracker.feed(tokens[i:i+size])
+                    self.assertEqual(len(flags), max(0, min(i+size, len(tokens)) - 1), 'Tracker held back too many flags')
+                flags += tracker.close()
+                self.assertEqual(flags, A, 'Tracker differs on %s with chunks of %d' % (doc, size))
+        self.assertEqual(tracker.close(), [], 'Empty document not handled')
+
+# T5 - compact negation mask behaves like the list form
+class T5_mask(unittest.TestCase):
+    def runTest(self):
+        for doc in [STR_NONEGATION, STR_NEGATION, STR_DOUBLE, STR_WINDOW, STR_OTHERTAG]:
+            A = neg.getNegationArray(doc.split(), 4)
+            M = neg.getNegationMask(doc.split(), 4)
+            self.assertEqual(M, A, 'Mask differs from array')
+            self.assertEqual((len(M), sum(M), M.count, M.tolist(), M[1:4], M[-1]), (len(A), sum(A), sum(A), A, A[1:4], A[-1]))
+            self.assertEqual(type(M[0]), int)
+            starts = [i for i in range(len(A)) if A[i] and (i == 0 or not A[i-1])]
+            self.assertEqual([w[0] for w in M.windows], starts, 'Window starts are wrong')
+            self.assertEqual(sum([end - start for (start, end) in M.windows]), M.count, 'Window sizes are wrong')
+        M = neg.NegationMask([0, 1, 1, 0, 1])
+        self.assertEqual(M.windows, [(1, 3), (4, 5)])
+        self.assertEqual((neg.NegationMask().windows, neg.NegationMask().count, len(neg.NegationMask())), ([], 0, 0))
+        try:
+            import numpy
+        except ImportError:
+            return
+        self.assertEqual(M.asarray().tolist(), [False, True, True, False, True], 'NumPy view is wrong')
+
+# T6 - (word, tag) tuples give same flags as tagged tokens
+class T6_tuples(unittest.TestCase):
+    def runTest(self):
+        for doc in [STR_NEGATION, STR_DOUBLE, STR_PSEUDO, STR_WINDOW, STR_OTHERTAG]:
+            tokens = doc.split()
+            sep = tokens[0][-3]
+            pairs = [tuple(token.rsplit(sep, 1)) for token in tokens]
+            self.assertEqual(neg.getNegationArray(pairs, 4), neg.getNegationArray(tokens, 4), 'Tuple input differs on %s' % doc)
+            self.assertEqual(neg.getNegationMask(pairs, 4), neg.getNegationArray(tokens, 4))
+
 #
 # Runs unit testing if module is called directly
 #
@@ -0,0 +1,100 @@
+try:
+    import sentlex.resultcache as resultcache
+    import sentlex.batch as batch
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentanalysis_sent as sentdoc_sent
+    import sentlex.sentlex as sentlex
+except Exception:
+    import resultcache
+    import batch
+    import sentanalysis as sentdoc
+    import sentanalysis_sent as sentdoc_sent
+    import sentlex
+
+import os
+import shutil
+import tempfile
+import unittest
+
+#####
+#
+# Unit Testing for result cache
+#
+####
+
+TESTDOCS = ['good/JJ good/JJ nice/JJ', 'not/DT bad/JJ ./. not/DT really/RR bad/JJ', 'this/DT is/VBZ bad/JJ', 'nothing/NN here/RB']
+
+
+# T0 - fingerprints identify lexicon contents and classifier configuration
+class T0_fingerprint(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        U = sentlex.UICLexicon()
+        self.assertEqual(L.get_fingerprint(), sentlex.MobyLexicon().get_fingerprint(), 'Fingerprint not stable')
+        self.assertEqual(L._score_tables, {}, 'Score tables kept for fingerprint')
+        self.assertNotEqual(L.get_fingerprint(), U.get_fingerprint())
+        self.assertEqual(sentlex.CompactLexicon(L).get_fingerprint(), sentlex.CompactLexicon(L).get_fingerprint())
+
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        fingerprint = ds.get_fingerprint()
+        self.assertEqual(fingerprint, sentdoc.AV_AllWordsDocSentiScore(L).get_fingerprint())
+        ds.set_parameters(negation_window=2, negation=True)
+        self.assertNotEqual(ds.get_fingerprint(), fingerprint, 'Parameter change not in fingerprint')
+        self.assertNotEqual(sentdoc.AV_AllWordsDocSentiScore(U).get_fingerprint(), fingerprint, 'Lexicon not in fingerprint')
+        self.assertNotEqual(sentdoc_sent.SentenceDocSentiScore(L).get_fingerprint(), fingerprint)
+
+
+# T1 - repeated documents are taken from the cache, in memory and on disk
+class T1_cache(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        docs = list(enumerate(TESTDOCS * 5))
+        expected = list(batch.score_documents(ds, docs))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'results.db')
+            for workers in [1, 2]:
+                cache = resultcache.ResultCache(maxsize=100, path=path)
+                results = list(batch.score_documents(ds, iter(docs), workers=workers, chunksize=3, cache=cache))
+                self.assertEqual(results, expected, 'Cached results differ (workers=%d)' % workers)
+                stats = cache.get_stats()
+                if workers == 1:
+                    self.assertEqual((stats['hits'], stats['misses'], stats['size']), (16, 4, 4))
+                else:
+                    # reopened file - first occurrence of each document read from disk
+                    self.assertEqual((stats['disk_hits'], stats['misses']), (4, 0))
+                cache.close()
+
+            # annotation and configuration are part of the key
+            cache = resultcache.ResultCache(maxsize=100, path=path)
+            results = list(batch.score_documents(ds, docs[:4], annotate=True, cache=cache))
+            self.assertTrue('annotated_doc' in results[0] and cache.get_stats()['misses'] == 4)
+            ds.set_parameters(negation=False)
+            list(batch.score_documents(ds, docs[:4], cache=cache))
+            self.assertEqual(cache.get_stats()['misses'], 8, 'Stale results returned')
+            cache.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+# T2 - duplicates of documents being scored by workers are scored once
+class T2_duplicates(unittest.TestCase):
+    def runTest(self):
+        ds = sentdoc.AV_AllWordsDocSentiScore(sentlex.MobyLexicon())
+        for docs in [list(enumerate(TESTDOCS * 5)), list(enumerate(TESTDOCS[1:2] * 6))]:
+            runs = []
+            for workers in [1, 2]:
+                cache = resultcache.ResultCache(maxsize=10)
+                results = list(batch.score_documents(ds, iter(docs), workers=workers, chunksize=3, cache=cache))
+                stats = cache.get_stats()
+                runs.append((results, stats['hits'], stats['misses']))
+            self.assertTrue(runs[1][1] > 0, 'No cache hits with workers')
+            self.assertEqual(runs[1], runs[0], 'Duplicates scored differently with workers')
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
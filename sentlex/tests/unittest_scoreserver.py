@@ -0,0 +1,96 @@
+try:
+    import sentlex.scoreserver as scoreserver
+    import sentlex.lexhandle as lexhandle
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentlex as sentlex
+except Exception:
+    import scoreserver
+    import lexhandle
+    import sentanalysis as sentdoc
+    import sentlex
+
+import os
+import tempfile
+import threading
+import unittest
+
+#####
+#
+# Unit Testing for scoring server
+#
+####
+
+TESTDOC_ADJ = 'good/JJ good/JJ good/JJ good/JJ good/JJ good/JJ good/JJ good/JJ good/JJ good/JJ'
+TESTDOC_NEGATED = 'not/DT bad/JJ ./. not/DT really/RR bad/JJ'
+
+
+def start_server(address, classifier):
+    server = scoreserver.create_server(address, classifier)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    return server
+
+
+# T0 - Unix socket and TCP servers return same results as local classifier
+class T0_serve(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        local = sentdoc.AV_AllWordsDocSentiScore(L)
+
+        sockpath = os.path.join(tempfile.mkdtemp(), 'sentlex.sock')
+        for address in [sockpath, 'localhost:0']:
+            server = start_server(address, ds)
+            if address != sockpath:
+                address = 'localhost:%d' % server.server_address[1]
+            client = scoreserver.ScoreClient(address, timeout=10)
+            for doc in [TESTDOC_ADJ, TESTDOC_NEGATED]:
+                response = client.classify_document(doc, annotate=True)
+                (pos, neg) = local.classify_document(doc, verbose=False)
+                self.assertEqual((response['resultpos'], response['resultneg']), (pos, neg), 'Server returned different scores')
+                self.assertEqual(response['tokens_found'], local.resultdata['tokens_found'], 'Server returned different counts')
+                self.assertEqual(response['annotated_doc'], local.resultdata['annotated_doc'], 'Server returned different annotation')
+
+            # errors are reported, and connection remains usable
+            client.wfile.write('not json\n')
+            client.wfile.flush()
+            self.assertTrue('error' in scoreserver.json.loads(client.rfile.readline()), 'Bad request not reported')
+            self.assertTrue('resultpos' in client.classify_document(TESTDOC_ADJ), 'Connection unusable after error')
+
+            client.close()
+            server.shutdown()
+            server.server_close()
+        self.assertFalse(os.path.exists(sockpath), 'Unix socket not removed on close')
+
+
+# T1 - reload command rebuilds a lexicon handle while serving
+class T1_reload(unittest.TestCase):
+    def runTest(self):
+        handle = lexhandle.LexiconHandle(sentlex.MobyLexicon)
+        server = start_server('localhost:0', sentdoc.AV_AllWordsDocSentiScore(handle))
+        client = scoreserver.ScoreClient('localhost:%d' % server.server_address[1], timeout=10)
+        scores = lambda response: (response['resultpos'], response['resultneg'])
+        expected = scores(client.classify_document(TESTDOC_NEGATED))
+        for command in ['reload', 'lexicon']:
+            client.wfile.write(scoreserver.json.dumps({'command': command, 'id': command}) + '\n')
+            client.wfile.flush()
+            response = scoreserver.json.loads(client.rfile.readline())
+            self.assertEqual(response['id'], command)
+        self.assertTrue(response['version'] >= 1)
+        self.assertEqual(scores(client.classify_document(TESTDOC_NEGATED)), expected)
+        handle.wait()
+        server.reload_lexicon(wait=True)
+        self.assertEqual((handle.get_version(), handle.get_stats()['live_versions']), (3, 1), 'Old versions kept by server')
+        self.assertEqual(scores(client.classify_document(TESTDOC_NEGATED)), expected)
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
@@ -1,5 +1,17 @@
 import sentlex
+try:
+    import sentlex.sentlex as lexmodule
+    import sentlex.disklex as disklex
+except Exception:
+    import sentlex as lexmodule
+    import disklex
 import sys,os
+import gc
+import subprocess
+try:
+    import sentlex.benchmark as benchmark
+except Exception:
+    import benchmark
 import unittest
 
 #####
@@ -57,6 +69,130 @@ class T3_multiplelexicons(unittest.TestCase):
         self.assertEqual(L2.get_name(), 'UnitTest2', 'Something weird with lexicon instantiation.')
         self.assertEqual(L1.get_name(), 'UnitTest1', 'Something weird with lexicon instantiation.')
 
+# T4. Deferred loading
+class T4_deferred(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon(deferred=True)
+        self.assertFalse(L.is_loaded, 'Deferred lexicon loaded at construction')
+        self.assertTrue(L.is_deferred, 'Lexicon not marked as deferred')
+
+        # first access loads lexicon
+        self.assertEqual(L.getadjective('good'), (1.0,0.0), 'Value for term good <> 1')
+        self.assertTrue(L.is_loaded and (not L.is_deferred), 'Lexicon did not load on first use')
+        self.assertTrue(L.get_freq('good') > 0, 'Frequencies not compiled on deferred load')
+
+        # importing the package must not pull NLTK or NumPy in
+        script = 'import sys, sentlex, sentlex.sentanalysis; sys.exit(len([m for m in sys.modules if m.startswith("nltk") or m == "numpy"]))'
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(sentlex.__file__)))
+        self.assertEqual(subprocess.call([sys.executable, '-c', script], env=env), 0, 'NLTK or NumPy imported with sentlex package')
+
+# T5. Compact lexicon
+class T5_compact(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        C = sentlex.CompactLexicon(L)
+        self.assertTrue(C.is_loaded and C.is_compiled, 'Compact lexicon not ready for use')
+        self.assertEqual(C.get_name(), L.get_name(), 'Lexicon name not copied')
+        self.assertEqual(C.get_info(), L.get_info(), 'Lexicon statistics differ from source lexicon')
+        for term in list(L.A) + ['notaword']:
+            self.assertEqual(C.hasadjective(term), L.hasadjective(term), 'Presence differs for %s' % term)
+            self.assertEqual(C.getadjective(term), L.getadjective(term), 'Score differs for %s' % term)
+            self.assertEqual(C.get_freq(term), L.get_freq(term), 'Frequency differs for %s' % term)
+        for term in L.V:
+            self.assertEqual(C.getverb(term), L.getverb(term), 'Score differs for %s' % term)
+
+class T6_compact_fork(unittest.TestCase):
+    def runTest(self):
+        if not hasattr(os, 'fork') or benchmark.private_rss_kb() is None:
+            print 'Skipping - unable to measure per-process memory on this platform'
+            return
+        # per-worker unique memory after reading whole lexicon inherited from parent
+        L = sentlex.UICLexicon()
+        gc.collect()
+        dict_growth = max(benchmark.fork_private_growth(lambda: benchmark.touch_lexicon(L, False), 2))
+        C = sentlex.CompactLexicon(L)
+        L = None
+        gc.collect()
+        compact_growth = max(benchmark.fork_private_growth(lambda: benchmark.touch_lexicon(C, False), 2))
+        print 'Per-worker private memory (KB) - dict: %d, compact: %d' % (dict_growth, compact_growth)
+        self.assertTrue(compact_growth < dict_growth/2, 'Compact lexicon pages are being copied by workers')
+
+# Batch lookups
+class T7_batch_lookup(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        U = sentlex.UICLexicon()
+        CL = sentlex.CompositeLexicon()
+        CL.add_lexicon(L)
+        CL.add_lexicon(U)
+        for lexicon in [L, sentlex.CompactLexicon(L), CL]:
+            for (pos, getter) in [('a', lexicon.getadjective), ('v', lexicon.getverb), ('r', lexicon.getadverb), ('n', lexicon.getnoun)]:
+                terms = sorted(getattr(L, pos.upper()))[:200] + ['notaword', '']
+                self.assertEqual(lexicon.get_scores(pos, terms), [getter(t) for t in terms], 'Batch lookup differs for %s' % pos)
+
+# Comparison over score tables
+class T8_compare(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        U = sentlex.UICLexicon()
+        results = L.compare_all(U)
+        self.assertEqual(results, sentlex.CompactLexicon(L).compare_all(U), 'Compact lexicon compares differently')
+        for pos in ['a', 'v', 'r', 'n']:
+            terms = [t for t in getattr(L, pos.upper()) if t in getattr(U, pos.upper())]
+            self.assertEqual(results[pos]['intersect'], len(terms))
+            self.assertEqual(L.compare(U, pos), {'intersect': len(terms), 'agree': results[pos]['agree']})
+            self.assertTrue(-1.0 <= results[pos]['correlation'] <= 1.0)
+            self.assertEqual(sum(results[pos]['distro']), len(getattr(L, pos.upper())), 'Term counts are wrong')
+        # pure Python fallback gives same results
+        get_numpy = lexmodule._get_numpy
+        try:
+            lexmodule._get_numpy = lambda: None
+            fallback = L.compare_all(U)
+        finally:
+            lexmodule._get_numpy = get_numpy
+        for pos in results:
+            self.assertAlmostEqual(results[pos].pop('correlation'), fallback[pos].pop('correlation'))
+        self.assertEqual(results, fallback)
+
+# Disk lexicon
+class T9_disk(unittest.TestCase):
+    def runTest(self):
+        import tempfile
+        L = sentlex.MobyLexicon()
+        (fd, path) = tempfile.mkstemp(suffix='.slx')
+        os.close(fd)
+        try:
+            # small blocks, so lookups cross block boundaries
+            disklex.write_disk_lexicon(path, L, blocksize=4)
+            D = disklex.DiskLexicon(path, cachesize=100)
+            self.assertEqual(D.get_name(), L.get_name())
+            self.assertEqual(D.get_info(), L.get_info(), 'Lexicon info differs')
+            for (pos, getter, checker) in [('a', 'getadjective', 'hasadjective'), ('v', 'getverb', 'hasverb'),
+                                           ('r', 'getadverb', 'hasadverb'), ('n', 'getnoun', 'hasnoun')]:
+                terms = sorted(getattr(L, pos.upper())) + ['notaword', '', 'a', 'zzz']
+                self.assertEqual([getattr(D, getter)(t) for t in terms], [getattr(L, getter)(t) for t in terms], 'Scores differ for %s' % pos)
+                self.assertEqual([getattr(D, checker)(t) for t in terms], [getattr(L, checker)(t) for t in terms])
+                self.assertEqual(list(getattr(D, pos.upper())), sorted(getattr(L, pos.upper())))
+            self.assertEqual([D.get_freq(t) for t in L.LexFreq], [L.get_freq(t) for t in L.LexFreq], 'Frequencies differ')
+            D.getadjective('good')
+            hits = D.cache_info()['a'][0]
+            D.getadjective('good')
+            self.assertEqual(D.cache_info()['a'][0], hits + 1, 'Lookup cache not used')
+            D.close()
+            # unsorted input larger than the sort buffer
+            writer = disklex.DiskLexiconWriter(path, 'Test', blocksize=3, sortbuffer=7)
+            writer.add_section('a', [('w%d' % i, (i, 0.0)) for i in range(50, 0, -1)])
+            for pos in 'vrn':
+                writer.add_section(pos, [])
+            writer.close()
+            D = disklex.DiskLexicon(path)
+            self.assertEqual(list(D.A), sorted(['w%d' % i for i in range(1, 51)]))
+            self.assertEqual((D.getadjective('w25'), D.getadjective('w0'), D.hasnoun('w1')), ((25.0, 0.0), (0,0), False))
+            D.close()
+        finally:
+            os.unlink(path)
+
 # Morph lexicon
 class T_morpho(unittest.TestCase):
    def runTest(self):
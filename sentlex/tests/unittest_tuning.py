@@ -0,0 +1,78 @@
+try:
+    import sentlex.tuning as tuning
+    import sentlex.sentanalysis as sentdoc
+    import sentlex.sentlex as sentlex
+except Exception:
+    import tuning
+    import sentanalysis as sentdoc
+    import sentlex
+
+import unittest
+
+#####
+#
+# Unit Testing for grid search tuning
+#
+####
+
+TESTCORPUS = [
+    ([('a', 'DT'), ('good', 'JJ'), ('movie', 'NN')], 'pos'),
+    ([('not', 'RB'), ('bad', 'JJ'), ('at', 'IN'), ('all', 'DT')], 'pos'),
+    ([('great', 'JJ'), ('fun', 'NN'), ('and', 'CC'), ('nice', 'JJ')], 'pos'),
+    ([('bad', 'JJ'), ('plot', 'NN')], 'neg'),
+    ([('not', 'RB'), ('good', 'JJ'), ('.', '.'), ('boring', 'JJ')], 'neg'),
+    ([('awful', 'JJ'), ('and', 'CC'), ('ugly', 'JJ')], 'neg'),
+] * 4
+
+
+# T0 - grids and decision rule
+class T0_grid(unittest.TestCase):
+    def runTest(self):
+        configs = tuning.expand_grid({'scorer': ['AV_AllWordsDocSentiScore', 'AV_LightPottsSentiScore'], 'negation_window': [1, 5], 'threshold': [0.0, 0.5]})
+        self.assertEqual(len(configs), 8)
+        self.assertEqual(configs[0], {'scorer': 'AV_AllWordsDocSentiScore', 'negation_window': 1, 'threshold': 0.0})
+        self.assertTrue(tuning.get_scorer_class('AV_AggressiveTabSentiScore').__name__ == 'AV_AggressiveTabSentiScore')
+        self.assertRaises(ValueError, tuning.get_scorer_class, 'NoSuchScorer')
+        self.assertEqual((tuning.predict((1, 0)), tuning.predict((0.5, 0.4), threshold=0.2), tuning.predict(None)), ('pos', 'neg', None))
+
+
+# T1 - grid search reports the accuracy of each configuration, in one or more processes, and stops poor ones early
+class T1_grid_search(unittest.TestCase):
+    def runTest(self):
+        L = sentlex.MobyLexicon()
+        grid = {'scorer': ['AV_AllWordsDocSentiScore', 'AV_AggressiveTabSentiScore', 'A_Cos_AllWordsDocSentiScore'], 'lexicon': [L],
+                'negation_window': [1, 5], 'threshold': [0.0, 0.1]}
+        reports = tuning.grid_search(TESTCORPUS, grid, chunksize=5)
+        self.assertEqual(len(reports), 12)
+        for report in reports:
+            self.assertEqual((report['docs'], report['errors'], report['stopped']), (len(TESTCORPUS), 0, False))
+            self.assertTrue(report['docs_per_sec'] > 0)
+
+        # same as classifying each document
+        config = reports[0]['config']
+        ds = sentdoc.AV_AllWordsDocSentiScore(L)
+        ds.set_parameters(negation=True, negation_window=config['negation_window'])
+        correct = [tuning.predict(ds.classify_document(doc, verbose=False), threshold=config['threshold']) == label for (doc, label) in TESTCORPUS]
+        self.assertEqual(reports[0]['correct'], sum(correct))
+
+        # negation window is set on its own, without negation
+        doc = [('not', 'RB'), ('a', 'DT'), ('good', 'JJ'), ('movie', 'NN'), ('.', '.'), ('nice', 'JJ')]
+        (narrow, wide) = [tuning.make_scorer(dict(config, negation_window=window), L).classify_document(doc, verbose=False) for window in (1, 5)]
+        self.assertNotEqual(narrow, wide, 'Negation window not set')
+
+        self.assertEqual([report['accuracy'] for report in tuning.grid_search(TESTCORPUS, grid, workers=2, chunksize=5)],
+                         [report['accuracy'] for report in reports], 'Results differ with worker processes')
+
+        # early stopping - half of the scorer setups (with both thresholds) go on to the whole corpus
+        staged = tuning.grid_search(TESTCORPUS, grid, workers=2, stages=[0.25], keep=0.5)
+        self.assertEqual(len([report for report in staged if report['stopped']]), 6)
+        for report in staged:
+            self.assertEqual(report['docs'], report['stopped'] and 6 or len(TESTCORPUS))
+
+#
+# Runs unit testing if module is called directly
+#
+if __name__ == "__main__":
+
+   # Run those guys
+   unittest.main()
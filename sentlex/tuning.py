@@ -0,0 +1,339 @@
+'''
+
+   Lexicon-Based Sentiment Analysis Library
+
+   tuning.py - grid search of scorers, lexicons and parameters over labelled corpora
+
+   A labelled corpus is a list of (document, label) pairs, with label 'pos' or 'neg'. Documents are
+   POS-tagged once (tag_corpus) and shared by every configuration: each process prepares a document
+   once, and negation detection and lexicon lookups are reused by all configurations scoring it
+   (see BasicDocSentiScore.score_prepared). Configurations are spread over a pool of processes:
+
+      corpus = tag_corpus(load_movie_reviews(), workers=4)
+      grid = expand_grid({'scorer': ['AV_LightPottsSentiScore', 'A_Cos_AllWordsDocSentiScore'],
+                          'lexicon': ['moby', 'uic'],
+                          'negation_window': [3, 5],
+                          'threshold': [0.0, 0.05]})
+      for report in grid_search(corpus, grid, workers=4, stages=[0.2, 1.0]):
+          print report['config'], report['accuracy'], report['docs_per_sec']
+
+   A configuration is a dict with keys scorer (class or class name), lexicon (name in LEXICONS, or a
+   Lexicon object), shift and threshold (decision rule, see predict), and parameters passed to the
+   scorer's set_parameters(). Configurations differing only in shift and threshold are scored once.
+
+   With stages, configurations are evaluated on growing subsamples of the corpus, and only the best
+   of them (keep) go on to the next stage - poor configurations are stopped early.
+'''
+
+import math
+import time
+import random
+import itertools
+import multiprocessing
+
+from docscoreutil import sumVote
+
+# lexicons that can be named in configurations
+LEXICONS = {
+    'swn3': 'SWN3Lexicon',
+    'moby': 'MobyLexicon',
+    'uic': 'UICLexicon',
+}
+
+# modules searched for scorer classes named in configurations
+SCORER_MODULES = ['sentanalysis', 'sentanalysis_potts', 'sentanalysis_taboada', 'sentanalysis_sent']
+
+# configuration keys of the decision rule, the others select and set up the scorer
+DECISION_KEYS = ('shift', 'threshold')
+
+# scorer parameters of negation detection, set with set_neg_detection
+NEGATION_KEYS = ('negation', 'negation_window', 'negation_adjustment')
+
+LABELS = ('pos', 'neg')
+
+
+#
+# Corpora
+#
+def load_movie_reviews(categories=LABELS):
+    '''
+     Returns NLTK's movie_reviews corpus (must be installed locally) as a list of (words, label).
+    '''
+    from nltk.corpus import movie_reviews
+    corpus = []
+    for label in categories:
+        for fileid in movie_reviews.fileids(label):
+            corpus.append((list(movie_reviews.words(fileid)), label))
+    return corpus
+
+
+def _tag_document(doc):
+    import nltk
+    if isinstance(doc, basestring):
+        doc = nltk.word_tokenize(doc)
+    return nltk.pos_tag(list(doc))
+
+
+def tag_corpus(corpus, workers=1):
+    '''
+     Returns corpus with each document (text, or list of words) POS-tagged as a list of (word, tag) pairs,
+     ready to be shared by all configurations of a grid search.
+    '''
+    docs = [doc for (doc, label) in corpus]
+    if workers <= 1:
+        tagged = map(_tag_document, docs)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            tagged = pool.map(_tag_document, docs, chunksize=16)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    return zip(tagged, [label for (doc, label) in corpus])
+
+
+#
+# Configurations
+#
+def expand_grid(grid):
+    '''
+     Returns list of configurations with every combination of the values in grid, a dict of lists of values
+     by configuration key (or a list of such dicts, expanded one after the other).
+    '''
+    if isinstance(grid, dict):
+        grid = [grid]
+    configs = []
+    for part in grid:
+        keys = sorted(part.keys())
+        for values in itertools.product(*[part[key] for key in keys]):
+            configs.append(dict(zip(keys, values)))
+    return configs
+
+
+def get_scorer_class(scorer):
+    '''
+     Returns scorer class of given name, searched in SCORER_MODULES. Classes are returned as they are.
+    '''
+    if not isinstance(scorer, basestring):
+        return scorer
+    for modname in SCORER_MODULES:
+        module = __import__(modname, globals(), locals(), [scorer])
+        if hasattr(module, scorer):
+            return getattr(module, scorer)
+    raise ValueError('Unknown scorer: %s' % scorer)
+
+
+def get_lexicon(lexicon, loaded=None):
+    '''
+     Returns lexicon of given name (see LEXICONS), loading it once per dict of loaded lexicons.
+     Lexicon objects are returned as they are.
+    '''
+    if not isinstance(lexicon, basestring):
+        return lexicon
+    if loaded is None:
+        loaded = {}
+    if lexicon not in loaded:
+        import sentlex
+        loaded[lexicon] = getattr(sentlex, LEXICONS[lexicon])()
+    return loaded[lexicon]
+
+
+def make_scorer(config, L):
+    '''
+     Returns scorer of configuration, with lexicon L and parameters of the configuration set.
+    '''
+    cls = get_scorer_class(config['scorer'])
+    try:
+        classifier = cls(L)
+    except TypeError:
+        # classes taking no lexicon, such as BasicDocSentiScore
+        classifier = cls()
+        classifier.set_lexicon(L)
+    params = _scorer_params(config)
+    if [key for key in NEGATION_KEYS if key in params]:
+        # set_parameters only sets window and adjustment along with negation, so each is set here on its own
+        classifier.set_neg_detection(params.pop('negation', classifier.negation),
+                                     params.pop('negation_window', classifier.negation_window),
+                                     params.pop('negation_adjustment', classifier.negated_term_adj))
+    if params:
+        classifier.set_parameters(**params)
+    return classifier
+
+
+def _scorer_params(config):
+    return dict([(key, value) for (key, value) in config.iteritems() if key not in ('scorer', 'lexicon') + DECISION_KEYS])
+
+
+def _scoring_key(config):
+    # configurations with the same key produce the same scores
+    lexicon = config.get('lexicon')
+    if not isinstance(lexicon, basestring):
+        lexicon = id(lexicon)
+    return (config['scorer'], lexicon, tuple(sorted(_scorer_params(config).items())))
+
+
+def predict(scores, shift=0.0, threshold=0.0):
+    '''
+     Returns label predicted from (pos, neg) scores: 'pos' if pos - (neg - shift) >= threshold, as
+     in docscoreutil.sumVote. Documents that could not be scored (None) are predicted None.
+    '''
+    if scores is None:
+        return None
+    if sumVote([scores], shift, threshold)[0]:
+        return 'pos'
+    return 'neg'
+
+
+#
+# Scoring
+#
+# corpus, configurations and prepared documents used by worker processes, inherited from parent on fork
+_worker_state = {}
+
+def _init_worker(docs, classifiers):
+    _worker_state['docs'] = docs
+    _worker_state['classifiers'] = classifiers
+    # PreparedDoc of each document, shared by all configurations scored by this process
+    _worker_state['prepared'] = {}
+
+def _score_range(args):
+    '''
+     Scores documents start to end-1 with the classifier of a configuration, returning
+     (configuration index, start, list of scores or None, seconds spent scoring).
+    '''
+    (index, start, end) = args
+    classifier = _worker_state['classifiers'][index]
+    docs = _worker_state['docs']
+    prepared = _worker_state['prepared']
+    scores = []
+    seconds = 0.0
+    for k in xrange(start, end):
+        t0 = time.time()
+        try:
+            if hasattr(classifier, 'score_prepared'):
+                item = prepared.get(k)
+                if item is None:
+                    item = prepared[k] = classifier.prepare_document(docs[k])
+                scores.append(classifier.score_prepared(item))
+            else:
+                scores.append(classifier.classify_document(docs[k], verbose=False))
+        except Exception:
+            scores.append(None)
+        seconds += time.time() - t0
+    return (index, start, scores, seconds)
+
+
+def grid_search(corpus, configs, workers=1, stages=None, keep=0.5, chunksize=100, seed=0, progress=None):
+    '''
+     Evaluates each configuration in configs (a list, or a grid for expand_grid) on labelled corpus, returning
+     one report dict per configuration, in order:
+       config - the configuration
+       accuracy - fraction of documents evaluated whose label was predicted correctly
+       correct, docs, errors - counts of documents predicted correctly, evaluated, and not scored due to errors
+       seconds, docs_per_sec - time spent scoring these documents, and scoring throughput. Tokenizing, negation
+                               detection and lookups shared with other configurations count for the first one to need them
+       stopped - True if the configuration was stopped early
+
+     The corpus is shuffled with seed, and evaluated in stages: fractions of the corpus (default [1.0]) on
+     which configurations are scored in turn, each stage extending the previous subsample. After each stage
+     but the last, only the best keep fraction of configurations (at least one) is evaluated further.
+     Configurations sharing scorer, lexicon and parameters are scored once, and stop together.
+
+     With workers > 1, ranges of chunksize documents of each configuration are scored by a pool of processes,
+     which share tagged documents, lexicons and scorers with this process (where fork is available).
+     progress, if given, is called with the list of reports after each stage.
+    '''
+    if not isinstance(configs, list):
+        configs = expand_grid(configs)
+    order = range(len(corpus))
+    random.Random(seed).shuffle(order)
+    docs = [corpus[k][0] for k in order]
+    labels = [corpus[k][1] for k in order]
+    sizes = [min(len(docs), int(math.ceil(fraction * len(docs)))) for fraction in (stages or [1.0])]
+    if sizes[-1] < len(docs):
+        sizes.append(len(docs))
+
+    # one scorer per set of configurations producing the same scores, built before forking
+    lexicons = {}
+    keys = []
+    classifiers = []
+    groups = []
+    for (n, config) in enumerate(configs):
+        key = _scoring_key(config)
+        if key not in keys:
+            keys.append(key)
+            classifiers.append(make_scorer(config, get_lexicon(config.get('lexicon', 'moby'), lexicons)))
+            groups.append([])
+        groups[keys.index(key)].append(n)
+
+    scores = [[] for classifier in classifiers]
+    seconds = [0.0] * len(classifiers)
+    stopped = [False] * len(classifiers)
+    reports = [None] * len(configs)
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_worker, (docs, classifiers))
+    else:
+        _init_worker(docs, classifiers)
+    try:
+        for (stage, size) in enumerate(sizes):
+            active = [index for index in xrange(len(classifiers)) if not stopped[index]]
+            jobs = []
+            for index in active:
+                for start in xrange(len(scores[index]), size, chunksize):
+                    jobs.append((index, start, min(size, start + chunksize)))
+            if pool:
+                results = pool.imap_unordered(_score_range, jobs)
+            else:
+                results = itertools.imap(_score_range, jobs)
+            parts = {}
+            for (index, start, part, elapsed) in results:
+                parts[(index, start)] = part
+                seconds[index] += elapsed
+            for index in active:
+                for start in xrange(len(scores[index]), size, chunksize):
+                    scores[index].extend(parts[(index, start)])
+                for n in groups[index]:
+                    reports[n] = _report(configs[n], scores[index], labels, seconds[index])
+
+            if stage < len(sizes) - 1:
+                # keep the best configurations, by the best decision rule of each
+                best = dict([(index, max([reports[n]['accuracy'] for n in groups[index]])) for index in active])
+                ranked = sorted(active, key=lambda index: -best[index])
+                for index in ranked[max(1, int(math.ceil(keep * len(active)))):]:
+                    stopped[index] = True
+                    for n in groups[index]:
+                        reports[n]['stopped'] = True
+            if progress:
+                progress(reports)
+        if pool:
+            pool.close()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        else:
+            _worker_state.clear()
+    return reports
+
+
+def _report(config, scores, labels, seconds):
+    shift = config.get('shift', 0.0)
+    threshold = config.get('threshold', 0.0)
+    correct = 0
+    for (thisscores, label) in zip(scores, labels):
+        if predict(thisscores, shift, threshold) == label:
+            correct += 1
+    docs = len(scores)
+    return {
+        'config': config,
+        'accuracy': docs and float(correct) / docs or 0.0,
+        'correct': correct,
+        'docs': docs,
+        'errors': scores.count(None),
+        'seconds': seconds,
+        'docs_per_sec': seconds and docs / seconds or 0.0,
+        'stopped': False,
+    }